@@ -0,0 +1,90 @@
+import argparse
+import multiprocessing
+import os
+import sys
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("Warning: python-dotenv not installed. Using environment variables directly.")
+
+# Usage:
+#   python analysis_worker.py [--processes N] [--batch-size N] [--no-gradcam] [--threads N]
+#
+# Drains the analysis_jobs queue filled by the upload page ("Queue for
+# Background Analysis"): each process loads the model, claims a batch of
+# queued jobs with SELECT ... FOR UPDATE SKIP LOCKED, predicts them in one
+# forward pass (plus Grad-CAM) and writes the results to analysis_results.
+# Run it on as many hosts as needed; they only share the database. Jobs
+# of a worker that is killed are requeued after ANALYSIS_JOB_STALE_SECONDS.
+#
+# Start-up runs under the __main__ guard because the worker processes
+# import this module again.
+
+def work(args, number):
+    import torch
+    from utils.analysis_jobs import run_analysis_worker
+    from utils.model import get_model_path, load_model
+    
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    
+    model = load_model(get_model_path())
+    device = next(model.parameters()).device
+    
+    def report(stats):
+        print(f"[worker {number}] {stats['done']:,} done, {stats['failed']:,} failed, "
+              f"{stats['images_per_second']:,.1f} images/s", flush=True)
+    
+    try:
+        run_analysis_worker(
+            model, device,
+            batch_size=args.batch_size,
+            gradcam=not args.no_gradcam,
+            poll_seconds=args.poll_seconds,
+            progress=report
+        )
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run analysis queue workers")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Worker processes on this host, each with its own model")
+    parser.add_argument("--batch-size", type=int, default=8, help="Jobs claimed per forward pass")
+    parser.add_argument("--no-gradcam", action="store_true", help="Skip the Grad-CAM overlays")
+    parser.add_argument("--poll-seconds", type=float, default=1.0,
+                        help="Wait between claims while the queue is empty")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Torch CPU threads per process (default: cores / processes)")
+    args = parser.parse_args()
+    
+    if args.threads is None and args.processes > 1:
+        args.threads = max(1, (os.cpu_count() or 1) // args.processes)
+    
+    try:
+        from utils.database import ensure_partitions
+        ensure_partitions()
+        
+        if args.processes == 1:
+            work(args, 0)
+        else:
+            processes = [
+                multiprocessing.Process(target=work, args=(args, number), name=f"analysis-worker-{number}")
+                for number in range(args.processes)
+            ]
+            for process in processes:
+                process.start()
+            try:
+                for process in processes:
+                    process.join()
+            except KeyboardInterrupt:
+                # The workers got the interrupt too; let them release their batches
+                for process in processes:
+                    process.join()
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"Analysis worker error: {e}")
+        sys.exit(1)
@@ -5,6 +5,8 @@ import pandas as pd
 from utils.data_handling import initialize_session_state
 from utils.image_processing import setup_image_processors
 from utils.model import load_model, get_model_path
+from utils.database import ensure_partitions
+from utils.inference_client import inference_server_enabled, INFERENCE_SERVER_URL
 
 st.set_page_config(
     page_title="MedImaging RWE Platform",
@@ -28,8 +30,11 @@ def main():
     # Setup image processors
     setup_image_processors()
     
-    # Load model if not in session state
-    if 'model' not in st.session_state:
+    # Prepare upcoming analysis_results partitions
+    ensure_partitions()
+    
+    # Load model if not in session state (unless an inference server owns it)
+    if 'model' not in st.session_state and not inference_server_enabled():
         with st.spinner("Loading AI model..."):
             try:
                 model_path = get_model_path()
@@ -97,8 +102,11 @@ def main():
     
     with col2:
         st.subheader("System Status")
-        st.write(f"Model status: **{'Loaded' if 'model' in st.session_state else 'Not loaded'}**")
-        st.write(f"Device: **{st.session_state.device if 'device' in st.session_state else 'CPU'}**")
+        if inference_server_enabled():
+            st.write(f"Model status: **Served by {INFERENCE_SERVER_URL}**")
+        else:
+            st.write(f"Model status: **{'Loaded' if 'model' in st.session_state else 'Not loaded'}**")
+            st.write(f"Device: **{st.session_state.device if 'device' in st.session_state else 'CPU'}**")
         st.write(f"Total analyses: **{len(st.session_state.analyses) if 'analyses' in st.session_state else 0}**")
         
         # Display dataset info with links to the dataset integration pages
@@ -23,8 +23,16 @@ class GradCAM:
             self.gradients = grad_output[0].detach()
         
         # Register the hooks
-        self.target_layer.register_forward_hook(forward_hook)
-        self.target_layer.register_full_backward_hook(backward_hook)
+        self.handles = [
+            self.target_layer.register_forward_hook(forward_hook),
+            self.target_layer.register_full_backward_hook(backward_hook)
+        ]
+    
+    def remove_hooks(self):
+        # Hooks stay on the shared model otherwise and pile up with every call
+        for handle in self.handles:
+            handle.remove()
+        self.handles = []
     
     def generate(self, input_tensor, target_class=None):
         # Forward pass
@@ -56,6 +64,25 @@ class GradCAM:
         cam = cam.detach().cpu().numpy()[0, 0]
         
         return cam
+    
+    def generate_batch(self, input_tensor, target_classes):
+        # One forward and one backward pass for the whole batch; images do
+        # not interact in eval mode, so each image's gradients come only
+        # from its own target score
+        model_output = self.model(input_tensor)
+        
+        self.model.zero_grad()
+        
+        targets = torch.as_tensor(target_classes, device=model_output.device)
+        model_output.gather(1, targets.view(-1, 1)).sum().backward()
+        
+        gradients = self.gradients.mean(dim=(2, 3), keepdim=True)
+        cams = torch.nn.functional.relu(torch.sum(gradients * self.activations, dim=1))
+        
+        # Normalize each heatmap by its own maximum
+        peaks = cams.flatten(1).max(dim=1).values.view(-1, 1, 1)
+        cams = torch.where(peaks > 0, cams / peaks.clamp(min=1e-12), cams)
+        return list(cams.detach().cpu().numpy())
 
 def generate_gradcam(model, image_tensor, target_class=None, device='cpu'):
     """
@@ -82,9 +109,65 @@ def generate_gradcam(model, image_tensor, target_class=None, device='cpu'):
     grad_cam = GradCAM(model, target_layer)
     
     # Generate heatmap
-    heatmap = grad_cam.generate(image_tensor, target_class)
+    try:
+        heatmap = grad_cam.generate(image_tensor, target_class)
+    finally:
+        grad_cam.remove_hooks()
     
     # Resize heatmap to match input size (224x224)
     heatmap = cv2.resize(heatmap, (224, 224))
     
     return heatmap
+
+def generate_gradcam_batch(model, image_tensor, target_classes, device='cpu'):
+    """
+    Generate Grad-CAM heatmaps for a batch of images at once
+    
+    Args:
+        model: PyTorch model
+        image_tensor: (B, 3, 224, 224) preprocessed image tensor
+        target_classes: Target class index per image
+        device: Device to run on
+        
+    Returns:
+        List of Grad-CAM heatmaps as numpy arrays, one per image
+    """
+    model.eval()
+    
+    grad_cam = GradCAM(model, model.resnet.layer4[-1])
+    try:
+        heatmaps = grad_cam.generate_batch(image_tensor.to(device), target_classes)
+    finally:
+        grad_cam.remove_hooks()
+    
+    return [cv2.resize(heatmap, (224, 224)) for heatmap in heatmaps]
+
+def generate_gradcams(model, image_tensor, target_classes, device='cpu'):
+    """
+    Generate Grad-CAM heatmaps for a batch, keeping failures to their own image
+    
+    All images share one backward pass (generate_gradcam_batch). If that
+    fails, each is retried alone, so an image that breaks Grad-CAM loses
+    only its own heatmap.
+    
+    Args:
+        model: PyTorch model
+        image_tensor: (B, 3, 224, 224) preprocessed image tensor
+        target_classes: Target class index per image
+        device: Device to run on
+        
+    Returns:
+        List with a heatmap, or the exception it raised, per image
+    """
+    try:
+        return generate_gradcam_batch(model, image_tensor, target_classes, device)
+    except Exception:
+        pass
+    
+    heatmaps = []
+    for position, target_class in enumerate(target_classes):
+        try:
+            heatmaps.append(generate_gradcam(model, image_tensor[position:position + 1], target_class, device))
+        except Exception as e:
+            heatmaps.append(e)
+    return heatmaps
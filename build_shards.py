@@ -0,0 +1,55 @@
+import argparse
+import sys
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("Warning: python-dotenv not installed. Using environment variables directly.")
+
+from utils.database import iter_query_batches
+from utils.image_store import object_path
+from utils.tensor_shards import build_tensor_shards, TENSOR_SHARD_DIR, TENSOR_SHARD_SIZE
+
+# Usage:
+#   python build_shards.py [--output DIR] [--workers N] [--shard-size N]
+#
+# Preprocesses every image ingested with ingest_images.py once into
+# memory-mapped uint8 shards (see utils/tensor_shards.py). Rerunning skips
+# images already sharded, so it resumes an interrupted build and adds
+# newly ingested images.
+#
+# Everything runs under the __main__ guard because the worker processes
+# import this module again.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preprocess NIH images into memory-mapped tensor shards")
+    parser.add_argument("--output", default=TENSOR_SHARD_DIR)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Decode processes (default: CPU count)")
+    parser.add_argument("--shard-size", type=int, default=TENSOR_SHARD_SIZE,
+                        help="Images per shard (only for a new output directory)")
+    args = parser.parse_args()
+    
+    def images():
+        for _, rows in iter_query_batches(
+            "SELECT image_index, sha256, extension FROM nih_xray_images ORDER BY image_index",
+            batch_size=10000
+        ):
+            for image_index, digest, extension in rows:
+                yield image_index, object_path(digest, extension)
+    
+    def report(stats):
+        print(f"{stats['images']:,} image(s), {stats['images_per_second']:,.1f} images/s, "
+              f"{stats['errors']:,} error(s)")
+    
+    try:
+        stats = build_tensor_shards(images(), args.output, args.workers, args.shard_size, progress=report)
+    except Exception as e:
+        print(f"Shard build error: {e}")
+        sys.exit(1)
+    
+    print(f"Sharded {stats['images']:,} image(s) into {args.output} in {stats['seconds']:.1f}s "
+          f"({stats['images_per_second']:,.1f} images/s); {stats['skipped']:,} already done, "
+          f"{stats['errors']:,} error(s)")
+    if stats['last_error']:
+        print(f"  last error: {stats['last_error']}")
@@ -0,0 +1,62 @@
+import argparse
+import sys
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("Warning: python-dotenv not installed. Using environment variables directly.")
+
+from utils.data_handling import export_filtered_analyses, export_nih_metadata
+
+# Usage:
+#   python export_data.py analyses OUT [--format csv|parquet] [--patient-id ID] [--gender G]
+#                                      [--prediction P] [--min-age N] [--max-age N]
+#                                      [--min-confidence X] [--start-date D] [--end-date D]
+#   python export_data.py nih OUT [--format csv|parquet] [--condition FINDING]
+parser = argparse.ArgumentParser(description="Stream analysis results or NIH metadata to CSV or Parquet")
+parser.add_argument("dataset", choices=["analyses", "nih"])
+parser.add_argument("output")
+parser.add_argument("--format", choices=["csv", "parquet"], default=None,
+                    help="Output format (default: from the output file extension)")
+parser.add_argument("--batch-size", type=int, default=10000)
+parser.add_argument("--patient-id")
+parser.add_argument("--gender")
+parser.add_argument("--prediction")
+parser.add_argument("--min-age", type=int)
+parser.add_argument("--max-age", type=int)
+parser.add_argument("--min-confidence", type=float)
+parser.add_argument("--start-date")
+parser.add_argument("--end-date")
+parser.add_argument("--condition")
+args = parser.parse_args()
+
+export_format = args.format or ("parquet" if args.output.endswith(".parquet") else "csv")
+
+try:
+    if args.dataset == "analyses":
+        filters = {}
+        if args.patient_id:
+            filters['patient_id'] = args.patient_id
+        if args.gender:
+            filters['gender'] = args.gender
+        if args.prediction:
+            filters['prediction'] = args.prediction
+        if args.min_age is not None or args.max_age is not None:
+            filters['age_range'] = (
+                args.min_age if args.min_age is not None else 0,
+                args.max_age if args.max_age is not None else 120
+            )
+        if args.min_confidence is not None:
+            filters['confidence_threshold'] = args.min_confidence
+        if args.start_date or args.end_date:
+            filters['date_range'] = (args.start_date or "1900-01-01", args.end_date or "9999-12-31")
+        
+        count = export_filtered_analyses(filters, args.output, export_format, args.batch_size)
+    else:
+        count = export_nih_metadata(args.output, export_format, args.condition, args.batch_size)
+except Exception as e:
+    print(f"Export error: {e}")
+    sys.exit(1)
+
+print(f"Exported {count:,} row(s) to {args.output}")
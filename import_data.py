@@ -0,0 +1,52 @@
+import argparse
+import sys
+import time
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("Warning: python-dotenv not installed. Using environment variables directly.")
+
+from utils.database import bulk_load_nih, wait_for_nih_snapshot, NIH_IMPORT_WORKERS
+
+# Usage:
+#   python import_data.py metadata|bbox FILE [--workers N]
+#   python import_data.py metadata|bbox FILE --benchmark 1,2,4,8
+#
+# --benchmark only runs the parallel COPY into staging tables (nothing is
+# merged) once per worker count and reports the load rate of each
+parser = argparse.ArgumentParser(description="Bulk load an NIH metadata or bounding box CSV")
+parser.add_argument("dataset", choices=["metadata", "bbox"])
+parser.add_argument("input")
+parser.add_argument("--workers", type=int, default=NIH_IMPORT_WORKERS,
+                    help=f"Parallel COPY connections (default: {NIH_IMPORT_WORKERS})")
+parser.add_argument("--benchmark",
+                    help="Comma-separated worker counts to time without merging, e.g. 1,2,4,8")
+args = parser.parse_args()
+
+runs = [int(value) for value in args.benchmark.split(",")] if args.benchmark else [args.workers]
+
+results = []
+for workers in runs:
+    started = time.perf_counter()
+    try:
+        with open(args.input, "rb") as f:
+            count = bulk_load_nih(f, args.dataset, workers=workers, merge=not args.benchmark)
+    except Exception as e:
+        print(f"Import error: {e}")
+        sys.exit(1)
+    
+    elapsed = time.perf_counter() - started
+    results.append((workers, count, elapsed))
+    print(f"{workers} worker(s): {count:,} row(s) in {elapsed:.1f}s ({count / elapsed:,.0f} rows/s)")
+
+# The columnar snapshot is rewritten in the background after a merge
+if not args.benchmark:
+    wait_for_nih_snapshot()
+
+if args.benchmark and len(results) > 1:
+    base = results[0][2]
+    print("\nSpeed-up over", results[0][0], "worker(s):")
+    for workers, _, elapsed in results:
+        print(f"  {workers:>3}: {base / elapsed:.2f}x")
@@ -0,0 +1,63 @@
+import argparse
+import glob
+import sys
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("Warning: python-dotenv not installed. Using environment variables directly.")
+
+from utils.database import get_linked_nih_images, link_nih_images
+from utils.image_store import ingest_image_archives, IMAGE_STORE_DIR
+
+# Usage:
+#   python ingest_images.py ARCHIVE [ARCHIVE ...] [--workers N]
+#   python ingest_images.py "downloads/images_*.zip"
+#
+# Images are streamed out of the zip archives (nothing is extracted), stored
+# by content hash with a thumbnail pyramid and linked to nih_xray_metadata.
+# Import the metadata first. Rerunning skips images that are already linked,
+# so an interrupted ingest resumes where it stopped.
+#
+# Everything runs under the __main__ guard because the worker processes
+# import this module again.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest NIH image archives into the image store")
+    parser.add_argument("archives", nargs="+", help="Zip archives (glob patterns allowed)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Decode/thumbnail processes (default: CPU count)")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Process every image, even those already linked")
+    args = parser.parse_args()
+    
+    archives = sorted({path for pattern in args.archives for path in (glob.glob(pattern) or [pattern])})
+    
+    last_report = [0]
+    
+    def report(stats):
+        # About one line per thousand images
+        if stats["images"] - last_report[0] >= 1000:
+            last_report[0] = stats["images"]
+            print(f"{stats['images']:,} image(s), {stats['images_per_second']:,.1f} images/s, "
+                  f"{stats['linked']:,} linked, {stats['errors']:,} error(s)")
+    
+    try:
+        stats = ingest_image_archives(
+            archives,
+            workers=args.workers,
+            link=link_nih_images,
+            already_linked=None if args.no_resume else get_linked_nih_images,
+            progress=report
+        )
+    except Exception as e:
+        print(f"Ingest error: {e}")
+        sys.exit(1)
+    
+    print(f"Ingested {stats['images']:,} image(s) into {IMAGE_STORE_DIR} in {stats['seconds']:.1f}s "
+          f"({stats['images_per_second']:,.1f} images/s)")
+    print(f"  linked: {stats['linked']:,}  already done: {stats['skipped']:,}  errors: {stats['errors']:,}")
+    if stats['stored'] > stats['linked']:
+        print(f"  {stats['stored'] - stats['linked']:,} image(s) have no metadata yet; rerun after importing it")
+    if stats['last_error']:
+        print(f"  last error: {stats['last_error']}")
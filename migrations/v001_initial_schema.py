@@ -0,0 +1,56 @@
+"""
+Initial schema: NIH metadata, bounding boxes and analysis results
+"""
+
+DESCRIPTION = "Create nih_xray_metadata, nih_xray_bbox and analysis_results"
+
+UP = [
+    """
+    CREATE TABLE IF NOT EXISTS nih_xray_metadata (
+        image_index VARCHAR(255) PRIMARY KEY,
+        finding_labels TEXT,
+        follow_up_num INTEGER,
+        patient_id VARCHAR(255),
+        patient_age INTEGER,
+        patient_gender VARCHAR(10),
+        view_position VARCHAR(10),
+        original_image_width INTEGER,
+        original_image_height INTEGER,
+        original_image_pixel_spacing_x FLOAT,
+        original_image_pixel_spacing_y FLOAT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS nih_xray_bbox (
+        id SERIAL PRIMARY KEY,
+        image_index VARCHAR(255),
+        finding_label VARCHAR(255),
+        bbox_x INTEGER,
+        bbox_y INTEGER,
+        bbox_w INTEGER,
+        bbox_h INTEGER,
+        FOREIGN KEY (image_index) REFERENCES nih_xray_metadata(image_index) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS analysis_results (
+        id SERIAL PRIMARY KEY,
+        patient_id VARCHAR(255),
+        image_path TEXT,
+        prediction VARCHAR(255),
+        confidence FLOAT,
+        age INTEGER,
+        gender VARCHAR(10),
+        symptoms TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """
+]
+
+DOWN = [
+    "DROP TABLE IF EXISTS analysis_results",
+    "DROP TABLE IF EXISTS nih_xray_bbox",
+    "DROP TABLE IF EXISTS nih_xray_metadata"
+]
+
+CHECKS = []
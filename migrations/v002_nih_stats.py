@@ -0,0 +1,32 @@
+"""
+Materialized summary statistics for the NIH dataset
+"""
+
+DESCRIPTION = "Create nih_stats and nih_stats_refresh_log"
+
+UP = [
+    """
+    CREATE TABLE IF NOT EXISTS nih_stats (
+        scope VARCHAR(255),
+        dimension VARCHAR(50),
+        bucket VARCHAR(255),
+        count BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (scope, dimension, bucket)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS nih_stats_refresh_log (
+        id SERIAL PRIMARY KEY,
+        mode VARCHAR(20),
+        rows_touched INTEGER,
+        refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """
+]
+
+DOWN = [
+    "DROP TABLE IF EXISTS nih_stats_refresh_log",
+    "DROP TABLE IF EXISTS nih_stats"
+]
+
+CHECKS = []
@@ -0,0 +1,65 @@
+"""
+Secondary indexes for the dashboard, similar-case and bounding box lookups
+"""
+
+DESCRIPTION = "Add composite indexes on analysis_results and nih_xray_bbox"
+
+UP = [
+    # filter_analyses / get_similar_cases_from_db: equality on prediction and
+    # gender, range on age, newest first
+    """
+    CREATE INDEX IF NOT EXISTS idx_analysis_results_prediction_gender_age_ts
+    ON analysis_results (prediction, gender, age, timestamp DESC)
+    """,
+    # get_analysis_results and date-range filters
+    """
+    CREATE INDEX IF NOT EXISTS idx_analysis_results_timestamp
+    ON analysis_results (timestamp DESC)
+    """,
+    # Patient lookups on the dashboard
+    """
+    CREATE INDEX IF NOT EXISTS idx_analysis_results_patient_id
+    ON analysis_results (patient_id, timestamp DESC)
+    """,
+    # Bounding boxes for an image (also the FK to nih_xray_metadata)
+    """
+    CREATE INDEX IF NOT EXISTS idx_nih_xray_bbox_image_index
+    ON nih_xray_bbox (image_index)
+    """
+]
+
+DOWN = [
+    "DROP INDEX IF EXISTS idx_nih_xray_bbox_image_index",
+    "DROP INDEX IF EXISTS idx_analysis_results_patient_id",
+    "DROP INDEX IF EXISTS idx_analysis_results_timestamp",
+    "DROP INDEX IF EXISTS idx_analysis_results_prediction_gender_age_ts"
+]
+
+# Each check is EXPLAINed after the migration is applied and must reach the
+# named index
+CHECKS = [
+    {
+        "query": """
+            SELECT * FROM analysis_results
+            WHERE prediction = %s AND age BETWEEN %s AND %s AND gender = %s
+            ORDER BY timestamp DESC LIMIT 5
+        """,
+        "params": ("Pneumonia", 40, 60, "Female"),
+        "index": "idx_analysis_results_prediction_gender_age_ts"
+    },
+    {
+        "query": "SELECT * FROM analysis_results ORDER BY timestamp DESC LIMIT 100",
+        "params": (),
+        "index": "idx_analysis_results_timestamp"
+    },
+    {
+        "query": "SELECT * FROM analysis_results WHERE patient_id = %s ORDER BY timestamp DESC",
+        "params": ("P-0001",),
+        "index": "idx_analysis_results_patient_id"
+    },
+    {
+        "query": "SELECT * FROM nih_xray_bbox WHERE image_index = %s",
+        "params": ("00000001_000.png",),
+        "index": "idx_nih_xray_bbox_image_index"
+    }
+]
@@ -0,0 +1,151 @@
+"""
+Monthly range partitioning of analysis_results on timestamp
+"""
+import datetime
+
+DESCRIPTION = "Convert analysis_results to a monthly range-partitioned table"
+
+# Creates the monthly partitions from start_month up to months_ahead months
+# after the current one. Rows that already landed in the default partition
+# for a new month are moved into it before it is attached.
+ENSURE_PARTITIONS_FUNCTION = """
+    CREATE OR REPLACE FUNCTION ensure_analysis_results_partitions(start_month DATE, months_ahead INTEGER)
+    RETURNS INTEGER AS $$
+    DECLARE
+        month_start DATE := date_trunc('month', start_month)::date;
+        last_month DATE := (date_trunc('month', CURRENT_DATE) + make_interval(months => months_ahead))::date;
+        month_end DATE;
+        partition_name TEXT;
+        created INTEGER := 0;
+    BEGIN
+        WHILE month_start <= last_month LOOP
+            month_end := (month_start + INTERVAL '1 month')::date;
+            partition_name := 'analysis_results_' || to_char(month_start, '"y"YYYY"m"MM');
+            
+            IF to_regclass(partition_name) IS NULL THEN
+                EXECUTE format('CREATE TABLE %I (LIKE analysis_results INCLUDING DEFAULTS)', partition_name);
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM analysis_results_default WHERE timestamp >= %L AND timestamp < %L RETURNING *) '
+                    'INSERT INTO %I SELECT * FROM moved',
+                    month_start, month_end, partition_name
+                );
+                EXECUTE format(
+                    'ALTER TABLE analysis_results ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, month_end
+                );
+                created := created + 1;
+            END IF;
+            
+            month_start := month_end;
+        END LOOP;
+        
+        RETURN created;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+INDEXES = [
+    """
+    CREATE INDEX IF NOT EXISTS idx_analysis_results_prediction_gender_age_ts
+    ON analysis_results (prediction, gender, age, timestamp DESC)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_analysis_results_timestamp
+    ON analysis_results (timestamp DESC)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_analysis_results_patient_id
+    ON analysis_results (patient_id, timestamp DESC)
+    """
+]
+
+UP = [
+    # Keep the id sequence alive when the old table is dropped
+    "ALTER SEQUENCE analysis_results_id_seq OWNED BY NONE",
+    "ALTER TABLE analysis_results RENAME TO analysis_results_unpartitioned",
+    """
+    CREATE TABLE analysis_results (
+        id INTEGER NOT NULL DEFAULT nextval('analysis_results_id_seq'),
+        patient_id VARCHAR(255),
+        image_path TEXT,
+        prediction VARCHAR(255),
+        confidence FLOAT,
+        age INTEGER,
+        gender VARCHAR(10),
+        symptoms TEXT,
+        timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id, timestamp)
+    ) PARTITION BY RANGE (timestamp)
+    """,
+    "CREATE TABLE analysis_results_default PARTITION OF analysis_results DEFAULT",
+    ENSURE_PARTITIONS_FUNCTION,
+    """
+    SELECT ensure_analysis_results_partitions(
+        COALESCE((SELECT MIN(timestamp) FROM analysis_results_unpartitioned)::date, CURRENT_DATE),
+        3
+    )
+    """,
+    """
+    INSERT INTO analysis_results
+    (id, patient_id, image_path, prediction, confidence, age, gender, symptoms, timestamp)
+    SELECT id, patient_id, image_path, prediction, confidence, age, gender, symptoms,
+           COALESCE(timestamp, CURRENT_TIMESTAMP)
+    FROM analysis_results_unpartitioned
+    """,
+    "DROP TABLE analysis_results_unpartitioned",
+    "ALTER SEQUENCE analysis_results_id_seq OWNED BY analysis_results.id"
+] + INDEXES
+
+DOWN = [
+    "ALTER SEQUENCE analysis_results_id_seq OWNED BY NONE",
+    "ALTER TABLE analysis_results RENAME TO analysis_results_partitioned",
+    """
+    CREATE TABLE analysis_results (
+        id INTEGER PRIMARY KEY DEFAULT nextval('analysis_results_id_seq'),
+        patient_id VARCHAR(255),
+        image_path TEXT,
+        prediction VARCHAR(255),
+        confidence FLOAT,
+        age INTEGER,
+        gender VARCHAR(10),
+        symptoms TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    INSERT INTO analysis_results
+    (id, patient_id, image_path, prediction, confidence, age, gender, symptoms, timestamp)
+    SELECT id, patient_id, image_path, prediction, confidence, age, gender, symptoms, timestamp
+    FROM analysis_results_partitioned
+    """,
+    "DROP TABLE analysis_results_partitioned",
+    "DROP FUNCTION IF EXISTS ensure_analysis_results_partitions(DATE, INTEGER)",
+    "ALTER SEQUENCE analysis_results_id_seq OWNED BY analysis_results.id"
+] + INDEXES
+
+_this_month = datetime.date.today().replace(day=1)
+_next_month = (_this_month + datetime.timedelta(days=32)).replace(day=1)
+
+CHECKS = [
+    {
+        "query": """
+            SELECT * FROM analysis_results
+            WHERE prediction = %s AND age BETWEEN %s AND %s AND gender = %s
+            ORDER BY timestamp DESC LIMIT 5
+        """,
+        "params": ("Pneumonia", 40, 60, "Female"),
+        "index": "idx_analysis_results_prediction_gender_age_ts"
+    },
+    {
+        "query": "SELECT * FROM analysis_results ORDER BY timestamp DESC LIMIT 100",
+        "params": (),
+        "index": "idx_analysis_results_timestamp"
+    },
+    {
+        # A one-month date filter must be pruned down to a single partition
+        "query": "SELECT * FROM analysis_results WHERE timestamp >= %s AND timestamp < %s",
+        "params": (_this_month, _next_month),
+        "index": "idx_analysis_results_timestamp",
+        "max_partitions": 1
+    }
+]
@@ -0,0 +1,42 @@
+"""
+Index for keyset pagination of analysis_results on (timestamp, id)
+"""
+import datetime
+
+DESCRIPTION = "Replace the timestamp index with a (timestamp, id) keyset index"
+
+UP = [
+    # Scanned backwards for newest-first pages; also serves plain timestamp
+    # ordering and date-range filters, so the single-column index goes
+    """
+    CREATE INDEX IF NOT EXISTS idx_analysis_results_timestamp_id
+    ON analysis_results (timestamp, id)
+    """,
+    "DROP INDEX IF EXISTS idx_analysis_results_timestamp"
+]
+
+DOWN = [
+    """
+    CREATE INDEX IF NOT EXISTS idx_analysis_results_timestamp
+    ON analysis_results (timestamp DESC)
+    """,
+    "DROP INDEX IF EXISTS idx_analysis_results_timestamp_id"
+]
+
+CHECKS = [
+    {
+        "query": """
+            SELECT * FROM analysis_results
+            WHERE (timestamp, id) < (%s, %s)
+            ORDER BY timestamp DESC, id DESC
+            LIMIT 51
+        """,
+        "params": (datetime.datetime.now(), 2 ** 31 - 1),
+        "index": "idx_analysis_results_timestamp_id"
+    },
+    {
+        "query": "SELECT * FROM analysis_results ORDER BY timestamp DESC, id DESC LIMIT 100",
+        "params": (),
+        "index": "idx_analysis_results_timestamp_id"
+    }
+]
@@ -0,0 +1,50 @@
+"""
+Daily rollup of analysis_results for the dashboard
+"""
+
+DESCRIPTION = "Create analysis_daily_rollup and backfill it from analysis_results"
+
+# Unknown prediction/gender are stored as '' and unknown age as bucket -1 so
+# every dimension can be part of the primary key
+UP = [
+    """
+    CREATE TABLE IF NOT EXISTS analysis_daily_rollup (
+        day DATE NOT NULL,
+        prediction VARCHAR(255) NOT NULL DEFAULT '',
+        gender VARCHAR(10) NOT NULL DEFAULT '',
+        age_bucket INTEGER NOT NULL DEFAULT -1,
+        analyses BIGINT NOT NULL DEFAULT 0,
+        confidence_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, prediction, gender, age_bucket)
+    )
+    """,
+    """
+    INSERT INTO analysis_daily_rollup (day, prediction, gender, age_bucket, analyses, confidence_sum)
+    SELECT
+        timestamp::date,
+        COALESCE(prediction, ''),
+        COALESCE(gender, ''),
+        COALESCE(floor(age / 5.0)::int * 5, -1),
+        COUNT(*),
+        COALESCE(SUM(confidence), 0)
+    FROM analysis_results
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT DO NOTHING
+    """
+]
+
+DOWN = [
+    "DROP TABLE IF EXISTS analysis_daily_rollup"
+]
+
+CHECKS = [
+    {
+        "query": """
+            SELECT prediction, SUM(analyses) FROM analysis_daily_rollup
+            WHERE day BETWEEN %s AND %s
+            GROUP BY prediction
+        """,
+        "params": ("2024-01-01", "2024-03-31"),
+        "index": "analysis_daily_rollup_pkey"
+    }
+]
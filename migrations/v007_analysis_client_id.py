@@ -0,0 +1,32 @@
+"""
+Client-generated id on analysis_results so batched writes can be replayed
+"""
+
+DESCRIPTION = "Add analysis_results.client_id with a unique (client_id, timestamp) index"
+
+# The write-behind queue tags every analysis with a UUID when it is created
+# and sends the analysis timestamp along, so replaying a journal after a
+# crash hits ON CONFLICT DO NOTHING instead of inserting duplicates. Unique
+# indexes on a partitioned table must include the partition key, hence
+# (client_id, timestamp). Rows saved without a client_id stay NULL and never
+# conflict.
+UP = [
+    "ALTER TABLE analysis_results ADD COLUMN IF NOT EXISTS client_id UUID",
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_analysis_results_client_id
+    ON analysis_results (client_id, timestamp)
+    """
+]
+
+DOWN = [
+    "DROP INDEX IF EXISTS idx_analysis_results_client_id",
+    "ALTER TABLE analysis_results DROP COLUMN IF EXISTS client_id"
+]
+
+CHECKS = [
+    {
+        "query": "SELECT id, client_id FROM analysis_results WHERE client_id = ANY(%s::uuid[])",
+        "params": (["00000000-0000-0000-0000-000000000000"],),
+        "index": "idx_analysis_results_client_id"
+    }
+]
@@ -0,0 +1,51 @@
+"""
+Background import jobs with progress tracking
+"""
+
+DESCRIPTION = "Create import_jobs with one active job per kind"
+
+# Imports run in a background thread and report progress here so every
+# session can follow (and cancel) the same job. updated_at doubles as the
+# heartbeat: a queued/running job that stops updating was abandoned by a
+# process that went away. The partial unique index allows only one active
+# job of each kind, so two users pressing "import" get the same job.
+UP = [
+    """
+    CREATE TABLE IF NOT EXISTS import_jobs (
+        id SERIAL PRIMARY KEY,
+        kind VARCHAR(50) NOT NULL,
+        status VARCHAR(20) NOT NULL DEFAULT 'queued',
+        params JSONB,
+        rows_processed BIGINT NOT NULL DEFAULT 0,
+        rows_total BIGINT,
+        bytes_processed BIGINT NOT NULL DEFAULT 0,
+        bytes_total BIGINT,
+        error_count INTEGER NOT NULL DEFAULT 0,
+        message TEXT,
+        result JSONB,
+        cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        started_at TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        finished_at TIMESTAMP
+    )
+    """,
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_import_jobs_active
+    ON import_jobs (kind)
+    WHERE status IN ('queued', 'running')
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_import_jobs_created_at ON import_jobs (created_at DESC)"
+]
+
+DOWN = [
+    "DROP TABLE IF EXISTS import_jobs"
+]
+
+CHECKS = [
+    {
+        "query": "SELECT id FROM import_jobs WHERE kind = %s AND status IN ('queued', 'running')",
+        "params": ("nih_kaggle",),
+        "index": "idx_import_jobs_active"
+    }
+]
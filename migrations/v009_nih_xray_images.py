@@ -0,0 +1,40 @@
+"""
+Links from NIH metadata records to images in the content-addressed store
+"""
+
+DESCRIPTION = "Create nih_xray_images linking image_index to stored image content"
+
+# One row per ingested NIH image. The image itself lives in the image store
+# under its SHA-256 and original file extension (utils.image_store), so
+# identical files are stored once and the row only records where to find it
+# and what it looked like. Rows are written only for images whose metadata
+# exists, which also makes them the resume point of an interrupted archive
+# ingest.
+UP = [
+    """
+    CREATE TABLE IF NOT EXISTS nih_xray_images (
+        image_index VARCHAR(255) PRIMARY KEY REFERENCES nih_xray_metadata(image_index),
+        sha256 CHAR(64) NOT NULL,
+        extension VARCHAR(10) NOT NULL DEFAULT '.png',
+        width INTEGER,
+        height INTEGER,
+        mode VARCHAR(10),
+        size_bytes BIGINT,
+        archive VARCHAR(255),
+        ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_nih_xray_images_sha256 ON nih_xray_images (sha256)"
+]
+
+DOWN = [
+    "DROP TABLE IF EXISTS nih_xray_images"
+]
+
+CHECKS = [
+    {
+        "query": "SELECT image_index FROM nih_xray_images WHERE sha256 = %s",
+        "params": ("0" * 64,),
+        "index": "idx_nih_xray_images_sha256"
+    }
+]
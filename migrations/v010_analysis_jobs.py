@@ -0,0 +1,61 @@
+"""
+Queue of image analyses drained by analysis_worker.py processes
+"""
+
+DESCRIPTION = "Create analysis_jobs queue claimed with FOR UPDATE SKIP LOCKED"
+
+# The upload page inserts a job (with the image itself, so workers on other
+# hosts need no shared disk) and returns; workers claim queued jobs with
+# SELECT ... FOR UPDATE SKIP LOCKED, so any number of them can drain the
+# queue without claiming the same job twice. heartbeat_at lets a worker
+# requeue jobs of a worker that died mid-batch. The partial index keeps the
+# claim query on the handful of queued rows however long the history gets.
+UP = [
+    """
+    CREATE TABLE IF NOT EXISTS analysis_jobs (
+        id BIGSERIAL PRIMARY KEY,
+        client_id UUID NOT NULL UNIQUE,
+        status VARCHAR(20) NOT NULL DEFAULT 'queued',
+        file_name VARCHAR(255) NOT NULL,
+        image_data BYTEA,
+        image_path TEXT,
+        patient_id VARCHAR(255),
+        age INTEGER,
+        gender VARCHAR(10),
+        symptoms TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        worker VARCHAR(255),
+        error TEXT,
+        analysis_id INTEGER,
+        prediction VARCHAR(255),
+        confidence FLOAT,
+        gradcam_png BYTEA,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        started_at TIMESTAMP,
+        heartbeat_at TIMESTAMP,
+        finished_at TIMESTAMP
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_analysis_jobs_queued
+    ON analysis_jobs (id)
+    WHERE status = 'queued'
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_analysis_jobs_running
+    ON analysis_jobs (heartbeat_at)
+    WHERE status = 'running'
+    """
+]
+
+DOWN = [
+    "DROP TABLE IF EXISTS analysis_jobs"
+]
+
+CHECKS = [
+    {
+        "query": "SELECT id FROM analysis_jobs WHERE status = 'queued' ORDER BY id LIMIT %s",
+        "params": (8,),
+        "index": "idx_analysis_jobs_queued"
+    }
+]
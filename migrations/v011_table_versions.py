@@ -0,0 +1,26 @@
+"""
+Shared table version counters for query cache invalidation
+"""
+
+DESCRIPTION = "Create table_versions bumped by every cached-table write"
+
+# utils.query_cache keys cached results by the versions of the tables they
+# were read from. Keeping the counters here instead of in each process lets
+# a write from a CLI import, an analysis worker or another app process
+# invalidate every process's cache: writers bump the row in their own
+# transaction, readers fetch the few rows at most once a second.
+UP = [
+    """
+    CREATE TABLE IF NOT EXISTS table_versions (
+        table_name VARCHAR(255) PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """
+]
+
+DOWN = [
+    "DROP TABLE IF EXISTS table_versions"
+]
+
+CHECKS = []
@@ -5,6 +5,7 @@ import uuid
 from datetime import datetime
 from utils.image_processing import process_uploaded_file
 from utils.data_handling import initialize_session_state
+from utils.analysis_jobs import enqueue_analysis_job, get_analysis_jobs
 
 def app():
     st.title("Upload Medical Images")
@@ -107,9 +108,47 @@ def app():
             if st.button("Proceed to Patient Data"):
                 st.session_state.current_page = "patient_data"
                 st.rerun()
+            
+            # Or hand the image to the analysis workers and carry on uploading.
+            # No patient data has been entered for this upload (the session's
+            # may belong to an earlier image), so the worker takes it from the
+            # DICOM header.
+            if st.button("Queue for Background Analysis"):
+                job = enqueue_analysis_job(
+                    uploaded_file.getvalue(),
+                    uploaded_file.name,
+                    None,
+                    temp_path
+                )
+                if job:
+                    st.session_state.queued_analysis_jobs.append(job['id'])
+                    st.success(f"Queued as analysis job {job['id']}. Results appear below once a worker has processed it.")
+                    st.caption("Patient details are read from the DICOM header, if present.")
         else:
             st.error("Failed to process the uploaded image. Please try another file.")
     
+    # Background analyses queued from this session
+    if st.session_state.queued_analysis_jobs:
+        st.markdown("## Queued Analyses")
+        
+        if st.button("Refresh Status"):
+            st.rerun()
+        
+        for job in get_analysis_jobs(st.session_state.queued_analysis_jobs):
+            with st.container(border=True):
+                job_col1, job_col2 = st.columns([2, 1])
+                with job_col1:
+                    st.markdown(f"**Job {job['id']}** · {job['file_name']} · patient {job['patient_id'] or 'pending'}")
+                    if job['status'] == 'done':
+                        st.markdown(f"**Diagnosis:** {job['prediction']} (confidence {job['confidence']:.2f})")
+                    elif job['status'] == 'failed':
+                        st.error(f"Failed: {job['error']}")
+                    else:
+                        st.info(f"Status: {job['status']}")
+                with job_col2:
+                    if job['gradcam_png']:
+                        st.image(bytes(job['gradcam_png']), caption="AI Attention Map", use_column_width=True)
+    
     # Information about supported formats
     with st.expander("Supported Image Formats"):
         st.markdown("""
@@ -9,6 +9,7 @@ from utils.model import predict
 from utils.data_handling import initialize_session_state, save_analysis_result
 from utils.visualization import overlay_heatmap_on_image, create_prediction_bar_chart
 from assets.grad_cam import generate_gradcam
+from utils.inference_client import inference_server_enabled, remote_predict
 
 def app():
     st.title("Image Analysis")
@@ -78,23 +79,31 @@ def app():
         if start_analysis:
             with st.spinner("Running AI analysis... Please wait while our model examines the image."):
                 try:
-                    # Preprocess the image
-                    image_tensor = preprocess_image_for_model(st.session_state.current_image_array)
-                    
-                    # Make prediction
-                    class_idx, class_label, confidence = predict(
-                        st.session_state.model,
-                        image_tensor,
-                        st.session_state.device
-                    )
-                    
-                    # Generate Grad-CAM
-                    gradcam = generate_gradcam(
-                        st.session_state.model,
-                        image_tensor,
-                        class_idx,
-                        st.session_state.device
-                    )
+                    if inference_server_enabled():
+                        # Prediction and Grad-CAM run on the inference server
+                        result = remote_predict(st.session_state.current_image_array, gradcam=True)
+                        class_idx = result['class_idx']
+                        class_label = result['class_label']
+                        confidence = result['confidence']
+                        gradcam = result['heatmap']
+                    else:
+                        # Preprocess the image
+                        image_tensor = preprocess_image_for_model(st.session_state.current_image_array)
+                        
+                        # Make prediction
+                        class_idx, class_label, confidence = predict(
+                            st.session_state.model,
+                            image_tensor,
+                            st.session_state.device
+                        )
+                        
+                        # Generate Grad-CAM
+                        gradcam = generate_gradcam(
+                            st.session_state.model,
+                            image_tensor,
+                            class_idx,
+                            st.session_state.device
+                        )
                     
                     # Overlay Grad-CAM on image
                     overlay = overlay_heatmap_on_image(
@@ -9,7 +9,15 @@ from utils.visualization import (
     create_diagnosis_distribution_chart,
     create_confidence_histogram,
     create_age_vs_diagnosis_chart,
-    create_gender_vs_diagnosis_chart
+    create_gender_vs_diagnosis_chart,
+    create_patient_demographics_chart_from_counts,
+    create_age_distribution_chart_from_counts,
+    create_diagnosis_distribution_chart_from_counts,
+    create_confidence_histogram_from_counts,
+    create_age_vs_diagnosis_chart_from_quantiles,
+    create_age_vs_diagnosis_chart_from_counts,
+    create_gender_vs_diagnosis_chart_from_counts,
+    create_mean_confidence_chart
 )
 
 def app():
@@ -18,13 +26,20 @@ def app():
     # Initialize session state
     initialize_session_state()
     
-    # Try to get analyses from database first, then fallback to session state
+    # Try to use the database first, then fallback to session state. Only the
+    # filter options are loaded up front; rows are fetched per page.
+    analyses_df = pd.DataFrame()
+    filter_options = None
     try:
-        from utils.database import get_analysis_results, filter_analyses as db_filter_analyses
-        db_analyses = get_analysis_results(limit=100)
-        if db_analyses and len(db_analyses) > 0:
+        from utils.database import (
+            get_analysis_filter_options,
+            get_analysis_page,
+            get_dashboard_aggregates,
+            run_concurrently
+        )
+        filter_options = get_analysis_filter_options()
+        if filter_options and filter_options['total'] > 0:
             st.success("Successfully loaded analysis data from database.")
-            analyses_df = pd.DataFrame(db_analyses)
             # We'll use database filtering later
             use_db_filtering = True
         else:
@@ -37,7 +52,7 @@ def app():
         analyses_df = get_analyses_df()
         use_db_filtering = False
     
-    if analyses_df.empty:
+    if not use_db_filtering and analyses_df.empty:
         st.warning("No analyses have been performed yet. Start by uploading an image.")
         if st.button("Go to Upload Page"):
             st.switch_page("pages/01_upload.py")
@@ -73,20 +88,32 @@ def app():
     # Patient filters section
     st.sidebar.markdown("### Patient Filters")
     
+    # Filter values come from the database summary or the local analyses
+    if use_db_filtering:
+        total_analyses = filter_options['total']
+        gender_values = filter_options['genders']
+        diagnosis_values = filter_options['predictions']
+        age_min = int(filter_options['min_age'] or 0)
+        age_max = int(filter_options['max_age'] or 100)
+    else:
+        total_analyses = len(analyses_df)
+        gender_values = sorted(analyses_df['gender'].unique().tolist())
+        diagnosis_values = sorted(analyses_df['prediction'].unique().tolist())
+        age_min = int(pd.to_numeric(analyses_df['age'], errors='coerce').min() or 0)
+        age_max = int(pd.to_numeric(analyses_df['age'], errors='coerce').max() or 100)
+    
     # Gender filter with icons
-    gender_options = ["All"] + sorted(analyses_df['gender'].unique().tolist())
+    gender_options = ["All"] + gender_values
     selected_gender = st.sidebar.selectbox("Gender", gender_options)
     
     # Age range filter with improved appearance
-    age_min = int(pd.to_numeric(analyses_df['age'], errors='coerce').min() or 0)
-    age_max = int(pd.to_numeric(analyses_df['age'], errors='coerce').max() or 100)
     selected_age_range = st.sidebar.slider("Age Range (years)", age_min, age_max, (age_min, age_max))
     
     # Diagnosis filters section
     st.sidebar.markdown("### Diagnostic Filters")
     
     # Diagnosis filter with color indicators
-    diagnosis_options = ["All"] + sorted(analyses_df['prediction'].unique().tolist())
+    diagnosis_options = ["All"] + diagnosis_values
     selected_diagnosis = st.sidebar.selectbox("Diagnosis", diagnosis_options)
     
     # Confidence threshold filter with better description
@@ -96,7 +123,19 @@ def app():
     filters = {}
     
     # Add date filter if we have timestamps
-    if 'timestamp' in analyses_df.columns:
+    if use_db_filtering and filter_options['min_day']:
+        st.sidebar.markdown("### Temporal Filters")
+        min_date = filter_options['min_day']
+        max_date = filter_options['max_day']
+        selected_date_range = st.sidebar.date_input(
+            "Date Range",
+            [min_date, max_date],
+            min_value=min_date,
+            max_value=max_date
+        )
+        if len(selected_date_range) == 2:
+            filters['date_range'] = selected_date_range
+    elif 'timestamp' in analyses_df.columns:
         st.sidebar.markdown("### Temporal Filters")
         # Convert timestamps to datetime if they're strings
         if analyses_df['timestamp'].dtype == 'object':
@@ -128,17 +167,39 @@ def app():
     if confidence_threshold > 0:
         filters['confidence_threshold'] = confidence_threshold
     
-    # Use appropriate filtering method based on data source
-    if 'use_db_filtering' in locals() and use_db_filtering:
-        try:
-            # Use database filtering when possible
-            filtered_df = pd.DataFrame(db_filter_analyses(filters))
-        except Exception as e:
-            st.warning(f"Database filtering failed, using local filtering. Error: {str(e)}")
-            filtered_df = filter_analyses(analyses_df, filters)
+    # Use appropriate filtering method based on data source. The database
+    # path only returns binned counts; raw rows are fetched per page below.
+    aggregates = None
+    page = None
+    filtered_df = pd.DataFrame()
+    if use_db_filtering:
+        # Fetch one page at a time; the stack holds the cursor of every
+        # page visited so far so we can step back
+        filters_key = repr(sorted(filters.items()))
+        if st.session_state.get('dashboard_page_filters') != filters_key:
+            st.session_state.dashboard_page_filters = filters_key
+            st.session_state.dashboard_page_cursors = [None]
+        cursors = st.session_state.dashboard_page_cursors
+        page_size = st.session_state.get('dashboard_page_size', 50)
+        
+        # The aggregates and the current page are independent, so fetch
+        # them side by side
+        results = run_concurrently({
+            "aggregates": (get_dashboard_aggregates, filters, (age_min, age_max)),
+            "page": (get_analysis_page, filters, page_size, cursors[-1])
+        })
+        aggregates = results['aggregates']
+        page = results['page']
+        if aggregates is None:
+            st.warning("Database aggregation failed; charts are unavailable.")
+            aggregates = {"total": 0, "prediction_counts": {}}
+        filtered_count = aggregates['total']
+        normal_count = aggregates['prediction_counts'].get('Normal', 0)
     else:
         # Use local filtering
         filtered_df = filter_analyses(analyses_df, filters)
+        filtered_count = len(filtered_df)
+        normal_count = filtered_df[filtered_df['prediction'] == 'Normal'].shape[0] if not filtered_df.empty else 0
     
     # Display summary metrics
     st.markdown("## Summary Metrics")
@@ -146,31 +207,54 @@ def app():
     metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
     
     with metric_col1:
-        st.metric("Total Analyses", len(analyses_df))
+        st.metric("Total Analyses", total_analyses)
     
     with metric_col2:
-        st.metric("Filtered Analyses", len(filtered_df))
+        st.metric("Filtered Analyses", filtered_count)
     
     with metric_col3:
-        if not filtered_df.empty:
-            normal_count = filtered_df[filtered_df['prediction'] == 'Normal'].shape[0]
-            normal_percentage = normal_count / len(filtered_df) * 100
+        if filtered_count:
+            normal_percentage = normal_count / filtered_count * 100
             st.metric("Normal Cases", f"{normal_count} ({normal_percentage:.1f}%)")
         else:
             st.metric("Normal Cases", "0 (0.0%)")
     
     with metric_col4:
-        if not filtered_df.empty:
-            abnormal_count = filtered_df[filtered_df['prediction'] != 'Normal'].shape[0]
-            abnormal_percentage = abnormal_count / len(filtered_df) * 100
+        if filtered_count:
+            abnormal_count = filtered_count - normal_count
+            abnormal_percentage = abnormal_count / filtered_count * 100
             st.metric("Abnormal Cases", f"{abnormal_count} ({abnormal_percentage:.1f}%)")
         else:
             st.metric("Abnormal Cases", "0 (0.0%)")
     
     # Display filtered data
     with st.expander("View Data", expanded=False):
-        if not filtered_df.empty:
-            display_columns = ['patient_id', 'age', 'gender', 'prediction', 'confidence', 'timestamp']
+        display_columns = ['patient_id', 'age', 'gender', 'prediction', 'confidence', 'timestamp']
+        
+        if use_db_filtering:
+            # The page itself was fetched above together with the aggregates
+            st.selectbox("Rows per page", [25, 50, 100, 250], index=1, key='dashboard_page_size')
+            
+            if page['rows']:
+                st.dataframe(pd.DataFrame(page['rows'])[display_columns], use_container_width=True)
+            else:
+                st.info("No data matches the selected filters.")
+            
+            page_col1, page_col2, page_col3 = st.columns([1, 1, 2])
+            
+            with page_col1:
+                if st.button("Previous Page", disabled=len(cursors) == 1):
+                    cursors.pop()
+                    st.rerun()
+            
+            with page_col2:
+                if st.button("Next Page", disabled=page['next_cursor'] is None):
+                    cursors.append(page['next_cursor'])
+                    st.rerun()
+            
+            with page_col3:
+                st.caption(f"Page {len(cursors)}")
+        elif not filtered_df.empty:
             st.dataframe(filtered_df[display_columns], use_container_width=True)
         else:
             st.info("No data matches the selected filters.")
@@ -178,7 +262,83 @@ def app():
     # Visualizations
     st.markdown("## Visualizations")
     
-    if not filtered_df.empty:
+    if aggregates and aggregates['total'] and aggregates.get('source') == 'rollup':
+        # Charts built from the daily rollup table
+        st.caption("Charts served from the daily rollup (ages in 5-year groups).")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            diagnosis_chart = create_diagnosis_distribution_chart_from_counts(aggregates['prediction_counts'])
+            if diagnosis_chart:
+                st.plotly_chart(diagnosis_chart, use_container_width=True)
+        
+        with col2:
+            gender_chart = create_patient_demographics_chart_from_counts(aggregates['gender_counts'])
+            if gender_chart:
+                st.plotly_chart(gender_chart, use_container_width=True)
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            age_chart = create_age_distribution_chart_from_counts(aggregates['age_group_counts'])
+            if age_chart:
+                st.plotly_chart(age_chart, use_container_width=True)
+        
+        with col2:
+            confidence_chart = create_mean_confidence_chart(aggregates['mean_confidence'])
+            if confidence_chart:
+                st.plotly_chart(confidence_chart, use_container_width=True)
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            age_vs_diagnosis = create_age_vs_diagnosis_chart_from_counts(aggregates['prediction_age_counts'])
+            if age_vs_diagnosis:
+                st.plotly_chart(age_vs_diagnosis, use_container_width=True)
+        
+        with col2:
+            gender_vs_diagnosis = create_gender_vs_diagnosis_chart_from_counts(aggregates['gender_prediction_counts'])
+            if gender_vs_diagnosis:
+                st.plotly_chart(gender_vs_diagnosis, use_container_width=True)
+    elif aggregates and aggregates['total']:
+        # Charts built from the server-side rollups
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            diagnosis_chart = create_diagnosis_distribution_chart_from_counts(aggregates['prediction_counts'])
+            if diagnosis_chart:
+                st.plotly_chart(diagnosis_chart, use_container_width=True)
+        
+        with col2:
+            gender_chart = create_patient_demographics_chart_from_counts(aggregates['gender_counts'])
+            if gender_chart:
+                st.plotly_chart(gender_chart, use_container_width=True)
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            age_chart = create_age_distribution_chart_from_counts(aggregates['age_group_counts'])
+            if age_chart:
+                st.plotly_chart(age_chart, use_container_width=True)
+        
+        with col2:
+            confidence_chart = create_confidence_histogram_from_counts(aggregates['confidence_bins'])
+            if confidence_chart:
+                st.plotly_chart(confidence_chart, use_container_width=True)
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            age_vs_diagnosis = create_age_vs_diagnosis_chart_from_quantiles(aggregates['age_quantiles'])
+            if age_vs_diagnosis:
+                st.plotly_chart(age_vs_diagnosis, use_container_width=True)
+        
+        with col2:
+            gender_vs_diagnosis = create_gender_vs_diagnosis_chart_from_counts(aggregates['gender_prediction_counts'])
+            if gender_vs_diagnosis:
+                st.plotly_chart(gender_vs_diagnosis, use_container_width=True)
+    elif not filtered_df.empty:
         # First row of charts
         col1, col2 = st.columns(2)
         
@@ -4,15 +4,19 @@ import plotly.express as px
 import plotly.graph_objects as go
 import os
 import io
+import time
 import requests
 from utils.database import (
     get_nih_dataset_stats,
-    get_nih_sample_records,
+    sample_nih_records,
+    NIH_SAMPLE_METHODS,
     import_nih_metadata,
     import_bbox_data,
-    get_condition_insights
+    get_condition_insights,
+    refresh_nih_stats
 )
 from utils.data_handling import initialize_session_state
+from utils.nih_index import get_nih_index
 
 def app():
     st.title("NIH Chest X-ray Dataset Integration")
@@ -43,6 +47,12 @@ def app():
         # Get dataset statistics from database
         stats = get_nih_dataset_stats()
         
+        # Show where the numbers come from and how fresh they are
+        if stats.get('refreshed_at'):
+            st.caption(f"Precomputed statistics, last refreshed {stats['refreshed_at']:%Y-%m-%d %H:%M:%S}")
+        else:
+            st.caption("Statistics computed live (summary tables not built yet)")
+        
         # Display summary metrics
         st.markdown("#### Dataset Summary")
         
@@ -150,6 +160,24 @@ def app():
             )
             
             st.plotly_chart(fig, use_container_width=True)
+        
+        # Bounding box annotations per finding
+        if stats.get('bbox_distribution'):
+            bbox_data = pd.DataFrame({
+                'Finding': list(stats['bbox_distribution'].keys()),
+                'Boxes': list(stats['bbox_distribution'].values())
+            })
+            
+            fig = px.bar(
+                bbox_data,
+                x='Finding',
+                y='Boxes',
+                title='Bounding Box Annotations by Finding',
+                color='Boxes',
+                color_continuous_scale='Viridis'
+            )
+            
+            st.plotly_chart(fig, use_container_width=True)
     
     # Tab 2: Data Import
     with tabs[1]:
@@ -238,7 +266,15 @@ def app():
             """)
             
             # Import Kaggle integration
-            from utils.kaggle_integration import check_kaggle_credentials, save_kaggle_credentials, import_nih_data_from_kaggle
+            from utils.kaggle_integration import check_kaggle_credentials, save_kaggle_credentials
+            from utils.import_jobs import (
+                start_nih_import_job,
+                get_active_import_job,
+                get_import_job,
+                cancel_import_job,
+                get_job_metrics,
+                IMPORT_JOB_STALE_SECONDS
+            )
             
             # Check if we already have Kaggle credentials
             if not check_kaggle_credentials():
@@ -268,33 +304,102 @@ def app():
             sample_size = st.slider("Sample Size", 100, 5000, 1000, 100,
                                   help="Number of records to download from the dataset")
             
+            # Imports run as background jobs shared by every session
+            active_job = get_active_import_job()
+            
             # Sample data download and import
             sample_col1, sample_col2 = st.columns([1, 3])
             
             with sample_col1:
                 load_sample = st.button("Load From Kaggle", type="primary",
-                                      disabled=not check_kaggle_credentials())
+                                      disabled=not check_kaggle_credentials() or active_job is not None)
             
             with sample_col2:
                 if load_sample:
-                    with st.spinner("Downloading and importing data from Kaggle..."):
-                        results = import_nih_data_from_kaggle(sample_size)
+                    job, created = start_nih_import_job(
+                        (st.session_state.kaggle_username, st.session_state.kaggle_key),
+                        sample_size
+                    )
+                    if job:
+                        st.session_state.import_job_id = job['id']
+                        if not created:
+                            st.info("An import is already running; showing its progress.")
+                        active_job = job
+                
+                job = active_job
+                if job is None and st.session_state.get('import_job_id'):
+                    job = get_import_job(st.session_state.import_job_id)
+                
+                if job:
+                    metrics = get_job_metrics(job)
+                    
+                    if job['status'] in ('queued', 'running'):
+                        st.markdown(f"**Import job #{job['id']}** is {job['status']}")
+                        st.progress(metrics['fraction'] or 0.0)
                         
-                        # Report metadata results
-                        if results["metadata"]["success"]:
-                            st.success(results["metadata"]["message"])
-                        else:
-                            st.error(f"Metadata import: {results['metadata']['message']}")
+                        status_parts = [
+                            f"{job['rows_processed']:,} rows",
+                            f"{metrics['rows_per_second']:,.0f} rows/s",
+                            f"{job['error_count']:,} errors"
+                        ]
+                        if metrics['eta_seconds'] is not None:
+                            status_parts.append(f"ETA {metrics['eta_seconds']:.0f}s")
+                        st.caption(" · ".join(status_parts))
+                        
+                        # Streamlit 1.32 has no fragments to poll with, and sleeping here
+                        # would block this session's script thread, so refresh on request
+                        if st.button("Refresh Progress", key="refresh_import_job"):
+                            st.rerun()
+                        
+                        if job['cancel_requested']:
+                            st.warning("Cancelling...")
+                        elif st.button("Cancel Import", key="cancel_import_job"):
+                            cancel_import_job(job['id'])
+                            st.rerun()
                         
-                        # Report bbox results
-                        if results["bbox"]["success"]:
-                            st.success(results["bbox"]["message"])
+                        st.caption(
+                            f"The import runs inside this app server: if the server restarts, the job stops and "
+                            f"is marked failed once it has reported no progress for {IMPORT_JOB_STALE_SECONDS}s. "
+                            f"For large or unattended loads, download the CSVs and run `python import_data.py`."
+                        )
+                    else:
+                        summary = (
+                            f"Import job #{job['id']} {job['status']}: {job['rows_processed']:,} rows "
+                            f"in {metrics['elapsed_seconds']:.0f}s ({metrics['rows_per_second']:,.0f} rows/s), "
+                            f"{job['error_count']:,} errors"
+                        )
+                        if job['status'] == 'succeeded':
+                            st.success(summary)
+                        elif job['status'] == 'cancelled':
+                            st.warning(summary)
                         else:
-                            st.warning(f"Bounding box import: {results['bbox']['message']}")
+                            st.error(summary)
+                        
+                        # Per-file results
+                        for name, result in (job['result'] or {}).items():
+                            if result and result['success']:
+                                st.success(result['message'])
+                            elif result:
+                                st.warning(f"{name.title()} import: {result['message']}")
+                        if job['message'] and not job['result']:
+                            st.caption(job['message'])
                         
                 # If no Kaggle credentials, show alternative method
                 if not check_kaggle_credentials():
                     st.info("Without Kaggle credentials, you can use the 'Upload CSV Files' tab to import the dataset manually.")
+        
+        # Summary statistics maintenance
+        st.markdown("#### Summary Statistics")
+        st.markdown("""
+        Dataset statistics are precomputed and updated automatically by every import.
+        Rebuild them if data was loaded into the database outside this page.
+        """)
+        
+        if st.button("Rebuild Summary Statistics"):
+            with st.spinner("Rebuilding summary statistics..."):
+                rows = refresh_nih_stats()
+                if rows is not None:
+                    st.success(f"Summary statistics rebuilt from {rows:,} records.")
     
     # Tab 3: Condition Analytics
     with tabs[2]:
@@ -320,6 +425,11 @@ def app():
                 # Display insights
                 st.markdown(f"#### Analysis of {selected_condition}")
                 
+                if insights.get('refreshed_at'):
+                    st.caption(f"Precomputed statistics, last refreshed {insights['refreshed_at']:%Y-%m-%d %H:%M:%S}")
+                else:
+                    st.caption("Statistics computed live (summary tables not built yet)")
+                
                 # Summary metrics
                 metric_cols = st.columns(4)
                 
@@ -443,50 +553,97 @@ def app():
     with tabs[3]:
         st.markdown("### Explore Sample Records")
         
-        # Get sample records
-        sample_size = st.slider("Number of records to display", 5, 50, 10)
+        # Sampling controls
+        sample_cols = st.columns(4)
         
-        with st.spinner("Loading sample records..."):
-            sample_records = get_nih_sample_records(sample_size)
-            
-            if sample_records:
-                # Convert to DataFrame for display
-                sample_df = pd.DataFrame(sample_records)
+        with sample_cols[0]:
+            sample_size = st.slider("Number of records to display", 5, 50, 10)
+        
+        with sample_cols[1]:
+            # Filter by condition across the whole dataset
+            filter_condition = st.selectbox(
+                "Filter by condition",
+                options=["All"] + sorted(stats['finding_distribution'].keys())
+            )
+        
+        with sample_cols[2]:
+            sample_method = st.selectbox(
+                "Sampling method",
+                options=NIH_SAMPLE_METHODS,
+                help="index: uniform sample from the in-memory index (supports cohort filters); "
+                     "system: random pages; bernoulli: random rows; "
+                     "offset: a run of rows from a random position; exact: uniform but sorts all matching rows"
+            )
+        
+        with sample_cols[3]:
+            sample_seed = st.number_input(
+                "Seed (0 = random)", min_value=0, value=0, step=1,
+                help="Use the same non-zero seed to get the same sample again"
+            )
+        
+        # Cohort filters are answered by the in-memory metadata index
+        cohort = {}
+        if sample_method == "index":
+            with st.expander("Cohort filters", expanded=False):
+                cohort_cols = st.columns(4)
                 
-                # Display sample records
-                st.dataframe(sample_df, use_container_width=True)
+                with cohort_cols[0]:
+                    cohort_age = st.slider("Age range", 0, 100, (0, 100))
                 
-                # Allow filtering by condition
-                st.markdown("#### Filter by Condition")
+                with cohort_cols[1]:
+                    cohort_genders = st.multiselect("Gender", ["M", "F"])
                 
-                # Extract all conditions from sample
-                all_conditions = []
-                for record in sample_records:
-                    if record['finding_labels']:
-                        conditions = record['finding_labels'].split('|')
-                        all_conditions.extend(conditions)
+                with cohort_cols[2]:
+                    cohort_views = st.multiselect("View position", sorted(stats['view_distribution'].keys()))
                 
-                unique_conditions = sorted(set(all_conditions))
+                with cohort_cols[3]:
+                    cohort_findings = st.multiselect("Also has", sorted(stats['finding_distribution'].keys()))
+            
+            if cohort_age != (0, 100):
+                cohort['min_age'], cohort['max_age'] = cohort_age
+            if cohort_genders:
+                cohort['genders'] = cohort_genders
+            if cohort_views:
+                cohort['views'] = cohort_views
+            if cohort_findings:
+                cohort['findings_all'] = cohort_findings
+            
+            nih_index = get_nih_index()
+            if nih_index is not None:
+                criteria = dict(cohort)
+                if filter_condition != "All":
+                    criteria['findings_all'] = cohort.get('findings_all', []) + [filter_condition]
+                
+                started = time.perf_counter()
+                cohort_size = nih_index.count(**criteria)
+                elapsed = (time.perf_counter() - started) * 1e6
                 
-                # Select condition to filter by
-                filter_condition = st.selectbox(
-                    "Select condition", 
-                    options=["All"] + unique_conditions
+                memory = nih_index.memory_usage()['total'] / (1024 * 1024)
+                st.caption(
+                    f"{cohort_size:,} matching records (counted in {elapsed:.0f} µs; "
+                    f"index of {len(nih_index):,} records in {memory:.1f} MB)"
                 )
+        
+        with st.spinner("Loading sample records..."):
+            sample_records = sample_nih_records(
+                sample_size,
+                method=sample_method,
+                seed=sample_seed or None,
+                condition=None if filter_condition == "All" else filter_condition,
+                cohort=cohort
+            )
+            
+            if sample_records:
+                # Convert to DataFrame for display
+                sample_df = pd.DataFrame(sample_records)
                 
                 if filter_condition != "All":
-                    # Filter records by selected condition
-                    filtered_records = [
-                        record for record in sample_records
-                        if record['finding_labels'] and filter_condition in record['finding_labels'].split('|')
-                    ]
-                    
-                    if filtered_records:
-                        st.markdown(f"##### Records with {filter_condition}")
-                        filtered_df = pd.DataFrame(filtered_records)
-                        st.dataframe(filtered_df, use_container_width=True)
-                    else:
-                        st.info(f"No records with {filter_condition} found in the sample.")
+                    st.markdown(f"##### Records with {filter_condition}")
+                
+                # Display sample records
+                st.dataframe(sample_df, use_container_width=True)
+            elif filter_condition != "All":
+                st.info(f"No records with {filter_condition} found.")
             else:
                 st.info("No records found. Please import the dataset first.")
 
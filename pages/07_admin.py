@@ -0,0 +1,103 @@
+import streamlit as st
+import pandas as pd
+import utils.database  # registers the cached read functions
+from utils.database import db_breaker
+from utils.query_cache import get_cache_stats, get_table_versions, clear_cache
+from utils.write_behind import get_analysis_writer
+
+def app():
+    st.title("Administration")
+    
+    st.markdown("## Analysis Write Queue")
+    
+    writer_stats = get_analysis_writer().get_stats()
+    queue_col1, queue_col2, queue_col3, queue_col4 = st.columns(4)
+    
+    with queue_col1:
+        st.metric("Pending", writer_stats['pending'])
+    
+    with queue_col2:
+        st.metric("Saved", writer_stats['saved'])
+    
+    with queue_col3:
+        st.metric("Batches", writer_stats['batches'])
+    
+    with queue_col4:
+        st.metric("Failed", writer_stats['failed'])
+    
+    if writer_stats['last_error']:
+        st.caption(f"Last error: {writer_stats['last_error']}")
+    
+    breaker_stats = db_breaker.get_stats()
+    if breaker_stats['state'] == "closed":
+        st.success("Database circuit breaker: closed (database reachable)")
+    else:
+        st.warning(
+            f"Database circuit breaker: {breaker_stats['state']}. New analyses are spooled to "
+            f"the local journal and replayed when the database recovers "
+            f"(retry in {db_breaker.retry_in():.0f}s)."
+        )
+    st.caption(
+        f"Trips: {breaker_stats['trips']} · Rejected calls: {breaker_stats['rejected']}"
+        + (f" · Last failure: {breaker_stats['last_error']}" if breaker_stats['last_error'] else "")
+    )
+    
+    st.markdown("""
+    ## Query Result Cache
+    
+    Read queries are cached across all sessions of this app process. Entries expire after
+    their TTL or as soon as one of the tables they read from is written to.
+    """)
+    
+    stats = get_cache_stats()
+    if not stats:
+        st.info("No cached functions have been loaded yet.")
+        return
+    
+    total_hits = sum(cache['hits'] for cache in stats)
+    total_lookups = total_hits + sum(cache['misses'] for cache in stats)
+    total_bytes = sum(cache['bytes'] for cache in stats)
+    
+    metric_col1, metric_col2, metric_col3 = st.columns(3)
+    
+    with metric_col1:
+        st.metric("Hit Rate", f"{total_hits / total_lookups:.1%}" if total_lookups else "n/a")
+    
+    with metric_col2:
+        st.metric("Cached Entries", sum(cache['entries'] for cache in stats))
+    
+    with metric_col3:
+        st.metric("Memory", f"{total_bytes / 1024:.1f} KiB")
+    
+    stats_df = pd.DataFrame(stats)
+    stats_df['hit_rate'] = (stats_df['hit_rate'] * 100).round(1)
+    stats_df['kib'] = (stats_df['bytes'] / 1024).round(1)
+    stats_df['max_kib'] = (stats_df['max_bytes'] / 1024).round(1)
+    st.dataframe(
+        stats_df[['name', 'tables', 'ttl', 'entries', 'max_entries', 'kib', 'max_kib',
+                  'hits', 'misses', 'hit_rate', 'evictions', 'invalidations']],
+        use_container_width=True
+    )
+    
+    versions = get_table_versions()
+    if versions:
+        st.markdown("### Table Versions")
+        st.caption("Bumped by every write, from any process (shared through the table_versions table)")
+        st.dataframe(
+            pd.DataFrame(sorted(versions.items()), columns=['table', 'version']),
+            use_container_width=True
+        )
+    
+    clear_col1, clear_col2 = st.columns([2, 1])
+    
+    with clear_col1:
+        selected_cache = st.selectbox("Cache", ["All"] + [cache['name'] for cache in stats])
+    
+    with clear_col2:
+        st.write("")
+        if st.button("Clear Cache"):
+            clear_cache(None if selected_cache == "All" else selected_cache)
+            st.rerun()
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,88 @@
+import argparse
+import os
+import sys
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("Warning: python-dotenv not installed. Using environment variables directly.")
+
+import torch
+from utils.bulk_scoring import find_studies, read_study_manifest, score_studies
+from utils.database import ensure_partitions, save_analyses_batch
+from utils.model import get_model_path, load_model
+
+# Usage:
+#   python score_archive.py DIRECTORY [--workers N] [--batch-size N] [--gradcam-dir DIR]
+#   python score_archive.py --manifest studies.csv --checkpoint runs/study42.jsonl
+#
+# Scores every DICOM/PNG/JPEG study under DIRECTORY (or listed in a manifest:
+# a CSV with a path column and optional patient_id, age and gender columns,
+# or a text file with one path per line) and saves the predictions to
+# analysis_results. Completed studies are logged to the checkpoint file;
+# rerunning with the same checkpoint skips them and keeps the run's
+# timestamp, so an interrupted run resumes without duplicate rows.
+#
+# Everything runs under the __main__ guard because the worker processes
+# import this module again.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score an archive of chest X-ray studies in bulk")
+    parser.add_argument("directory", nargs="?", help="Directory to walk for studies")
+    parser.add_argument("--manifest", help="CSV or text file listing the studies instead")
+    parser.add_argument("--checkpoint", default=None,
+                        help="Checkpoint file of the run (default: scoring_checkpoint.jsonl in the "
+                             "directory, or next to the manifest)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Decode processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=32, help="Images per forward pass")
+    parser.add_argument("--gradcam-dir", default=None,
+                        help="Also save a Grad-CAM overlay per study into this directory")
+    args = parser.parse_args()
+    
+    if bool(args.directory) == bool(args.manifest):
+        parser.error("give either a directory or --manifest")
+    
+    if args.manifest:
+        studies = read_study_manifest(args.manifest)
+        checkpoint = args.checkpoint or os.path.splitext(args.manifest)[0] + ".scoring.jsonl"
+    else:
+        studies = find_studies(args.directory)
+        checkpoint = args.checkpoint or os.path.join(args.directory, "scoring_checkpoint.jsonl")
+    
+    last_report = [0]
+    
+    def report(stats):
+        # About one line per thousand images
+        if stats["images"] - last_report[0] >= 1000:
+            last_report[0] = stats["images"]
+            print(f"{stats['images']:,} image(s), {stats['images_per_second']:,.1f} images/s, "
+                  f"{stats['errors']:,} error(s)")
+    
+    try:
+        model_path = get_model_path()
+        if model_path is None:
+            raise RuntimeError("no model available")
+        model = load_model(model_path)
+        device = next(model.parameters()).device
+        
+        ensure_partitions()
+        stats = score_studies(
+            studies, model, device, checkpoint, save_analyses_batch,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            gradcam_dir=args.gradcam_dir,
+            progress=report
+        )
+    except Exception as e:
+        print(f"Scoring error: {e}")
+        sys.exit(1)
+    
+    print(f"Scored {stats['images']:,} image(s) in {stats['seconds']:.1f}s "
+          f"({stats['images_per_second']:,.1f} images/s); {stats['skipped']:,} already done, "
+          f"{stats['errors']:,} error(s)")
+    print(f"  checkpoint: {checkpoint}")
+    if stats['gradcam_errors']:
+        print(f"  {stats['gradcam_errors']:,} Grad-CAM overlay(s) failed")
+    if stats['last_error']:
+        print(f"  last error: {stats['last_error']}")
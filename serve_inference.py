@@ -0,0 +1,54 @@
+import argparse
+import sys
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("Warning: python-dotenv not installed. Using environment variables directly.")
+
+import torch
+from utils.inference_server import make_inference_server, INFERENCE_MAX_BATCH, INFERENCE_BATCH_WAIT_MS
+from utils.model import get_model_path, load_model
+
+# Usage:
+#   python serve_inference.py [--host HOST] [--port PORT] [--max-batch N] [--batch-wait-ms MS] [--threads N]
+#
+# Runs the classifier in its own process behind a small HTTP API
+# (POST /predict, POST /gradcam, GET /health). Start the app with
+# INFERENCE_SERVER_URL=http://HOST:PORT and the analysis page sends images
+# here instead of loading the model itself. Concurrent requests are batched
+# into one forward pass. To scale out, run one server per core group or
+# host and put them behind any HTTP load balancer.
+parser = argparse.ArgumentParser(description="Serve chest X-ray predictions over HTTP")
+parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (0.0.0.0 for other hosts)")
+parser.add_argument("--port", type=int, default=8765)
+parser.add_argument("--max-batch", type=int, default=INFERENCE_MAX_BATCH,
+                    help="Largest batch per forward pass")
+parser.add_argument("--batch-wait-ms", type=float, default=INFERENCE_BATCH_WAIT_MS,
+                    help="How long a request waits for others to batch with")
+parser.add_argument("--threads", type=int, default=None,
+                    help="Torch CPU threads (default: torch's choice)")
+args = parser.parse_args()
+
+if args.threads:
+    torch.set_num_threads(args.threads)
+
+try:
+    model_path = get_model_path()
+    if model_path is None:
+        raise RuntimeError("no model available")
+    model = load_model(model_path)
+    device = next(model.parameters()).device
+    server = make_inference_server(model, device, args.host, args.port, args.max_batch, args.batch_wait_ms)
+except Exception as e:
+    print(f"Inference server error: {e}")
+    sys.exit(1)
+
+print(f"Serving predictions on http://{args.host}:{args.port} (device: {device}, max batch: {args.max_batch})")
+try:
+    server.serve_forever()
+except KeyboardInterrupt:
+    pass
+finally:
+    server.server_close()
@@ -39,58 +39,61 @@ except Exception as e:
     print("Please check your PostgreSQL installation and environment variables.")
     sys.exit(1)
 
-print("Creating tables...")
-cur = conn.cursor()
+from utils.migrations import upgrade, downgrade, get_migration_status
+from utils.partitions import ensure_analysis_partitions, apply_analysis_retention, list_analysis_partitions
 
-# Create tables
-cur.execute("""
-CREATE TABLE IF NOT EXISTS nih_xray_metadata (
-    image_index VARCHAR(255) PRIMARY KEY,
-    finding_labels TEXT,
-    follow_up_num INTEGER,
-    patient_id VARCHAR(255),
-    patient_age INTEGER,
-    patient_gender VARCHAR(10),
-    view_position VARCHAR(10),
-    original_image_width INTEGER,
-    original_image_height INTEGER,
-    original_image_pixel_spacing_x FLOAT,
-    original_image_pixel_spacing_y FLOAT
-)
-""")
+# Usage:
+#   python setup_db.py                    apply all pending migrations
+#   python setup_db.py upgrade [VERSION]  apply migrations up to VERSION
+#   python setup_db.py downgrade VERSION  revert migrations newer than VERSION
+#   python setup_db.py status             list migrations and planner checks
+#   python setup_db.py maintain [MONTHS]  create future analysis_results partitions and,
+#                                         if MONTHS is given, archive older partitions
+command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+version = int(sys.argv[2]) if len(sys.argv) > 2 else None
 
-cur.execute("""
-CREATE TABLE IF NOT EXISTS nih_xray_bbox (
-    id SERIAL PRIMARY KEY,
-    image_index VARCHAR(255),
-    finding_label VARCHAR(255),
-    bbox_x INTEGER,
-    bbox_y INTEGER,
-    bbox_w INTEGER,
-    bbox_h INTEGER,
-    FOREIGN KEY (image_index) REFERENCES nih_xray_metadata(image_index) ON DELETE CASCADE
-)
-""")
-
-cur.execute("""
-CREATE TABLE IF NOT EXISTS analysis_results (
-    id SERIAL PRIMARY KEY,
-    patient_id VARCHAR(255),
-    image_path TEXT,
-    prediction VARCHAR(255),
-    confidence FLOAT,
-    age INTEGER,
-    gender VARCHAR(10),
-    symptoms TEXT,
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-)
-""")
+try:
+    if command == "upgrade":
+        print("Applying schema migrations...")
+        applied = upgrade(conn, target=version)
+        print(f"Applied {len(applied)} migration(s).")
+    elif command == "downgrade":
+        if version is None:
+            print("Error: downgrade needs a target version, e.g. python setup_db.py downgrade 2")
+            sys.exit(1)
+        reverted = downgrade(conn, target=version)
+        print(f"Reverted {len(reverted)} migration(s).")
+        conn.close()
+        sys.exit(0)
+    elif command == "status":
+        for migration in get_migration_status(conn):
+            state = f"applied {migration['applied_at']:%Y-%m-%d %H:%M}" if migration['applied'] else "pending"
+            print(f"{migration['version']:>4}  {migration['name']:<40} {state}")
+            for check in migration['planner_checks'] or []:
+                print(f"      planner check {check['index']}: {'ok' if check['used'] else 'NOT USED'}")
+        conn.close()
+        sys.exit(0)
+    elif command == "maintain":
+        created = ensure_analysis_partitions(conn)
+        print(f"Created {created} analysis_results partition(s).")
+        if version is not None:
+            removed = apply_analysis_retention(conn, keep_months=version, drop="--drop" in sys.argv)
+            print(f"Removed {len(removed)} partition(s) older than {version} month(s).")
+        for partition in list_analysis_partitions(conn):
+            print(f"  {partition['name']}  ~{partition['rows']:,} rows")
+        conn.close()
+        sys.exit(0)
+    else:
+        print(f"Error: unknown command '{command}'. Use upgrade, downgrade, status or maintain.")
+        sys.exit(1)
+except Exception as e:
+    print(f"Migration error: {e}")
+    conn.close()
+    sys.exit(1)
 
-conn.commit()
-cur.close()
 conn.close()
 
-print("Database tables created successfully!")
+print("Database schema is up to date!")
 print("\nNext steps:")
 print("1. Create the required directories with: mkdir -p models temp data")
 print("2. Run the Streamlit app with: streamlit run app.py")
@@ -0,0 +1,373 @@
+import io
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+import numpy as np
+import psycopg2
+import streamlit as st
+from PIL import Image
+from psycopg2.extras import RealDictCursor
+from utils.database import pooled_connection, execute_query
+
+# A running job whose worker has not sent a heartbeat for this many
+# seconds is assumed lost (worker killed, host gone) and requeued
+ANALYSIS_JOB_STALE_SECONDS = int(os.environ.get("ANALYSIS_JOB_STALE_SECONDS", "300"))
+
+# Seconds between heartbeats of a batch in progress, and between sweeps
+# for stale jobs by every worker, busy or idle
+ANALYSIS_JOB_HEARTBEAT_SECONDS = 30
+ANALYSIS_JOB_REQUEUE_SECONDS = 60
+
+# Claims per job before it is given up on
+ANALYSIS_JOB_MAX_ATTEMPTS = int(os.environ.get("ANALYSIS_JOB_MAX_ATTEMPTS", "3"))
+
+# Every column but the uploaded image, for status queries
+ANALYSIS_JOB_COLUMNS = """
+    id, client_id, status, file_name, image_path, patient_id, age, gender, symptoms,
+    attempts, worker, error, analysis_id, prediction, confidence, gradcam_png,
+    created_at, started_at, heartbeat_at, finished_at
+"""
+
+def _execute(query, params=None, fetch=False):
+    """
+    Run a statement for a worker, raising errors instead of reporting them on a page
+    """
+    with pooled_connection() as conn:
+        with conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(query, params or ())
+                if fetch:
+                    return cur.fetchall()
+
+def _to_age(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def enqueue_analysis_job(image_data, file_name, patient_data, image_path=None):
+    """
+    Queue an uploaded image for analysis by the worker pool
+    
+    The image bytes travel with the job, so workers on other hosts do not
+    need access to this server's disk.
+    
+    Args:
+        image_data: Uploaded file contents
+        file_name: Uploaded file name (its extension tells DICOM from images)
+        patient_data: Patient data entered for this image, or None to let
+            the worker read patient_id, age and gender from the DICOM header
+        image_path: Optional local copy of the image, kept on the result
+        
+    Returns:
+        job: Dictionary with the new job's id, client_id, status and
+            created_at, or None if the database is unavailable
+    """
+    patient_data = patient_data or {}
+    try:
+        rows = _execute("""
+            INSERT INTO analysis_jobs
+            (client_id, file_name, image_data, image_path, patient_id, age, gender, symptoms)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id, client_id, status, created_at
+        """, (
+            str(uuid.uuid4()), file_name, psycopg2.Binary(image_data), image_path,
+            patient_data.get('id') or None, _to_age(patient_data.get('age')),
+            patient_data.get('gender') or None, patient_data.get('symptoms') or None
+        ), fetch=True)
+    except Exception as e:
+        st.error(f"Could not queue the analysis: {str(e)}")
+        return None
+    return rows[0]
+
+def get_analysis_jobs(job_ids):
+    """
+    Get analysis jobs by id (without the uploaded images)
+    
+    Returns:
+        jobs: List of analysis_jobs rows, newest first
+    """
+    if not job_ids:
+        return []
+    return execute_query(
+        f"SELECT {ANALYSIS_JOB_COLUMNS} FROM analysis_jobs WHERE id = ANY(%s) ORDER BY id DESC",
+        (list(job_ids),)
+    ) or []
+
+def get_analysis_queue_stats():
+    """
+    Count analysis jobs by status
+    
+    Returns:
+        counts: Dictionary of status -> number of jobs
+    """
+    rows = execute_query("SELECT status, COUNT(*) AS jobs FROM analysis_jobs GROUP BY status")
+    return {row['status']: row['jobs'] for row in rows or []}
+
+def claim_analysis_jobs(worker, limit):
+    """
+    Claim up to limit queued jobs for a worker
+    
+    FOR UPDATE SKIP LOCKED makes concurrent claims pass over rows another
+    worker is claiming, so every job goes to exactly one worker without
+    workers waiting on each other.
+    
+    Returns:
+        jobs: List of claimed analysis_jobs rows, with image_data
+    """
+    return _execute("""
+        UPDATE analysis_jobs
+        SET status = 'running', worker = %s, attempts = attempts + 1,
+            started_at = CURRENT_TIMESTAMP, heartbeat_at = CURRENT_TIMESTAMP
+        WHERE id IN (
+            SELECT id FROM analysis_jobs
+            WHERE status = 'queued'
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, client_id, file_name, image_data, image_path, patient_id, age, gender,
+                  symptoms, attempts, created_at
+    """, (worker, limit), fetch=True)
+
+def release_analysis_jobs(job_ids, error):
+    """
+    Put claimed jobs back in the queue, or fail those out of attempts
+    """
+    if not job_ids:
+        return
+    _execute("""
+        UPDATE analysis_jobs
+        SET status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'queued' END,
+            error = %s,
+            finished_at = CASE WHEN attempts >= %s THEN CURRENT_TIMESTAMP END
+        WHERE id = ANY(%s) AND status = 'running'
+    """, (ANALYSIS_JOB_MAX_ATTEMPTS, error, ANALYSIS_JOB_MAX_ATTEMPTS, list(job_ids)))
+
+def requeue_stale_analysis_jobs():
+    """
+    Release running jobs whose worker stopped responding
+    
+    Returns:
+        count: Number of jobs released
+    """
+    rows = _execute("""
+        UPDATE analysis_jobs
+        SET status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'queued' END,
+            error = 'Worker stopped responding',
+            finished_at = CASE WHEN attempts >= %s THEN CURRENT_TIMESTAMP END
+        WHERE status = 'running'
+          AND heartbeat_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+        RETURNING id
+    """, (ANALYSIS_JOB_MAX_ATTEMPTS, ANALYSIS_JOB_MAX_ATTEMPTS, ANALYSIS_JOB_STALE_SECONDS), fetch=True)
+    return len(rows)
+
+@contextmanager
+def _heartbeat(job_ids, worker):
+    """
+    Keep refreshing heartbeat_at of claimed jobs while the block runs
+    
+    A slow batch then does not look stale to the other workers' sweeps.
+    Only jobs still running under this worker are touched.
+    """
+    stopped = threading.Event()
+    
+    def beat():
+        while not stopped.wait(ANALYSIS_JOB_HEARTBEAT_SECONDS):
+            try:
+                _execute("""
+                    UPDATE analysis_jobs SET heartbeat_at = CURRENT_TIMESTAMP
+                    WHERE id = ANY(%s) AND status = 'running' AND worker = %s
+                """, (list(job_ids), worker))
+            except Exception:
+                # Missed beats only matter once the job counts as stale
+                pass
+    
+    thread = threading.Thread(target=beat, name="analysis-job-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+def _gradcam_png(heatmap, array):
+    from utils.visualization import overlay_heatmap_on_image
+    
+    buffer = io.BytesIO()
+    Image.fromarray(overlay_heatmap_on_image(array, heatmap)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def process_analysis_jobs(jobs, model, device, gradcam=True):
+    """
+    Analyse a batch of claimed jobs and store the results
+    
+    Images are decoded and predicted in one forward pass; results go to
+    analysis_results with one multi-row insert keyed by each job's
+    client_id, so a batch redone after a crash does not add rows twice.
+    Images that cannot be decoded fail their job right away (retrying
+    would not help). Grad-CAM runs as one batch too; a job whose heatmap
+    fails is still done, without an overlay and with the error noted.
+    Patient fields the job was queued without are taken from the DICOM
+    header.
+    
+    Returns:
+        (done, failed): Number of jobs finished and failed
+    """
+    import torch
+    from assets.grad_cam import generate_gradcams
+    from utils.bulk_scoring import decode_study
+    from utils.database import save_analyses_batch
+    from utils.model import predict_batch
+    from utils.tensor_shards import to_model_batch
+    
+    decoded = []
+    failed = []
+    for job in jobs:
+        try:
+            array, metadata = decode_study(job['file_name'], bytes(job['image_data']))
+            job = dict(job)
+            for field in ('patient_id', 'age', 'gender'):
+                if job[field] is None:
+                    job[field] = metadata.get(field)
+            job['patient_id'] = job['patient_id'] or 'Unknown'
+            decoded.append((job, array))
+        except Exception as e:
+            failed.append((job['id'], f"Cannot decode image: {e}"))
+    
+    results = []
+    db_ids = {}
+    if decoded:
+        arrays = [array for _, array in decoded]
+        inputs = to_model_batch(torch.from_numpy(np.stack(arrays)), device)
+        predictions = predict_batch(model, inputs, device)
+        
+        heatmaps = [None] * len(decoded)
+        if gradcam:
+            heatmaps = generate_gradcams(model, inputs, [class_idx for class_idx, _, _ in predictions], device)
+        
+        records = []
+        for (job, array), (class_idx, class_label, confidence), heatmap in zip(decoded, predictions, heatmaps):
+            records.append({
+                'client_id': str(job['client_id']),
+                'timestamp': job['created_at'],
+                'patient_id': job['patient_id'],
+                'image_path': job['image_path'] or job['file_name'],
+                'prediction': class_label,
+                'confidence': confidence,
+                'age': job['age'],
+                'gender': job['gender'],
+                'symptoms': job['symptoms']
+            })
+            overlay, error = None, None
+            try:
+                if isinstance(heatmap, Exception):
+                    raise heatmap
+                if heatmap is not None:
+                    overlay = _gradcam_png(heatmap, array)
+            except Exception as e:
+                error = f"Grad-CAM failed: {e}"
+            results.append((job, class_label, confidence, overlay, error))
+        
+        db_ids = save_analyses_batch(records)
+    
+    with pooled_connection() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                for job, class_label, confidence, overlay, error in results:
+                    cur.execute("""
+                        UPDATE analysis_jobs
+                        SET status = 'done', analysis_id = %s, prediction = %s, confidence = %s,
+                            gradcam_png = %s, patient_id = %s, age = %s, gender = %s,
+                            image_data = NULL, error = %s, finished_at = CURRENT_TIMESTAMP
+                        WHERE id = %s
+                    """, (
+                        db_ids.get(str(job['client_id'])), class_label, confidence,
+                        psycopg2.Binary(overlay) if overlay else None,
+                        job['patient_id'], job['age'], job['gender'], error, job['id']
+                    ))
+                for job_id, error in failed:
+                    cur.execute("""
+                        UPDATE analysis_jobs
+                        SET status = 'failed', error = %s, finished_at = CURRENT_TIMESTAMP
+                        WHERE id = %s
+                    """, (error, job_id))
+    
+    return len(results), len(failed)
+
+def run_analysis_worker(model, device, worker=None, batch_size=8, gradcam=True, poll_seconds=1.0,
+                        should_stop=None, progress=None):
+    """
+    Drain the analysis queue until should_stop returns True
+    
+    Claims up to batch_size jobs at a time and polls again after
+    poll_seconds when the queue is empty. Every ANALYSIS_JOB_REQUEUE_SECONDS,
+    busy or not, it releases stale jobs of dead workers, and claimed jobs
+    get a heartbeat while their batch runs. Jobs of a batch that fails as
+    a whole (database or model error) are put back in the queue until they
+    run out of attempts.
+    
+    Args:
+        model: ChestXRayClassifier in eval mode
+        device: Torch device of the model
+        worker: Name recorded on claimed jobs (default: host:pid)
+        batch_size: Jobs per claim and forward pass
+        gradcam: Also store a Grad-CAM overlay per job
+        poll_seconds: Idle wait between claims on an empty queue
+        should_stop: Optional function; the loop ends when it returns True
+        progress: Optional function called with a stats dictionary after
+            every batch
+            
+    Returns:
+        stats: Dictionary with done, failed, released, seconds,
+            images_per_second and last_error
+    """
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    stats = {"done": 0, "failed": 0, "released": 0, "seconds": 0.0, "images_per_second": 0.0,
+             "last_error": None}
+    started = time.perf_counter()
+    last_requeue = None
+    
+    while not (should_stop and should_stop()):
+        try:
+            if last_requeue is None or time.monotonic() - last_requeue >= ANALYSIS_JOB_REQUEUE_SECONDS:
+                last_requeue = time.monotonic()
+                requeue_stale_analysis_jobs()
+            
+            jobs = claim_analysis_jobs(worker, batch_size)
+            if not jobs:
+                time.sleep(poll_seconds)
+                continue
+        except Exception as e:
+            # Database unreachable: wait and try again
+            stats["last_error"] = str(e)
+            time.sleep(poll_seconds)
+            continue
+        
+        try:
+            with _heartbeat([job['id'] for job in jobs], worker):
+                done, failed = process_analysis_jobs(jobs, model, device, gradcam)
+            stats["done"] += done
+            stats["failed"] += failed
+        except BaseException as e:
+            stats["released"] += len(jobs)
+            stats["last_error"] = str(e)
+            try:
+                release_analysis_jobs([job['id'] for job in jobs], f"Worker error: {e}")
+            except Exception:
+                # Left running; requeued once stale
+                pass
+            if not isinstance(e, Exception):
+                raise
+        
+        stats["seconds"] = time.perf_counter() - started
+        stats["images_per_second"] = stats["done"] / stats["seconds"] if stats["seconds"] else 0.0
+        if progress:
+            progress(dict(stats))
+    
+    stats["seconds"] = time.perf_counter() - started
+    stats["images_per_second"] = stats["done"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
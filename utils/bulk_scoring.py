@@ -0,0 +1,362 @@
+import csv
+import datetime
+import io
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+import pydicom
+import torch
+from PIL import Image
+from utils.image_processing import MODEL_INPUT_SIZE
+from utils.model import predict_batch
+from utils.tensor_shards import preprocess_to_uint8, to_model_batch
+
+DICOM_EXTENSIONS = ('.dcm', '.dicom')
+SCORABLE_EXTENSIONS = DICOM_EXTENSIONS + ('.png', '.jpg', '.jpeg')
+
+# Studies handed to a decode process per task
+BULK_SCORING_TASK_SIZE = 16
+
+# DICOM PatientSex codes as stored by the upload page
+DICOM_GENDERS = {'M': 'Male', 'F': 'Female', 'O': 'Other'}
+
+def find_studies(root):
+    """
+    Walk a directory for DICOM and image files, in a stable order
+    
+    Yields:
+        study: Dictionary with the file path
+    """
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories.sort()
+        for name in sorted(files):
+            if name.lower().endswith(SCORABLE_EXTENSIONS):
+                yield {"path": os.path.join(directory, name)}
+
+def read_study_manifest(manifest_path):
+    """
+    Read the studies listed in a manifest
+    
+    A .csv manifest needs a path column and may add patient_id, age and
+    gender, which take precedence over the DICOM header. Any other file is
+    read as one path per line. Relative paths are resolved against the
+    manifest's directory.
+    
+    Yields:
+        study: Dictionary with path and the optional patient fields
+    """
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    
+    with open(manifest_path, newline="", encoding="utf-8") as f:
+        if manifest_path.lower().endswith(".csv"):
+            reader = csv.DictReader(f)
+            if "path" not in (reader.fieldnames or []):
+                raise ValueError(f"{manifest_path} has no 'path' column")
+            for row in reader:
+                if row["path"]:
+                    study = {key: value for key, value in row.items() if key and value}
+                    study["path"] = os.path.join(base, row["path"])
+                    yield study
+        else:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    yield {"path": os.path.join(base, line)}
+
+def _dicom_age(value):
+    # Age strings look like "058Y"; younger patients are counted in whole years
+    value = str(value or "").strip()
+    if value[:-1].isdigit() and value[-1].upper() in "DWMY":
+        return int(value[:-1]) if value[-1].upper() == "Y" else 0
+    return int(value) if value.isdigit() else None
+
+def _study_age(value):
+    # Manifest ages may read "58", "45.0" or "058Y"; anything else is unknown
+    if value is None or isinstance(value, int):
+        return value
+    age = _dicom_age(value)
+    if age is None:
+        try:
+            age = int(float(value))
+        except (TypeError, ValueError, OverflowError):
+            return None
+    return age
+
+def _study_gender(value):
+    # Manifests may hold DICOM codes ("M") or words ("male"); both are stored
+    # the way the upload page stores PatientSex
+    value = str(value or "").strip()
+    if not value:
+        return None
+    if value.upper() in DICOM_GENDERS:
+        return DICOM_GENDERS[value.upper()]
+    for gender in DICOM_GENDERS.values():
+        if value.lower() == gender.lower():
+            return gender
+    return value
+
+def decode_study(path, data=None):
+    """
+    Decode a DICOM or image file into uint8 model input
+    
+    DICOM pixel data is scaled like utils.image_processing.read_dicom_file
+    and resized like preprocess_to_uint8, so both paths give the same input
+    as the analysis page.
+    
+    Args:
+        path: File path (or just the file name when data is given)
+        data: Optional file contents; the path then only tells the file type
+        
+    Returns:
+        (array, metadata): (224, 224) uint8 array and a dictionary of
+            patient_id, age and gender from the DICOM header (empty for images)
+    """
+    source = io.BytesIO(data) if data is not None else path
+    if not path.lower().endswith(DICOM_EXTENSIONS):
+        return preprocess_to_uint8(source), {}
+    
+    ds = pydicom.dcmread(source)
+    img_array = ds.pixel_array
+    if img_array.max() > 255:
+        img_array = img_array / img_array.max() * 255
+    image = Image.fromarray(img_array.astype(np.uint8)).convert("L")
+    image = image.resize((MODEL_INPUT_SIZE, MODEL_INPUT_SIZE), Image.BILINEAR)
+    
+    metadata = {
+        "patient_id": getattr(ds, "PatientID", None) or None,
+        "age": _dicom_age(getattr(ds, "PatientAge", None)),
+        "gender": _study_gender(getattr(ds, "PatientSex", None))
+    }
+    return np.asarray(image, dtype=np.uint8), metadata
+
+def _decode_studies(studies):
+    """
+    Worker task: decode a list of studies
+    
+    Returns:
+        results: List of (study, array or None, metadata, error or None)
+    """
+    results = []
+    for study in studies:
+        try:
+            array, metadata = decode_study(study["path"])
+            results.append((study, array, metadata, None))
+        except Exception as e:
+            results.append((study, None, {}, str(e)))
+    return results
+
+def study_client_id(path):
+    """
+    Stable analysis client_id of a study file
+    
+    Derived from the absolute path, so rescoring a file within the same run
+    (after an interruption) hits the analysis_results unique index instead
+    of adding a second row.
+    """
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, "file://" + os.path.abspath(path)))
+
+class ScoringCheckpoint:
+    """
+    Append-only JSON-lines log of the studies a scoring run has stored
+    
+    The first line holds the run timestamp, which every result of the run
+    is saved with; later lines hold one scored study each. Lines are only
+    written after their batch is committed to the database, so resuming
+    skips exactly the stored studies.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        self.run_timestamp = None
+        
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn last line of an interrupted run
+                        continue
+                    if "run_timestamp" in entry:
+                        self.run_timestamp = entry["run_timestamp"]
+                    else:
+                        self.done.add(entry["path"])
+        except FileNotFoundError:
+            pass
+        
+        if self.run_timestamp is None:
+            self.run_timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self._append([{"run_timestamp": self.run_timestamp}])
+    
+    def _append(self, entries):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def record(self, entries):
+        self._append(entries)
+        self.done.update(entry["path"] for entry in entries)
+
+def _save_gradcam(model, inputs, arrays, records, device, gradcam_dir):
+    """
+    Write a Grad-CAM overlay per record, from one backward pass per batch
+    
+    Returns:
+        errors: List of (record, error) for the overlays that failed
+    """
+    from assets.grad_cam import generate_gradcams
+    from utils.visualization import overlay_heatmap_on_image
+    
+    os.makedirs(gradcam_dir, exist_ok=True)
+    heatmaps = generate_gradcams(model, inputs, [record["class_idx"] for record in records], device)
+    
+    errors = []
+    for array, record, heatmap in zip(arrays, records, heatmaps):
+        try:
+            if isinstance(heatmap, Exception):
+                raise heatmap
+            overlay = overlay_heatmap_on_image(array, heatmap)
+            Image.fromarray(overlay).save(os.path.join(gradcam_dir, f"{record['client_id']}.png"))
+        except Exception as e:
+            errors.append((record, e))
+    return errors
+
+def score_studies(studies, model, device, checkpoint_path, save, workers=None, batch_size=32,
+                  gradcam_dir=None, progress=None):
+    """
+    Score studies with batched inference, decoding them in a process pool
+    
+    Decoding runs in worker processes with a few tasks per worker in
+    flight, while this process batches the decoded images through the
+    model and saves each batch with one call. Studies already in the
+    checkpoint are skipped, so an interrupted run resumes where it stopped.
+    
+    Args:
+        studies: Iterable of study dictionaries (see find_studies and
+            read_study_manifest)
+        model: ChestXRayClassifier in eval mode
+        device: Torch device of the model
+        checkpoint_path: Checkpoint file of the run (created if missing)
+        save: Function called with a list of analysis records per batch
+            (utils.database.save_analyses_batch)
+        workers: Decode processes (default: CPU count)
+        batch_size: Images per forward pass
+        gradcam_dir: Optional directory for a Grad-CAM overlay per study,
+            named by client_id; a failed overlay does not stop the study
+            from being stored
+        progress: Optional function called with a stats dictionary after
+            every batch
+            
+    Returns:
+        stats: Dictionary with images, skipped, errors, gradcam_errors,
+            seconds, images_per_second and last_error
+    """
+    workers = workers or os.cpu_count() or 1
+    checkpoint = ScoringCheckpoint(checkpoint_path)
+    stats = {"images": 0, "skipped": 0, "errors": 0, "gradcam_errors": 0, "seconds": 0.0,
+             "images_per_second": 0.0, "last_error": None}
+    started = time.perf_counter()
+    
+    def tasks():
+        task = []
+        for study in studies:
+            if study["path"] in checkpoint.done:
+                stats["skipped"] += 1
+                continue
+            task.append(study)
+            if len(task) == BULK_SCORING_TASK_SIZE:
+                yield task
+                task = []
+        if task:
+            yield task
+    
+    decoded = []
+    
+    def score(batch):
+        # A study whose fields cannot be read is counted as an error
+        # instead of failing the whole run
+        records, arrays, studies = [], [], []
+        for study, array, metadata in batch:
+            try:
+                records.append({
+                    "client_id": study_client_id(study["path"]),
+                    "timestamp": checkpoint.run_timestamp,
+                    "patient_id": study.get("patient_id") or metadata.get("patient_id")
+                                  or os.path.splitext(os.path.basename(study["path"]))[0],
+                    "image_path": os.path.abspath(study["path"]),
+                    "age": _study_age(study.get("age", metadata.get("age"))),
+                    "gender": _study_gender(study.get("gender", metadata.get("gender"))),
+                    "symptoms": None
+                })
+            except Exception as e:
+                stats["errors"] += 1
+                stats["last_error"] = f"{study['path']}: {e}"
+                continue
+            arrays.append(array)
+            studies.append(study)
+        
+        if not records:
+            return
+        
+        inputs = to_model_batch(torch.from_numpy(np.stack(arrays)), device)
+        for record, (class_idx, label, confidence) in zip(records, predict_batch(model, inputs, device)):
+            record.update({"prediction": label, "confidence": confidence, "class_idx": class_idx})
+        
+        if gradcam_dir:
+            for record, error in _save_gradcam(model, inputs, arrays, records, device, gradcam_dir):
+                stats["gradcam_errors"] += 1
+                stats["last_error"] = f"{record['image_path']}: Grad-CAM failed: {error}"
+        
+        save(records)
+        checkpoint.record([
+            {"path": study["path"], "client_id": record["client_id"],
+             "prediction": record["prediction"], "confidence": record["confidence"]}
+            for study, record in zip(studies, records)
+        ])
+        
+        stats["images"] += len(records)
+        stats["seconds"] = time.perf_counter() - started
+        stats["images_per_second"] = stats["images"] / stats["seconds"] if stats["seconds"] else 0.0
+        if progress:
+            progress(dict(stats))
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        pending_tasks = tasks()
+        while True:
+            # Keep every worker busy with a little queued work
+            for task in pending_tasks:
+                in_flight.add(executor.submit(_decode_studies, task))
+                if len(in_flight) >= workers * 2:
+                    break
+            if not in_flight:
+                break
+            
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                for study, array, metadata, error in future.result():
+                    if error:
+                        stats["errors"] += 1
+                        stats["last_error"] = f"{study['path']}: {error}"
+                    else:
+                        decoded.append((study, array, metadata))
+            
+            while len(decoded) >= batch_size:
+                score(decoded[:batch_size])
+                del decoded[:batch_size]
+    
+    if decoded:
+        score(decoded)
+    
+    stats["seconds"] = time.perf_counter() - started
+    stats["images_per_second"] = stats["images"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
@@ -0,0 +1,99 @@
+import threading
+import time
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of contacting a dependency that is known to be down
+    """
+
+class CircuitBreaker:
+    """
+    Fail fast while a dependency keeps failing
+    
+    After failure_threshold consecutive failures the breaker opens and
+    calls are refused for reset_timeout seconds. Then a single trial call
+    is let through (half-open): success closes the breaker, failure opens
+    it for another reset_timeout.
+    """
+    
+    def __init__(self, name, failure_threshold=3, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._stats = {"trips": 0, "rejected": 0, "last_error": None}
+    
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+    
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+    
+    def retry_in(self):
+        """
+        Seconds until the next trial call is allowed (0 if calls are allowed now)
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+    
+    def before_call(self):
+        """
+        Check whether a call may go ahead
+        
+        Raises:
+            CircuitOpenError: If the breaker is open, or half-open with a
+                trial call already in flight
+        """
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return
+            
+            self._stats["rejected"] += 1
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+            raise CircuitOpenError(f"{self.name} unavailable; retrying in {retry_in:.0f}s")
+    
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+    
+    def record_failure(self, error=None):
+        with self._lock:
+            self._failures += 1
+            self._stats["last_error"] = str(error) if error is not None else None
+            
+            if self._trial_running or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_running:
+                    self._stats["trips"] += 1
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+    
+    def get_stats(self):
+        """
+        Get the breaker state and counters
+        
+        Returns:
+            stats: Dictionary with state, consecutive failures, trips, rejected calls and last error
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["state"] = self._state()
+            stats["failures"] = self._failures
+            return stats
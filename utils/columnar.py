@@ -0,0 +1,245 @@
+import datetime
+import json
+import os
+
+# Columnar snapshots of the NIH tables, rewritten in the background after imports
+NIH_METADATA_PARQUET = os.environ.get("NIH_METADATA_PARQUET", os.path.join("data", "nih_metadata.parquet"))
+NIH_BBOX_PARQUET = os.environ.get("NIH_BBOX_PARQUET", os.path.join("data", "nih_bbox.parquet"))
+
+# Written last and removed before the Parquet files are swapped; records the
+# nih_stats_refresh_log id the snapshot was taken at
+NIH_SNAPSHOT_MANIFEST = os.environ.get("NIH_SNAPSHOT_MANIFEST", os.path.join("data", "nih_snapshot.json"))
+
+# Same buckets as the nih_stats summary (utils.database.NIH_STATS_DELTA_QUERY)
+NIH_FACETS_QUERY = """
+    WITH scoped AS (
+        SELECT
+            patient_age,
+            COALESCE(patient_gender, '') AS patient_gender,
+            COALESCE(view_position, '') AS view_position,
+            findings
+        FROM nih_metadata
+        WHERE $scope = '*' OR list_contains(list_transform(findings, x -> lower(x)), $scope)
+    )
+    SELECT 'total' AS dimension, '' AS bucket, COUNT(*) AS count
+    FROM scoped
+    UNION ALL
+    SELECT 'gender', patient_gender, COUNT(*)
+    FROM scoped
+    GROUP BY patient_gender
+    UNION ALL
+    SELECT
+        'age_group',
+        CASE
+            WHEN patient_age < 20 THEN '0-19'
+            WHEN patient_age BETWEEN 20 AND 39 THEN '20-39'
+            WHEN patient_age BETWEEN 40 AND 59 THEN '40-59'
+            WHEN patient_age BETWEEN 60 AND 79 THEN '60-79'
+            ELSE '80+'
+        END,
+        COUNT(*)
+    FROM scoped
+    GROUP BY 2
+    UNION ALL
+    SELECT 'view', view_position, COUNT(*)
+    FROM scoped
+    GROUP BY view_position
+    UNION ALL
+    SELECT 'finding', finding, COUNT(*)
+    FROM (SELECT unnest(findings) AS finding FROM scoped)
+    WHERE lower(finding) <> $scope
+    GROUP BY finding
+    UNION ALL
+    SELECT 'bbox', CASE WHEN $scope = '*' THEN finding_label ELSE '' END, COUNT(*)
+    FROM (SELECT COALESCE(finding_label, '') AS finding_label FROM nih_bbox)
+    WHERE $scope = '*' OR lower(finding_label) = $scope
+    GROUP BY 2
+"""
+
+def columnar_engine_available():
+    """
+    Check whether the optional duckdb and pyarrow packages are installed
+    """
+    try:
+        import duckdb
+        import pyarrow
+    except ImportError:
+        return False
+    return True
+
+def _atomic_parquet_writer(path, schema):
+    import pyarrow.parquet as pq
+    
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return pq.ParquetWriter(path + ".tmp", schema, compression="zstd", use_dictionary=True)
+
+def snapshot_nih_tables(batch_size=50000):
+    """
+    Write nih_xray_metadata and nih_xray_bbox to Parquet snapshots
+    
+    Low-cardinality text (gender, view position, finding labels) is stored
+    dictionary-encoded, and the pipe-separated finding labels become a list
+    column so label queries need no string splitting. Each file is written
+    next to the old one and swapped in atomically.
+    
+    Both tables and the latest nih_stats_refresh_log id are read in one
+    repeatable-read transaction, and that id goes into the manifest, so
+    read_nih_facets can tell whether the snapshot still matches nih_stats.
+    
+    Args:
+        batch_size: Rows read from the database per batch
+        
+    Returns:
+        (metadata_rows, bbox_rows): Number of rows written to each snapshot
+    """
+    import pyarrow as pa
+    from utils.database import get_db_connection
+    
+    label = pa.dictionary(pa.int32(), pa.string())
+    metadata_schema = pa.schema([
+        ("image_index", pa.string()),
+        ("findings", pa.list_(label)),
+        ("follow_up_num", pa.int32()),
+        ("patient_id", pa.string()),
+        ("patient_age", pa.int32()),
+        ("patient_gender", label),
+        ("view_position", label),
+        ("original_image_width", pa.int32()),
+        ("original_image_height", pa.int32()),
+        ("original_image_pixel_spacing_x", pa.float64()),
+        ("original_image_pixel_spacing_y", pa.float64())
+    ])
+    bbox_schema = pa.schema([
+        ("image_index", pa.string()),
+        ("finding_label", label),
+        ("bbox_x", pa.int32()),
+        ("bbox_y", pa.int32()),
+        ("bbox_w", pa.int32()),
+        ("bbox_h", pa.int32())
+    ])
+    
+    metadata_query = """
+        SELECT image_index, string_to_array(finding_labels, '|') AS findings, follow_up_num,
+               patient_id, patient_age, patient_gender, view_position,
+               original_image_width, original_image_height,
+               original_image_pixel_spacing_x, original_image_pixel_spacing_y
+        FROM nih_xray_metadata
+    """
+    bbox_query = "SELECT image_index, finding_label, bbox_x, bbox_y, bbox_w, bbox_h FROM nih_xray_bbox"
+    
+    # A failed read must not replace a good snapshot with an empty one, so
+    # errors propagate and the old files stay in place
+    conn = get_db_connection()
+    if conn is None:
+        raise ConnectionError("Database unavailable")
+    
+    counts = []
+    try:
+        conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT MAX(id) FROM nih_stats_refresh_log")
+                refresh_id = cur.fetchone()[0]
+            
+            for number, (query, schema, path) in enumerate([
+                (metadata_query, metadata_schema, NIH_METADATA_PARQUET),
+                (bbox_query, bbox_schema, NIH_BBOX_PARQUET)
+            ]):
+                count = 0
+                writer = _atomic_parquet_writer(path, schema)
+                try:
+                    with conn.cursor(name=f"nih_snapshot_{number}") as cur:
+                        cur.itersize = batch_size
+                        cur.execute(query)
+                        while True:
+                            rows = cur.fetchmany(batch_size)
+                            if not rows:
+                                break
+                            arrays = [
+                                pa.array([row[i] for row in rows], type=field.type)
+                                for i, field in enumerate(schema)
+                            ]
+                            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                            count += len(rows)
+                finally:
+                    writer.close()
+                counts.append(count)
+    finally:
+        conn.close()
+    
+    # Files of different refreshes must never be read together
+    _remove_manifest()
+    for path in (NIH_METADATA_PARQUET, NIH_BBOX_PARQUET):
+        os.replace(path + ".tmp", path)
+    _write_manifest({
+        "refresh_id": refresh_id,
+        "metadata_rows": counts[0],
+        "bbox_rows": counts[1],
+        "written_at": datetime.datetime.now().isoformat()
+    })
+    
+    return tuple(counts)
+
+def _read_manifest():
+    try:
+        with open(NIH_SNAPSHOT_MANIFEST, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_manifest(manifest):
+    os.makedirs(os.path.dirname(NIH_SNAPSHOT_MANIFEST) or ".", exist_ok=True)
+    with open(NIH_SNAPSHOT_MANIFEST + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(NIH_SNAPSHOT_MANIFEST + ".tmp", NIH_SNAPSHOT_MANIFEST)
+
+def _remove_manifest():
+    try:
+        os.remove(NIH_SNAPSHOT_MANIFEST)
+    except FileNotFoundError:
+        pass
+
+def read_nih_facets(scope, refresh_id):
+    """
+    Aggregate the NIH snapshot for one scope with the embedded DuckDB engine
+    
+    Args:
+        scope: '*' for the whole dataset or a finding label (case-insensitive)
+        refresh_id: Latest nih_stats_refresh_log id; a snapshot taken at any
+            other refresh is out of date and not used
+            
+    Returns:
+        summary: Dictionary of dimension -> {bucket: count} plus refreshed_at
+            (the snapshot time), in the shape of utils.database._read_nih_stats;
+            None if duckdb is not installed or no current snapshot exists
+    """
+    manifest = _read_manifest()
+    if manifest is None or refresh_id is None or manifest.get("refresh_id") != refresh_id:
+        return None
+    if not (os.path.exists(NIH_METADATA_PARQUET) and os.path.exists(NIH_BBOX_PARQUET)):
+        return None
+    
+    try:
+        import duckdb
+    except ImportError:
+        return None
+    
+    con = duckdb.connect()
+    try:
+        con.execute(f"CREATE VIEW nih_metadata AS SELECT * FROM read_parquet('{_quote(NIH_METADATA_PARQUET)}')")
+        con.execute(f"CREATE VIEW nih_bbox AS SELECT * FROM read_parquet('{_quote(NIH_BBOX_PARQUET)}')")
+        rows = con.execute(NIH_FACETS_QUERY, {"scope": scope.strip().lower()}).fetchall()
+    except duckdb.Error:
+        return None
+    finally:
+        con.close()
+    
+    summary = {}
+    for dimension, bucket, count in rows:
+        summary.setdefault(dimension, {})[bucket] = count
+    
+    summary['refreshed_at'] = datetime.datetime.fromisoformat(manifest['written_at'])
+    return summary
+
+def _quote(path):
+    return path.replace("'", "''")
@@ -4,6 +4,8 @@ import json
 import os
 import datetime
 import uuid
+import csv
+import io
 
 def initialize_session_state():
     """
@@ -37,6 +39,9 @@ def initialize_session_state():
     
     if 'display_heatmap' not in st.session_state:
         st.session_state.display_heatmap = False
+    
+    if 'queued_analysis_jobs' not in st.session_state:
+        st.session_state.queued_analysis_jobs = []
 
 def save_analysis_result(patient_data, image_path, prediction, confidence, timestamp=None):
     """
@@ -71,25 +76,27 @@ def save_analysis_result(patient_data, image_path, prediction, confidence, times
     # Add to session state
     st.session_state.analyses.append(result)
     
-    # Save to database (if available)
+    # Queue for the database (if available); the write happens in the
+    # background and db_id is filled in once the row is stored
     try:
-        from utils.database import save_analysis_to_db
-        
-        db_id = save_analysis_to_db(
-            patient_id=patient_data.get('id', 'Unknown'),
-            image_path=image_path,
-            prediction=prediction,
-            confidence=confidence,
-            age=patient_data.get('age', 'Unknown'),
-            gender=patient_data.get('gender', 'Unknown'),
-            symptoms=patient_data.get('symptoms', 'Unknown')
-        )
-        
-        if db_id:
-            # Add database ID to result
+        from utils.write_behind import get_analysis_writer
+        
+        def backfill_db_id(db_id):
             result['db_id'] = db_id
+        
+        get_analysis_writer().save({
+            'client_id': analysis_id,
+            'timestamp': timestamp,
+            'patient_id': patient_data.get('id', 'Unknown'),
+            'image_path': image_path,
+            'prediction': prediction,
+            'confidence': confidence,
+            'age': patient_data.get('age', 'Unknown'),
+            'gender': patient_data.get('gender', 'Unknown'),
+            'symptoms': patient_data.get('symptoms', 'Unknown')
+        }, callback=backfill_db_id)
     except Exception as e:
-        # Continue even if database save fails
+        # Continue even if the analysis cannot be queued
         st.warning(f"Note: Analysis saved locally but not to database. {str(e)}")
     
     return analysis_id
@@ -231,3 +238,156 @@ def get_similar_cases(prediction, age, gender, num_cases=5):
         similar_cases = similar_cases[similar_cases['gender'] == gender]
     
     return similar_cases.head(num_cases)
+
+
+def iter_csv_chunks(batches):
+    """
+    Turn row batches into CSV text chunks, header first
+    
+    Args:
+        batches: Iterable of (columns, rows) as yielded by iter_query_batches
+        
+    Yields:
+        CSV text for one batch
+    """
+    header_written = False
+    
+    for columns, rows in batches:
+        output = io.StringIO()
+        writer = csv.writer(output)
+        
+        if not header_written:
+            writer.writerow(columns)
+            header_written = True
+        
+        writer.writerows(rows)
+        yield output.getvalue()
+
+# PostgreSQL type OIDs -> (pyarrow type name, value conversion) for Parquet
+# exports; any other type is written as text
+PARQUET_COLUMN_TYPES = {
+    16: ("bool_", None),
+    20: ("int64", None),
+    21: ("int16", None),
+    23: ("int32", None),
+    700: ("float32", None),
+    701: ("float64", None),
+    1700: ("float64", float),
+    17: ("binary", bytes),
+    1082: ("date32", None),
+    1114: ("timestamp", None),
+    1184: ("timestamp", None)
+}
+
+def _parquet_columns(pa, description):
+    """
+    Parquet schema and per-column value conversions for a cursor description
+    """
+    fields, converters = [], []
+    for column in description:
+        name, converter = PARQUET_COLUMN_TYPES.get(column[1], ("string", str))
+        if name == "timestamp":
+            arrow_type = pa.timestamp("us", tz="UTC" if column[1] == 1184 else None)
+        else:
+            arrow_type = getattr(pa, name)()
+        fields.append(pa.field(column[0], arrow_type))
+        converters.append(converter)
+    return pa.schema(fields), converters
+
+def write_export(batches, path, format="csv", description=None):
+    """
+    Stream row batches to a CSV or Parquet file with constant memory
+    
+    Parquet output needs the optional pyarrow package; each batch becomes
+    one row group. Its schema comes from the query's column types, so
+    columns that are empty in the first batch keep their type and an empty
+    result still gives a readable file.
+    
+    Args:
+        batches: Iterable of (columns, rows) as yielded by iter_query_batches
+        path: Output file path
+        format: Format to export (csv or parquet)
+        description: Cursor description of the query, required for Parquet
+            (see utils.database.describe_query)
+        
+    Returns:
+        Number of rows written
+    """
+    count = 0
+    
+    if format == "csv":
+        def counted(batches):
+            nonlocal count
+            for columns, rows in batches:
+                count += len(rows)
+                yield columns, rows
+        
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            for chunk in iter_csv_chunks(counted(batches)):
+                f.write(chunk)
+        return count
+    
+    if format == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet export needs pyarrow: pip install pyarrow")
+        
+        if description is None:
+            raise ValueError("Parquet export needs the query's column description")
+        
+        schema, converters = _parquet_columns(pa, description)
+        with pq.ParquetWriter(path, schema) as writer:
+            for _, rows in batches:
+                values = list(zip(*rows))
+                arrays = [
+                    pa.array([
+                        convert(value) if convert and value is not None else value
+                        for value in column
+                    ], type=field.type)
+                    for column, field, convert in zip(values, schema, converters)
+                ]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                count += len(rows)
+        return count
+    
+    raise ValueError(f"Unsupported export format: {format}")
+
+def export_filtered_analyses(filters, path, format="csv", batch_size=10000):
+    """
+    Export every analysis result matching the filters to a file
+    
+    Args:
+        filters: Dictionary of filter parameters (see utils.database.filter_analyses)
+        path: Output file path
+        format: Format to export (csv or parquet)
+        batch_size: Rows fetched from the database per batch
+        
+    Returns:
+        Number of rows written
+    """
+    from utils.database import iter_query_batches, describe_query, analysis_export_query
+    
+    query, params = analysis_export_query(filters)
+    description = describe_query(query, params) if format == "parquet" else None
+    return write_export(iter_query_batches(query, params, batch_size), path, format, description)
+
+def export_nih_metadata(path, format="csv", condition=None, batch_size=10000):
+    """
+    Export NIH metadata, optionally for one finding, to a file
+    
+    Args:
+        path: Output file path
+        format: Format to export (csv or parquet)
+        condition: Optional finding label
+        batch_size: Rows fetched from the database per batch
+        
+    Returns:
+        Number of rows written
+    """
+    from utils.database import iter_query_batches, describe_query, nih_metadata_export_query
+    
+    query, params = nih_metadata_export_query(condition)
+    description = describe_query(query, params) if format == "parquet" else None
+    return write_export(iter_query_batches(query, params, batch_size), path, format, description)
\ No newline at end of file
@@ -1,10 +1,21 @@
 import os
 import psycopg2
-import pandas as pd
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import threading
+import time
 import streamlit as st
+from utils.query_cache import cached_query, bump_table_version
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from utils.ingest import iter_nih_rows, copy_nih_rows, read_csv_header, split_line_ranges, copy_ranges_parallel, nih_staged_select
 import csv
 import io
+import base64
+import datetime
+import random
+import uuid
 
 # Database connection parameters from environment variables
 DB_PARAMS = {
@@ -12,346 +23,1820 @@ DB_PARAMS = {
     "user": os.environ.get("PGUSER"),
     "password": os.environ.get("PGPASSWORD"),
     "host": os.environ.get("PGHOST"),
-    "port": os.environ.get("PGPORT")
+    "port": os.environ.get("PGPORT"),
+    # Fail fast instead of hanging when the server is unreachable
+    "connect_timeout": int(os.environ.get("PGCONNECT_TIMEOUT", "5"))
 }
 
+# Pooled connections serve interactive reads and batched writes, so cap
+# how long a single statement may hold up a page
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+# Trips after consecutive connection failures or timeouts; while open, calls
+# fail immediately instead of each waiting for the connect timeout
+db_breaker = CircuitBreaker(
+    "PostgreSQL",
+    failure_threshold=int(os.environ.get("DB_BREAKER_FAILURES", "3")),
+    reset_timeout=float(os.environ.get("DB_BREAKER_RESET_SECONDS", "30"))
+)
+
+def _connect():
+    """
+    Open a new connection through the circuit breaker
+    
+    Raises:
+        CircuitOpenError: If the database is known to be down
+    """
+    db_breaker.before_call()
+    try:
+        conn = psycopg2.connect(**DB_PARAMS)
+    except psycopg2.OperationalError as e:
+        db_breaker.record_failure(e)
+        raise
+    db_breaker.record_success()
+    return conn
+
+def ensure_partitions():
+    """
+    Make sure upcoming analysis_results partitions exist (at most once a day)
+    
+    Called on app start-up; failures are ignored so the app still runs
+    without a database.
+    """
+    from utils.partitions import ensure_analysis_partitions_daily
+    
+    try:
+        ensure_analysis_partitions_daily(_connect)
+    except Exception:
+        pass
+
 def get_db_connection():
     """
-    Get a PostgreSQL database connection
+    Get a PostgreSQL database connection
+    
+    Returns:
+        connection: PostgreSQL connection object
+    """
+    try:
+        return _connect()
+    except Exception as e:
+        st.error(f"Database connection error: {str(e)}")
+        return None
+
+# Upper bound on pooled connections, shared by every session in this process
+DB_POOL_MAX_CONNECTIONS = int(os.environ.get("DB_POOL_MAX_CONNECTIONS", "8"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# psycopg2 pools raise instead of waiting when exhausted; this makes
+# borrowers queue for a free connection instead
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX_CONNECTIONS)
+
+# Pooled connections idle for longer than this are pinged before reuse;
+# ones used more recently are assumed alive, saving the round trip
+DB_POOL_PING_IDLE_SECONDS = float(os.environ.get("DB_POOL_PING_IDLE_SECONDS", "30"))
+
+# id(conn) -> time.monotonic() it was last returned to the pool
+_pool_returned_at = {}
+
+def _get_pool():
+    """
+    Get the process-wide connection pool, creating it on first use
+    """
+    global _pool
+    
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(
+                    1, DB_POOL_MAX_CONNECTIONS,
+                    options=f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}",
+                    **DB_PARAMS
+                )
+    return _pool
+
+def _borrow_live_connection(pool):
+    """
+    Take a pooled connection that still reaches the server
+    
+    Idle connections die with a server restart or an idle timeout without
+    the pool noticing. A connection idle for longer than
+    DB_POOL_PING_IDLE_SECONDS is checked with a round trip and discarded
+    if dead, without counting against the circuit breaker, until a live or
+    newly opened one comes up; recently used ones are handed out as they
+    are. Failures of a new connection are raised.
+    """
+    for _ in range(DB_POOL_MAX_CONNECTIONS):
+        conn = pool.getconn()
+        returned = _pool_returned_at.pop(id(conn), None)
+        if conn.closed:
+            pool.putconn(conn, close=True)
+            continue
+        if returned is None or time.monotonic() - returned < DB_POOL_PING_IDLE_SECONDS:
+            return conn
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return conn
+        except psycopg2.Error:
+            pool.putconn(conn, close=True)
+    
+    # Every idle connection was dead; getconn opens a new one (or raises)
+    return pool.getconn()
+
+def _return_connection(pool, conn):
+    _pool_returned_at[id(conn)] = time.monotonic()
+    pool.putconn(conn, close=bool(conn.closed))
+    if conn.closed:
+        # Broken, or closed by the pool as surplus to its minimum
+        _pool_returned_at.pop(id(conn), None)
+
+@contextmanager
+def pooled_connection():
+    """
+    Borrow a connection from the pool and hand it back afterwards
+    
+    Waits while every pooled connection is in use. Connections that sat
+    idle are checked before they are handed out, and those that were
+    closed or broken while borrowed are discarded instead of being returned
+    to the pool. Connection failures and timeouts count against the circuit
+    breaker; any other outcome shows the server is reachable.
+    
+    Yields:
+        conn: PostgreSQL connection object
+        
+    Raises:
+        CircuitOpenError: If the database is known to be down
+    """
+    db_breaker.before_call()
+    with _pool_slots:
+        try:
+            pool = _get_pool()
+            conn = _borrow_live_connection(pool)
+        except psycopg2.OperationalError as e:
+            db_breaker.record_failure(e)
+            raise
+        except BaseException:
+            db_breaker.record_success()
+            raise
+        
+        try:
+            yield conn
+        except psycopg2.OperationalError as e:
+            db_breaker.record_failure(e)
+            raise
+        except BaseException:
+            db_breaker.record_success()
+            raise
+        else:
+            db_breaker.record_success()
+        finally:
+            _return_connection(pool, conn)
+
+def execute_query(query, params=None, fetch=True):
+    """
+    Execute a SQL query and optionally fetch results
+    
+    Args:
+        query: SQL query string
+        params: Parameters for the query
+        fetch: Whether to fetch results
+        
+    Returns:
+        results: Query results if fetch is True, else None
+    """
+    try:
+        with pooled_connection() as conn:
+            with conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(query, params or ())
+                    if fetch:
+                        return cur.fetchall()
+    except (CircuitOpenError, psycopg2.OperationalError) as e:
+        st.error(f"Database connection error: {str(e)}")
+        return None
+    except Exception as e:
+        st.error(f"Query execution error: {str(e)}")
+        return None
+
+def run_concurrently(calls):
+    """
+    Run independent calls on a thread pool and gather their results
+    
+    Each call gets its own pooled connection, so the total latency is that
+    of the slowest call instead of the sum. Worker threads share the
+    Streamlit script context so st.error and friends still reach the page.
+    
+    Args:
+        calls: Dictionary of name -> (function, *args)
+        
+    Returns:
+        results: Dictionary of name -> function result
+    """
+    if not calls:
+        return {}
+    
+    initializer = None
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx, add_script_run_ctx
+        ctx = get_script_run_ctx()
+        if ctx is not None:
+            initializer = lambda: add_script_run_ctx(threading.current_thread(), ctx)
+    except ImportError:
+        pass
+    
+    workers = min(len(calls), DB_POOL_MAX_CONNECTIONS)
+    with ThreadPoolExecutor(max_workers=workers, initializer=initializer) as executor:
+        futures = {
+            name: executor.submit(call[0], *call[1:])
+            for name, call in calls.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+def execute_queries_concurrently(queries):
+    """
+    Execute independent SQL queries concurrently over pooled connections
+    
+    Args:
+        queries: Dictionary of name -> (query, params)
+        
+    Returns:
+        results: Dictionary of name -> fetched rows (None on failure)
+    """
+    return run_concurrently({
+        name: (execute_query, query, params)
+        for name, (query, params) in queries.items()
+    })
+
+# Parallel COPY connections for CSV imports (see bulk_load_nih)
+NIH_IMPORT_WORKERS = int(os.environ.get("NIH_IMPORT_WORKERS", "4"))
+
+def import_nih_metadata(csv_file, workers=None):
+    """
+    Import NIH Chest X-ray metadata from CSV file
+    
+    Args:
+        csv_file: CSV file object
+        workers: Parallel COPY connections (default NIH_IMPORT_WORKERS)
+        
+    Returns:
+        count: Number of records imported
+    """
+    try:
+        return bulk_load_nih(csv_file, 'metadata', workers)
+    except Exception as e:
+        st.error(f"Import error: {str(e)}")
+        return 0
+
+def import_bbox_data(csv_file, workers=None):
+    """
+    Import bounding box data from CSV file
+    
+    Args:
+        csv_file: CSV file object
+        workers: Parallel COPY connections (default NIH_IMPORT_WORKERS)
+        
+    Returns:
+        count: Number of records imported
+    """
+    try:
+        return bulk_load_nih(csv_file, 'bbox', workers)
+    except Exception as e:
+        st.error(f"Import error: {str(e)}")
+        return 0
+
+# Set-based merge of staged NIH rows into their table; the keys of the rows
+# actually inserted are kept in a temp table for the nih_stats delta
+NIH_MERGE_QUERIES = {
+    'metadata': """
+        WITH inserted AS (
+            INSERT INTO nih_xray_metadata 
+            (image_index, finding_labels, follow_up_num, patient_id, 
+            patient_age, patient_gender, view_position, 
+            original_image_width, original_image_height, 
+            original_image_pixel_spacing_x, original_image_pixel_spacing_y)
+            SELECT image_index, finding_labels, follow_up_num, patient_id, 
+                   patient_age, patient_gender, view_position, 
+                   original_image_width, original_image_height, 
+                   original_image_pixel_spacing_x, original_image_pixel_spacing_y
+            FROM {source} s
+            ON CONFLICT (image_index) DO NOTHING
+            RETURNING image_index
+        )
+        INSERT INTO nih_merged_metadata (key) SELECT image_index FROM inserted
+    """,
+    'bbox': """
+        WITH inserted AS (
+            INSERT INTO nih_xray_bbox 
+            (image_index, finding_label, bbox_x, bbox_y, bbox_w, bbox_h)
+            SELECT s.image_index, s.finding_label, s.bbox_x, s.bbox_y, s.bbox_w, s.bbox_h
+            FROM {source} s
+            JOIN nih_xray_metadata m ON m.image_index = s.image_index
+            RETURNING id
+        )
+        INSERT INTO nih_merged_bbox (key) SELECT id FROM inserted
+    """
+}
+
+def _merge_nih_staging(cur, kind, source):
+    """
+    Insert staged NIH rows with the import rules and update nih_stats
+    
+    Metadata already present is skipped and boxes for images without
+    metadata are left out. Runs on the caller's cursor so the rows and
+    their statistics commit together.
+    
+    Args:
+        cur: Open cursor inside the import transaction
+        kind: 'metadata' or 'bbox'
+        source: Table name or parenthesized subquery of the staged rows
+        
+    Returns:
+        tables: Table names to pass to bump_table_version
+    """
+    keys = f"nih_merged_{kind}"
+    cur.execute(f"""
+        CREATE TEMP TABLE IF NOT EXISTS {keys}
+        (key {'TEXT' if kind == 'metadata' else 'INTEGER'})
+        ON COMMIT DROP
+    """)
+    cur.execute(NIH_MERGE_QUERIES[kind].format(source=source))
+    
+    if kind == 'metadata':
+        refresh_nih_stats_incremental(cur, image_index_table=keys)
+        return ("nih_xray_metadata", "nih_stats")
+    refresh_nih_stats_incremental(cur, bbox_id_table=keys)
+    return ("nih_xray_bbox", "nih_stats")
+
+def bulk_load_nih(csv_file, kind, workers=None, merge=True):
+    """
+    Load an NIH CSV over several connections in parallel
+    
+    The file is split at line boundaries into one byte range per worker,
+    and each range is streamed unchanged into its own UNLOGGED staging
+    table of text columns by its own COPY connection (see
+    utils.ingest.copy_ranges_parallel), so the rows are parsed by several
+    PostgreSQL backends at once and never in Python. A single transaction
+    then cleans the staged text with set-based SQL, merges it into the
+    target table and updates nih_stats: the import becomes visible all at
+    once or not at all. Staging tables are dropped afterwards in any case.
+    
+    Rows with a different number of fields than the header fail the COPY
+    (PostgreSQL reports the line) instead of being padded.
+    
+    Args:
+        csv_file: Seekable binary file object of the CSV
+        kind: 'metadata' or 'bbox'
+        workers: Parallel COPY connections (default NIH_IMPORT_WORKERS)
+        merge: Merge into the target table; False only stages the rows
+            (used to benchmark the COPY phase)
+            
+    Returns:
+        count: Number of records read from the file
+        
+    Raises:
+        Database and parse errors; nothing is merged in that case
+    """
+    workers = max(1, workers or NIH_IMPORT_WORKERS)
+    header, data_start = read_csv_header(csv_file)
+    ranges = split_line_ranges(csv_file, data_start, workers)
+    if not ranges:
+        return 0
+    
+    load_id = uuid.uuid4().hex[:12]
+    tables = [f"nih_load_{load_id}_{i}" for i in range(len(ranges))]
+    columns = ", ".join(f"c{i + 1} TEXT" for i in range(len(header)))
+    
+    conn = _connect()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                for table in tables:
+                    cur.execute(f"CREATE UNLOGGED TABLE {table} ({columns})")
+        
+        counts = copy_ranges_parallel(csv_file, ranges, _connect, tables)
+        
+        if merge:
+            staged = " UNION ALL ".join(f"SELECT * FROM {table}" for table in tables)
+            source = nih_staged_select(kind, header, f"({staged}) r")
+            with conn:
+                with conn.cursor() as cur:
+                    touched = _merge_nih_staging(cur, kind, f"({source})")
+                    bump_table_version(*touched, cur=cur)
+            
+            schedule_nih_snapshot()
+        return sum(counts)
+    finally:
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    for table in tables:
+                        cur.execute(f"DROP TABLE IF EXISTS {table}")
+        except psycopg2.Error:
+            pass
+        conn.close()
+
+def copy_nih_stream(binary, kind, max_rows=None, before_attach=None, refresh_snapshot=True,
+                    progress=None, raise_errors=False):
+    """
+    Import an NIH CSV stream with COPY, parsing rows as they are read
+    
+    Rows are parsed from the stream and handed to COPY FROM STDIN as
+    PostgreSQL asks for them, so reading, parsing and loading overlap and
+    only a few chunks are held in memory. The rows land in a temporary
+    staging table and are then merged (see _merge_nih_staging).
+    
+    before_attach lets a bbox load run alongside the metadata load: the
+    boxes are staged first and only attached to nih_xray_bbox after it
+    returns (e.g. once the metadata has committed), so the foreign key to
+    nih_xray_metadata always finds the parent rows.
+    
+    Args:
+        binary: Readable binary stream of the CSV (see utils.ingest.open_nih_stream)
+        kind: 'metadata' or 'bbox'
+        max_rows: Optional number of rows to import
+        before_attach: Optional function called (and waited for) between
+            staging and inserting the rows
+        refresh_snapshot: Schedule a columnar snapshot rewrite afterwards;
+            turn off when several loads run together and schedule it once at the end
+        progress: Optional row progress callback (see utils.ingest.iter_nih_rows)
+        raise_errors: Raise import errors to the caller instead of showing
+            them on the page (for background jobs)
+            
+    Returns:
+        count: Number of records read from the stream
+    """
+    try:
+        with pooled_connection() as conn:
+            with conn:
+                with conn.cursor() as cur:
+                    # The COPY lasts as long as the download, well past the
+                    # pool's statement timeout for interactive queries
+                    cur.execute("SET LOCAL statement_timeout = 0")
+                    staging, count = copy_nih_rows(cur, iter_nih_rows(binary, kind, max_rows, progress), kind)
+                    
+                    if before_attach is not None:
+                        before_attach()
+                    
+                    tables = _merge_nih_staging(cur, kind, staging)
+                    bump_table_version(*tables, cur=cur)
+        
+        if refresh_snapshot:
+            schedule_nih_snapshot()
+        return count
+    except Exception as e:
+        if raise_errors:
+            raise
+        st.error(f"Import error: {str(e)}")
+        return 0
+
+# Summary statistics for the NIH dataset are materialized into nih_stats, one
+# row per (scope, dimension, bucket). Scope '*' holds the whole-dataset
+# distributions and every finding label gets its own scope for the Condition
+# Analytics tab; inside a condition scope the 'finding' dimension holds the
+# co-occurring findings.
+NIH_STATS_DELTA_QUERY = """
+    WITH touched AS (
+        SELECT
+            patient_age,
+            COALESCE(patient_gender, '') AS patient_gender,
+            COALESCE(view_position, '') AS view_position,
+            string_to_array(finding_labels, '|') AS findings
+        FROM nih_xray_metadata
+        {where}
+    ),
+    scoped AS (
+        SELECT '*' AS scope, t.* FROM touched t
+        UNION ALL
+        SELECT f.finding AS scope, t.*
+        FROM touched t
+        CROSS JOIN LATERAL unnest(t.findings) AS f(finding)
+    ),
+    facets AS (
+        SELECT scope, 'total' AS dimension, '' AS bucket, COUNT(*) AS count
+        FROM scoped
+        GROUP BY scope
+        UNION ALL
+        SELECT scope, 'gender', patient_gender, COUNT(*)
+        FROM scoped
+        GROUP BY scope, patient_gender
+        UNION ALL
+        SELECT 
+            scope,
+            'age_group',
+            CASE 
+                WHEN patient_age < 20 THEN '0-19'
+                WHEN patient_age BETWEEN 20 AND 39 THEN '20-39'
+                WHEN patient_age BETWEEN 40 AND 59 THEN '40-59'
+                WHEN patient_age BETWEEN 60 AND 79 THEN '60-79'
+                ELSE '80+'
+            END,
+            COUNT(*)
+        FROM scoped
+        GROUP BY 1, 3
+        UNION ALL
+        SELECT scope, 'view', view_position, COUNT(*)
+        FROM scoped
+        GROUP BY scope, view_position
+        UNION ALL
+        SELECT s.scope, 'finding', g.finding, COUNT(*)
+        FROM scoped s
+        CROSS JOIN LATERAL unnest(s.findings) AS g(finding)
+        WHERE g.finding <> s.scope
+        GROUP BY s.scope, g.finding
+    )
+    INSERT INTO nih_stats (scope, dimension, bucket, count)
+    SELECT scope, dimension, bucket, count FROM facets
+    ON CONFLICT (scope, dimension, bucket)
+    DO UPDATE SET count = nih_stats.count + EXCLUDED.count
+"""
+
+NIH_BBOX_STATS_DELTA_QUERY = """
+    WITH touched AS (
+        SELECT COALESCE(finding_label, '') AS finding_label
+        FROM nih_xray_bbox
+        {where}
+    ),
+    facets AS (
+        SELECT '*' AS scope, 'bbox' AS dimension, finding_label AS bucket, COUNT(*) AS count
+        FROM touched
+        GROUP BY finding_label
+        UNION ALL
+        SELECT finding_label, 'bbox', '', COUNT(*)
+        FROM touched
+        GROUP BY finding_label
+    )
+    INSERT INTO nih_stats (scope, dimension, bucket, count)
+    SELECT scope, dimension, bucket, count FROM facets
+    ON CONFLICT (scope, dimension, bucket)
+    DO UPDATE SET count = nih_stats.count + EXCLUDED.count
+"""
+
+NIH_STATS_READ_QUERY = """
+    SELECT r.refreshed_at, s.dimension, s.bucket, s.count
+    FROM (SELECT MAX(refreshed_at) AS refreshed_at FROM nih_stats_refresh_log) r
+    LEFT JOIN nih_stats s ON lower(s.scope) = lower(%s)
+"""
+
+def _rebuild_nih_stats(cur):
+    """
+    Recompute the whole nih_stats table from the source tables
+    
+    Args:
+        cur: Open cursor; the caller owns the transaction
+        
+    Returns:
+        rows: Number of metadata rows summarized
+    """
+    cur.execute("DELETE FROM nih_stats")
+    cur.execute(NIH_STATS_DELTA_QUERY.format(where=""))
+    cur.execute(NIH_BBOX_STATS_DELTA_QUERY.format(where=""))
+    cur.execute("SELECT COUNT(*) FROM nih_xray_metadata")
+    rows = cur.fetchone()[0]
+    cur.execute(
+        "INSERT INTO nih_stats_refresh_log (mode, rows_touched) VALUES ('full', %s)",
+        (rows,)
+    )
+    return rows
+
+def refresh_nih_stats_incremental(cur, image_indexes=None, bbox_ids=None,
+                                  image_index_table=None, bbox_id_table=None):
+    """
+    Fold newly inserted NIH rows into the materialized summary statistics.
+    
+    Runs on the importer's cursor so the summary commits (or rolls back)
+    together with the rows it describes. If the summary has never been
+    built, a full rebuild is done instead so it never holds a partial view.
+    
+    Args:
+        cur: Open cursor inside the import transaction
+        image_indexes: image_index values inserted into nih_xray_metadata
+        bbox_ids: ids inserted into nih_xray_bbox
+        image_index_table: Table with a key column of inserted image_index
+            values, for loads too large to pass as a list
+        bbox_id_table: Table with a key column of inserted bbox ids
+    """
+    image_indexes = list(image_indexes or [])
+    bbox_ids = list(bbox_ids or [])
+    
+    deltas = []
+    touched = len(image_indexes) + len(bbox_ids)
+    if image_indexes:
+        deltas.append((NIH_STATS_DELTA_QUERY, "WHERE image_index = ANY(%s)", (image_indexes,)))
+    if bbox_ids:
+        deltas.append((NIH_BBOX_STATS_DELTA_QUERY, "WHERE id = ANY(%s)", (bbox_ids,)))
+    for query, column, table in [
+        (NIH_STATS_DELTA_QUERY, "image_index", image_index_table),
+        (NIH_BBOX_STATS_DELTA_QUERY, "id", bbox_id_table)
+    ]:
+        if table:
+            cur.execute(f"SELECT COUNT(*) FROM {table}")
+            rows = cur.fetchone()[0]
+            if rows:
+                deltas.append((query, f"WHERE {column} IN (SELECT key FROM {table})", None))
+                touched += rows
+    
+    cur.execute("SELECT EXISTS (SELECT 1 FROM nih_stats_refresh_log WHERE mode = 'full')")
+    if not cur.fetchone()[0]:
+        _rebuild_nih_stats(cur)
+        return
+    
+    for query, where, params in deltas:
+        cur.execute(query.format(where=where), params)
+    
+    if touched:
+        cur.execute(
+            "INSERT INTO nih_stats_refresh_log (mode, rows_touched) VALUES ('incremental', %s)",
+            (touched,)
+        )
+
+def refresh_nih_stats():
+    """
+    Rebuild the materialized NIH summary statistics from scratch
+    
+    Returns:
+        rows: Number of metadata rows summarized, or None on failure
+    """
+    conn = get_db_connection()
+    if not conn:
+        return None
+    
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                rows = _rebuild_nih_stats(cur)
+                bump_table_version("nih_stats", cur=cur)
+        
+        refresh_nih_snapshot()
+        return rows
+    except Exception as e:
+        st.error(f"Statistics refresh error: {str(e)}")
+        return None
+    finally:
+        conn.close()
+
+def refresh_nih_snapshot():
+    """
+    Rewrite the columnar Parquet snapshot of the NIH tables
+    
+    Skipped when the optional duckdb/pyarrow packages are not installed;
+    the analytics then keep using the nih_stats summary table.
+    
+    Returns:
+        rows: Number of metadata rows in the snapshot, or None if skipped or failed
+    """
+    from utils.columnar import columnar_engine_available, snapshot_nih_tables
+    
+    if not columnar_engine_available():
+        return None
+    
+    try:
+        rows, _ = snapshot_nih_tables()
+    except Exception as e:
+        st.warning(f"Columnar snapshot not updated: {str(e)}")
+        return None
+    
+    bump_table_version("nih_snapshot")
+    return rows
+
+# Background snapshot rewrites: at most one runs at a time, and requests made
+# while it runs are folded into a single rewrite after it
+_snapshot_state = {"running": False, "pending": False}
+_snapshot_done = threading.Condition()
+
+def schedule_nih_snapshot():
+    """
+    Rewrite the columnar snapshot in a background thread
+    
+    Imports call this instead of refresh_nih_snapshot so they return as soon
+    as their rows are committed. Until the rewrite finishes, the snapshot no
+    longer matches nih_stats_refresh_log and reads use nih_stats instead
+    (see _read_nih_summary).
+    
+    Returns:
+        scheduled: False if the optional duckdb/pyarrow packages are missing
+    """
+    from utils.columnar import columnar_engine_available
+    
+    if not columnar_engine_available():
+        return False
+    
+    with _snapshot_done:
+        if _snapshot_state["running"]:
+            _snapshot_state["pending"] = True
+            return True
+        _snapshot_state["running"] = True
+    
+    threading.Thread(target=_run_nih_snapshots, name="nih-snapshot", daemon=True).start()
+    return True
+
+def _run_nih_snapshots():
+    from utils.columnar import snapshot_nih_tables
+    
+    while True:
+        try:
+            snapshot_nih_tables()
+            bump_table_version("nih_snapshot")
+        except Exception:
+            # The old snapshot no longer matches nih_stats, so it is simply not used
+            pass
+        
+        with _snapshot_done:
+            if not _snapshot_state["pending"]:
+                _snapshot_state["running"] = False
+                _snapshot_done.notify_all()
+                return
+            _snapshot_state["pending"] = False
+
+def wait_for_nih_snapshot(timeout=None):
+    """
+    Wait for scheduled snapshot rewrites to finish (for command-line imports,
+    whose process would otherwise exit mid-rewrite)
+    
+    Returns:
+        finished: False if the timeout passed first
+    """
+    with _snapshot_done:
+        return _snapshot_done.wait_for(lambda: not _snapshot_state["running"], timeout)
+
+def _current_nih_refresh_id():
+    rows = execute_query("SELECT MAX(id) AS id FROM nih_stats_refresh_log")
+    return rows[0]['id'] if rows else None
+
+def _read_nih_stats(scope):
+    """
+    Read one scope of the materialized NIH statistics
+    
+    Args:
+        scope: '*' for the whole dataset or a finding label
+        
+    Returns:
+        summary: Dictionary of dimension -> {bucket: count} plus 'refreshed_at',
+            or None if the summary has not been built yet
+    """
+    rows = execute_query(NIH_STATS_READ_QUERY, (scope,))
+    if not rows or rows[0]['refreshed_at'] is None:
+        return None
+    
+    summary = {"refreshed_at": rows[0]['refreshed_at']}
+    for row in rows:
+        if row['dimension'] is None:
+            continue
+        summary.setdefault(row['dimension'], {})[row['bucket']] = row['count']
+    return summary
+
+def _read_nih_summary(scope):
+    """
+    Read one scope of the NIH statistics from the fastest available source
+    
+    The columnar snapshot is aggregated in-process by DuckDB, but only
+    while it was taken at the latest nih_stats refresh; a snapshot that is
+    missing, being rewritten or left behind by a failed rewrite falls back
+    to the materialized nih_stats table. Same return value as _read_nih_stats.
+    """
+    from utils.columnar import read_nih_facets
+    
+    summary = read_nih_facets(scope, _current_nih_refresh_id())
+    if summary is None:
+        summary = _read_nih_stats(scope)
+    return summary
+
+def _sorted_by_count(distribution, limit=None):
+    """
+    Order a {bucket: count} dictionary by descending count
+    """
+    items = sorted(distribution.items(), key=lambda item: item[1], reverse=True)
+    return dict(items[:limit] if limit else items)
+
+@cached_query(("nih_xray_metadata", "nih_xray_bbox", "nih_stats", "nih_snapshot"), ttl=600, max_entries=4)
+def get_nih_dataset_stats():
+    """
+    Get statistics about the NIH dataset
+    
+    Served from the columnar snapshot or the materialized summary when
+    available, otherwise computed live from nih_xray_metadata. Results are
+    cached across sessions until an import or refresh writes to the NIH tables.
+    
+    Returns:
+        stats: Dictionary of dataset statistics
+    """
+    summary = _read_nih_summary('*')
+    if summary is None:
+        return _compute_nih_dataset_stats_live()
+    
+    return {
+        "total_records": summary.get('total', {}).get('', 0),
+        "gender_distribution": summary.get('gender', {}),
+        "age_distribution": dict(sorted(summary.get('age_group', {}).items())),
+        "finding_distribution": _sorted_by_count(summary.get('finding', {})),
+        "view_distribution": _sorted_by_count(summary.get('view', {})),
+        "bbox_distribution": _sorted_by_count(summary.get('bbox', {})),
+        "refreshed_at": summary['refreshed_at']
+    }
+
+def _compute_nih_dataset_stats_live():
+    """
+    Compute statistics about the NIH dataset directly from nih_xray_metadata
+    
+    Returns:
+        stats: Dictionary of dataset statistics
+    """
+    queries = {
+        # Total records
+        "total": ("SELECT COUNT(*) as total FROM nih_xray_metadata", None),
+        
+        # Gender distribution
+        "gender": ("""
+            SELECT patient_gender, COUNT(*) as count 
+            FROM nih_xray_metadata 
+            GROUP BY patient_gender
+        """, None),
+        
+        # Age distribution
+        "age": ("""
+            SELECT 
+                CASE 
+                    WHEN patient_age < 20 THEN '0-19'
+                    WHEN patient_age BETWEEN 20 AND 39 THEN '20-39'
+                    WHEN patient_age BETWEEN 40 AND 59 THEN '40-59'
+                    WHEN patient_age BETWEEN 60 AND 79 THEN '60-79'
+                    ELSE '80+'
+                END as age_group,
+                COUNT(*) as count
+            FROM nih_xray_metadata
+            GROUP BY age_group
+            ORDER BY age_group
+        """, None),
+        
+        # Finding distribution
+        "finding": ("""
+            WITH findings AS (
+                SELECT unnest(string_to_array(finding_labels, '|')) as finding
+                FROM nih_xray_metadata
+            )
+            SELECT finding, COUNT(*) as count
+            FROM findings
+            GROUP BY finding
+            ORDER BY count DESC
+        """, None),
+        
+        # View position distribution
+        "view": ("""
+            SELECT view_position, COUNT(*) as count
+            FROM nih_xray_metadata
+            GROUP BY view_position
+            ORDER BY count DESC
+        """, None)
+    }
+    
+    # The five scans are independent, so run them side by side
+    results = execute_queries_concurrently(queries)
+    
+    total = results['total'][0]['total'] if results['total'] else 0
+    gender_distribution = {row['patient_gender']: row['count'] for row in results['gender']} if results['gender'] else {}
+    age_distribution = {row['age_group']: row['count'] for row in results['age']} if results['age'] else {}
+    finding_distribution = {row['finding']: row['count'] for row in results['finding']} if results['finding'] else {}
+    view_distribution = {row['view_position']: row['count'] for row in results['view']} if results['view'] else {}
+    
+    return {
+        "total_records": total,
+        "gender_distribution": gender_distribution,
+        "age_distribution": age_distribution,
+        "finding_distribution": finding_distribution,
+        "view_distribution": view_distribution,
+        "bbox_distribution": {},
+        "refreshed_at": None
+    }
+
+def get_linked_nih_images(image_indexes):
+    """
+    Find which NIH images already have stored content linked
+    
+    Errors are raised to the caller (used by the archive ingest command).
+    
+    Args:
+        image_indexes: image_index values to check
+        
+    Returns:
+        linked: Set of the given image_index values present in nih_xray_images
+    """
+    with pooled_connection() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT image_index FROM nih_xray_images WHERE image_index = ANY(%s)",
+                    (list(image_indexes),)
+                )
+                return {row[0] for row in cur.fetchall()}
+
+def link_nih_images(images):
+    """
+    Record stored images against their NIH metadata rows
+    
+    Images without a metadata row are left unlinked (they stay in the image
+    store and are linked when the ingest is rerun after the metadata import).
+    Errors are raised to the caller.
+    
+    Args:
+        images: List of (image_index, archive, info) with info as returned
+            by utils.image_store.store_image
+            
+    Returns:
+        linked: Number of images linked
+    """
+    if not images:
+        return 0
+    
+    columns = list(zip(*[
+        (image_index, info['sha256'], info['extension'], info['width'], info['height'], info['mode'],
+         info['size_bytes'], archive)
+        for image_index, archive, info in images
+    ]))
+    
+    with pooled_connection() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO nih_xray_images
+                    (image_index, sha256, extension, width, height, mode, size_bytes, archive)
+                    SELECT v.image_index, v.sha256, v.extension, v.width, v.height, v.mode, v.size_bytes, v.archive
+                    FROM unnest(%s::varchar[], %s::char(64)[], %s::varchar[], %s::int[], %s::int[],
+                                %s::varchar[], %s::bigint[], %s::varchar[])
+                         AS v(image_index, sha256, extension, width, height, mode, size_bytes, archive)
+                    JOIN nih_xray_metadata m ON m.image_index = v.image_index
+                    ON CONFLICT (image_index) DO UPDATE SET
+                        sha256 = EXCLUDED.sha256,
+                        extension = EXCLUDED.extension,
+                        width = EXCLUDED.width,
+                        height = EXCLUDED.height,
+                        mode = EXCLUDED.mode,
+                        size_bytes = EXCLUDED.size_bytes,
+                        archive = EXCLUDED.archive,
+                        ingested_at = CURRENT_TIMESTAMP
+                """, [list(column) for column in columns])
+                linked = cur.rowcount
+                bump_table_version("nih_xray_images", cur=cur)
+    
+    return linked
+
+def get_nih_sample_records(limit=10):
+    """
+    Get a sample of NIH dataset records
+    
+    Args:
+        limit: Maximum number of records to return
+        
+    Returns:
+        records: List of record dictionaries
+    """
+    return sample_nih_records(limit)
+
+# Sampling methods supported by sample_nih_records
+NIH_SAMPLE_METHODS = ['index', 'system', 'bernoulli', 'offset', 'exact']
+
+# How many more rows than needed TABLESAMPLE should aim for; SYSTEM samples
+# whole pages so its row count varies more
+_TABLESAMPLE_OVERSAMPLE = {'system': 3.0, 'bernoulli': 1.5}
+
+def _nih_population_size(condition=None):
+    """
+    Number of rows a sample is drawn from, from the summary table or planner estimate
+    """
+    summary = _read_nih_summary(condition or '*')
+    if summary is not None:
+        return summary.get('total', {}).get('', 0)
+    
+    results = execute_query(
+        "SELECT GREATEST(reltuples, 0)::BIGINT AS estimate FROM pg_class WHERE oid = 'nih_xray_metadata'::regclass"
+    )
+    return results[0]['estimate'] if results else 0
+
+def _random_image_index(low, high, rng):
+    """
+    Random key between the first and last image_index
+    
+    NIH image indexes start with a zero-padded patient number
+    ("00012345_001.png"), so a random number between those of the first and
+    last key, padded alike, sorts between them. Keys of another shape start
+    at the first key.
+    """
+    digits = len(low) - len(low.lstrip("0123456789"))
+    if digits and high[:digits].isdigit():
+        return f"{rng.randint(int(low[:digits]), int(high[:digits])):0{digits}d}"
+    return low
+
+def sample_nih_records(limit=10, method='system', seed=None, condition=None, cohort=None):
+    """
+    Draw a random sample of NIH records without sorting the whole table
+    
+    Methods:
+        index: uniform sample drawn from the in-memory metadata index
+            (utils.nih_index), then fetched by primary key; the only method
+            that supports cohort filters
+        system: TABLESAMPLE SYSTEM, samples random pages (fastest)
+        bernoulli: TABLESAMPLE BERNOULLI, samples individual rows
+        offset: a contiguous run of rows starting at a random key of the
+            image_index primary key (a random patient number), found with
+            an index seek
+        exact: uniform sample ordered by a seeded hash (sorts every
+            matching row; for small tables)
+    
+    Args:
+        limit: Maximum number of records to return
+        method: One of NIH_SAMPLE_METHODS
+        seed: Optional integer seed for a reproducible sample
+        condition: Optional finding label; the filter applies to the whole
+            table, not just to the sampled rows
+        cohort: Optional NIHMetadataIndex.mask criteria (ages, genders,
+            views, further findings); implies method='index'
+            
+    Returns:
+        records: List of record dictionaries
+    """
+    if method not in NIH_SAMPLE_METHODS:
+        raise ValueError(f"Unknown sampling method: {method}")
+    
+    limit = int(limit)
+    rng = random.Random(seed)
+    
+    if method == 'index' or cohort:
+        from utils.nih_index import get_nih_index
+        
+        index = get_nih_index()
+        if index is None:
+            return []
+        
+        criteria = dict(cohort or {})
+        if condition:
+            criteria['findings_all'] = list(criteria.get('findings_all') or []) + [condition]
+        image_indexes = index.sample(limit, seed=seed, **criteria)
+        if not image_indexes:
+            return []
+        
+        records = execute_query(
+            "SELECT * FROM nih_xray_metadata WHERE image_index = ANY(%s)",
+            (image_indexes,)
+        ) or []
+        rng.shuffle(records)
+        return records
+    
+    where = ""
+    where_params = []
+    if condition:
+        where = "WHERE %s = ANY(string_to_array(finding_labels, '|'))"
+        where_params.append(condition)
+    
+    if method == 'exact':
+        query = f"""
+            SELECT *
+            FROM nih_xray_metadata
+            {where}
+            ORDER BY md5(image_index || %s)
+            LIMIT %s
+        """
+        return execute_query(query, tuple(where_params + [str(rng.random()), limit])) or []
+    
+    population = _nih_population_size(condition)
+    if population <= 0:
+        return []
+    
+    if method == 'offset':
+        bounds = execute_query("SELECT MIN(image_index) AS low, MAX(image_index) AS high FROM nih_xray_metadata")
+        if not bounds or bounds[0]['low'] is None:
+            return []
+        start = _random_image_index(bounds[0]['low'], bounds[0]['high'], rng)
+        
+        # Seek into the primary key instead of skipping rows with OFFSET,
+        # wrapping around to the start of the table when the run is short
+        seek = "AND" if where else "WHERE"
+        query = f"""
+            SELECT *
+            FROM nih_xray_metadata
+            {where} {seek} image_index {{}} %s
+            ORDER BY image_index
+            LIMIT %s
+        """
+        records = execute_query(query.format(">="), tuple(where_params + [start, limit])) or []
+        if len(records) < limit:
+            records += execute_query(query.format("<"), tuple(where_params + [start, limit - len(records)])) or []
+        return records
+    
+    # TABLESAMPLE over the whole table. Every row is kept with the same
+    # probability, so sizing it from the matching population yields about
+    # limit * oversample matches however rare the condition is.
+    percentage = min(100.0, limit / population * 100.0 * _TABLESAMPLE_OVERSAMPLE[method])
+    
+    records = []
+    for _ in range(3):
+        query = f"""
+            SELECT *
+            FROM nih_xray_metadata TABLESAMPLE {method.upper()} (%s) REPEATABLE (%s)
+            {where}
+        """
+        params = [percentage, rng.randrange(2 ** 31)] + where_params
+        records = execute_query(query, tuple(params)) or []
+        
+        # Estimates can be off; widen the sample if it came up short
+        if len(records) >= limit or percentage >= 100.0:
+            break
+        percentage = min(100.0, percentage * 4)
+    
+    rng.shuffle(records)
+    return records[:limit]
+
+# Inserts analyses and folds them into analysis_daily_rollup in the same
+# statement. {values} is one or more "(%s, ...)" tuples.
+ANALYSIS_INSERT_QUERY = """
+    WITH inserted AS (
+        INSERT INTO analysis_results
+        (client_id, timestamp, patient_id, image_path, prediction, confidence, age, gender, symptoms)
+        VALUES {values}
+        ON CONFLICT DO NOTHING
+        RETURNING id, client_id, timestamp, prediction, gender, age, confidence
+    ),
+    rolled_up AS (
+        INSERT INTO analysis_daily_rollup
+        (day, prediction, gender, age_bucket, analyses, confidence_sum)
+        SELECT
+            timestamp::date,
+            COALESCE(prediction, ''),
+            COALESCE(gender, ''),
+            COALESCE(floor(age / 5.0)::int * 5, -1),
+            COUNT(*),
+            COALESCE(SUM(confidence), 0)
+        FROM inserted
+        GROUP BY 1, 2, 3, 4
+        ON CONFLICT (day, prediction, gender, age_bucket)
+        DO UPDATE SET
+            analyses = analysis_daily_rollup.analyses + EXCLUDED.analyses,
+            confidence_sum = analysis_daily_rollup.confidence_sum + EXCLUDED.confidence_sum
+    )
+    SELECT id, client_id FROM inserted
+"""
+
+# One row of ANALYSIS_INSERT_QUERY; a missing timestamp means "now"
+ANALYSIS_VALUES_ROW = "(%s::uuid, COALESCE(%s::timestamp, CURRENT_TIMESTAMP), %s, %s, %s, %s, %s, %s, %s)"
+
+def save_analysis_to_db(patient_id, image_path, prediction, confidence, age, gender, symptoms):
+    """
+    Save analysis result to database
+    
+    Args:
+        patient_id: Patient ID
+        image_path: Path to the image
+        prediction: Prediction label
+        confidence: Confidence score
+        age: Patient age
+        gender: Patient gender
+        symptoms: Patient symptoms
+        
+    Returns:
+        success: Boolean indicating success
+    """
+    query = ANALYSIS_INSERT_QUERY.format(values=ANALYSIS_VALUES_ROW)
+    params = (None, None, patient_id, image_path, prediction, confidence, age, gender, symptoms)
+    
+    try:
+        result = execute_query(query, params)
+        if not result:
+            return None
+        bump_table_version("analysis_results", "analysis_daily_rollup")
+        return result[0]['id']
+    except Exception as e:
+        st.error(f"Error saving analysis: {str(e)}")
+        return None
+
+def save_analyses_batch(records):
+    """
+    Insert several analyses with one multi-row INSERT
+    
+    Records carry a client_id and timestamp, so saving the same record twice
+    (e.g. when a journal is replayed) inserts it only once. Errors are raised
+    to the caller instead of being reported on the page, since batches are
+    written from a background thread.
+    
+    Args:
+        records: List of dictionaries with client_id, timestamp, patient_id,
+            image_path, prediction, confidence, age, gender and symptoms
+            
+    Returns:
+        db_ids: Dictionary of client_id -> analysis_results id
+    """
+    if not records:
+        return {}
+    
+    query = ANALYSIS_INSERT_QUERY.format(values=", ".join([ANALYSIS_VALUES_ROW] * len(records)))
+    params = []
+    for record in records:
+        params.extend([
+            record['client_id'], record.get('timestamp'), record.get('patient_id'),
+            record.get('image_path'), record.get('prediction'), record.get('confidence'),
+            record.get('age'), record.get('gender'), record.get('symptoms')
+        ])
+    
+    with pooled_connection() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                db_ids = {str(client_id): db_id for db_id, client_id in cur.fetchall()}
+                
+                # Rows that hit the unique index were saved by an earlier attempt
+                missing = [record['client_id'] for record in records if record['client_id'] not in db_ids]
+                if missing:
+                    cur.execute(
+                        "SELECT id, client_id FROM analysis_results WHERE client_id = ANY(%s::uuid[])",
+                        (missing,)
+                    )
+                    db_ids.update({str(client_id): db_id for db_id, client_id in cur.fetchall()})
+                
+                bump_table_version("analysis_results", "analysis_daily_rollup", cur=cur)
+    
+    return db_ids
+
+@cached_query(("analysis_results",), ttl=60, max_entries=16)
+def get_analysis_results(limit=100):
+    """
+    Get analysis results from database (cached until the next save)
+    
+    Args:
+        limit: Maximum number of records to return
+        
+    Returns:
+        results: List of result dictionaries
+    """
+    query = """
+        SELECT *
+        FROM analysis_results
+        ORDER BY timestamp DESC, id DESC
+        LIMIT %s
+    """
+    return execute_query(query, (limit,))
+
+def get_analysis_by_id(analysis_id):
+    """
+    Get analysis result by ID
+    
+    Args:
+        analysis_id: ID of the analysis
+        
+    Returns:
+        result: Analysis result dictionary
+    """
+    query = "SELECT * FROM analysis_results WHERE id = %s"
+    results = execute_query(query, (analysis_id,))
+    return results[0] if results else None
+
+def _analysis_filter_clause(filters):
+    """
+    Build the WHERE clause shared by the analysis_results filter queries
+    
+    Args:
+        filters: Dictionary of filter parameters
+        
+    Returns:
+        clause: SQL condition string (starts with "1=1")
+        params: List of query parameters
+    """
+    clause = "1=1"
+    params = []
+    
+    if 'patient_id' in filters and filters['patient_id']:
+        clause += " AND patient_id = %s"
+        params.append(filters['patient_id'])
+    
+    if 'prediction' in filters and filters['prediction'] != 'All':
+        clause += " AND prediction = %s"
+        params.append(filters['prediction'])
+    
+    if 'gender' in filters and filters['gender'] != 'All':
+        clause += " AND gender = %s"
+        params.append(filters['gender'])
+    
+    if 'age_range' in filters:
+        min_age, max_age = filters['age_range']
+        clause += " AND age BETWEEN %s AND %s"
+        params.extend([min_age, max_age])
+    
+    if 'confidence_threshold' in filters:
+        clause += " AND confidence >= %s"
+        params.append(filters['confidence_threshold'])
+    
+    if 'date_range' in filters:
+        # Compare timestamp directly so monthly partitions can be pruned
+        start_date, end_date = filters['date_range']
+        clause += " AND timestamp >= %s AND timestamp < %s::date + 1"
+        params.extend([start_date, end_date])
+    
+    return clause, params
+
+def filter_analyses(filters):
+    """
+    Filter analyses based on provided filters
+    
+    Args:
+        filters: Dictionary of filter parameters
+        
+    Returns:
+        results: Filtered analysis results
+    """
+    clause, params = _analysis_filter_clause(filters)
+    query = f"SELECT * FROM analysis_results WHERE {clause} ORDER BY timestamp DESC, id DESC"
+    
+    return execute_query(query, tuple(params))
+
+def _encode_page_cursor(row):
+    """
+    Turn the last row of a page into an opaque "next page" token
+    """
+    raw = f"{row['timestamp'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def _decode_page_cursor(cursor):
+    """
+    Turn a "next page" token back into its (timestamp, id) position
+    """
+    raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    timestamp, analysis_id = raw.rsplit('|', 1)
+    return datetime.datetime.fromisoformat(timestamp), int(analysis_id)
+
+def get_analysis_page(filters=None, page_size=50, cursor=None):
+    """
+    Get one page of analysis results, newest first, using keyset pagination
+    
+    Pages are positioned on (timestamp, id) rather than OFFSET, so every
+    page costs the same no matter how deep into the history it is.
+    
+    Args:
+        filters: Dictionary of filter parameters (see filter_analyses)
+        page_size: Maximum number of records per page
+        cursor: Token returned as next_cursor by the previous page, or None
+            for the first page
+            
+    Returns:
+        page: Dictionary with 'rows' and 'next_cursor' (None on the last page)
+    """
+    clause, params = _analysis_filter_clause(filters or {})
+    
+    if cursor:
+        clause += " AND (timestamp, id) < (%s, %s)"
+        params.extend(_decode_page_cursor(cursor))
+    
+    # Fetch one extra row to learn whether another page follows
+    query = f"""
+        SELECT *
+        FROM analysis_results
+        WHERE {clause}
+        ORDER BY timestamp DESC, id DESC
+        LIMIT %s
+    """
+    params.append(page_size + 1)
+    
+    rows = execute_query(query, tuple(params)) or []
+    
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = _encode_page_cursor(rows[-1])
+    
+    return {"rows": rows, "next_cursor": next_cursor}
+
+@cached_query(("analysis_daily_rollup",), ttl=300, max_entries=1)
+def get_analysis_filter_options():
+    """
+    Get the values the dashboard filters are built from
+    
+    Read from analysis_daily_rollup, so the cost follows the number of days
+    with analyses, not the number of analyses. Ages are known only to the
+    5-year bucket, so the age bounds are widened to whole buckets.
     
     Returns:
-        connection: PostgreSQL connection object
+        options: Dictionary with total count, distinct genders and predictions,
+            age bounds and first/last day, or None on failure
     """
-    try:
-        conn = psycopg2.connect(**DB_PARAMS)
-        return conn
-    except Exception as e:
-        st.error(f"Database connection error: {str(e)}")
-        return None
+    query = """
+        SELECT
+            COALESCE(SUM(analyses), 0) AS total,
+            ARRAY(
+                SELECT DISTINCT gender FROM analysis_daily_rollup
+                WHERE gender <> '' AND analyses > 0 ORDER BY 1
+            ) AS genders,
+            ARRAY(
+                SELECT DISTINCT prediction FROM analysis_daily_rollup
+                WHERE prediction <> '' AND analyses > 0 ORDER BY 1
+            ) AS predictions,
+            MIN(age_bucket) FILTER (WHERE age_bucket >= 0) AS min_age,
+            MAX(age_bucket) FILTER (WHERE age_bucket >= 0) + %s AS max_age,
+            MIN(day) AS min_day,
+            MAX(day) AS max_day
+        FROM analysis_daily_rollup
+        WHERE analyses > 0
+    """
+    results = execute_query(query, (ROLLUP_AGE_BUCKET_SIZE - 1,))
+    return results[0] if results else None
 
-def execute_query(query, params=None, fetch=True):
+# Bins used by the dashboard charts (same as utils/visualization)
+DASHBOARD_AGE_BINS = [0, 18, 30, 45, 60, 75, 100]
+DASHBOARD_AGE_LABELS = ['0-18', '19-30', '31-45', '46-60', '61-75', '76+']
+DASHBOARD_CONFIDENCE_BINS = 10
+
+# GROUPING(prediction, gender, age_bin, confidence_bin) value of each grouping set
+_AGGREGATE_GROUPING_SETS = {
+    15: 'total',
+    7: 'prediction',
+    11: 'gender',
+    3: 'gender_prediction',
+    13: 'age_group',
+    14: 'confidence'
+}
+
+def get_analysis_aggregates(filters=None):
     """
-    Execute a SQL query and optionally fetch results
+    Get the binned counts the dashboard charts need, computed in the database
+    
+    Everything comes from a single GROUPING SETS scan, so the result size
+    depends on the number of categories and bins rather than on the number
+    of analyses.
     
     Args:
-        query: SQL query string
-        params: Parameters for the query
-        fetch: Whether to fetch results
+        filters: Dictionary of filter parameters (see filter_analyses)
         
     Returns:
-        results: Query results if fetch is True, else None
+        aggregates: Dictionary with 'total', 'prediction_counts', 'gender_counts',
+            'gender_prediction_counts', 'age_group_counts', 'confidence_bins'
+            and 'age_quantiles', or None on failure
     """
-    conn = get_db_connection()
-    if not conn:
-        return None
+    clause, params = _analysis_filter_clause(filters or {})
     
-    try:
-        with conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(query, params or ())
-                if fetch:
-                    return cur.fetchall()
-    except Exception as e:
-        st.error(f"Query execution error: {str(e)}")
+    query = f"""
+        SELECT
+            prediction,
+            gender,
+            age_bin,
+            confidence_bin,
+            GROUPING(prediction, gender, age_bin, confidence_bin) AS grouping_set,
+            COUNT(*) AS count,
+            percentile_cont(ARRAY[0, 0.25, 0.5, 0.75, 1]) WITHIN GROUP (ORDER BY age) AS age_quantiles
+        FROM (
+            SELECT
+                prediction,
+                gender,
+                age,
+                width_bucket(age, %s::int[]) AS age_bin,
+                LEAST(width_bucket(confidence, 0, 1, %s), %s) AS confidence_bin
+            FROM analysis_results
+            WHERE {clause}
+        ) filtered
+        GROUP BY GROUPING SETS (
+            (), (prediction), (gender), (gender, prediction), (age_bin), (confidence_bin)
+        )
+    """
+    query_params = [DASHBOARD_AGE_BINS, DASHBOARD_CONFIDENCE_BINS, DASHBOARD_CONFIDENCE_BINS] + params
+    
+    results = execute_query(query, tuple(query_params))
+    if results is None:
         return None
-    finally:
-        conn.close()
+    
+    aggregates = {
+        "total": 0,
+        "prediction_counts": {},
+        "gender_counts": {},
+        "gender_prediction_counts": [],
+        "age_group_counts": {label: 0 for label in DASHBOARD_AGE_LABELS},
+        "confidence_bins": [0] * DASHBOARD_CONFIDENCE_BINS,
+        "age_quantiles": {}
+    }
+    
+    for row in results:
+        grouping_set = _AGGREGATE_GROUPING_SETS.get(row['grouping_set'])
+        
+        if grouping_set == 'total':
+            aggregates['total'] = row['count']
+        elif grouping_set == 'prediction' and row['prediction'] is not None:
+            aggregates['prediction_counts'][row['prediction']] = row['count']
+            if row['age_quantiles'] and row['age_quantiles'][0] is not None:
+                aggregates['age_quantiles'][row['prediction']] = row['age_quantiles']
+        elif grouping_set == 'gender' and row['gender'] is not None:
+            aggregates['gender_counts'][row['gender']] = row['count']
+        elif grouping_set == 'gender_prediction' and row['gender'] is not None and row['prediction'] is not None:
+            aggregates['gender_prediction_counts'].append((row['gender'], row['prediction'], row['count']))
+        elif grouping_set == 'age_group' and row['age_bin'] and 1 <= row['age_bin'] <= len(DASHBOARD_AGE_LABELS):
+            # Bins outside [0, 100) and unknown ages are left out, like pd.cut
+            aggregates['age_group_counts'][DASHBOARD_AGE_LABELS[row['age_bin'] - 1]] = row['count']
+        elif grouping_set == 'confidence' and row['confidence_bin'] and row['confidence_bin'] >= 1:
+            aggregates['confidence_bins'][row['confidence_bin'] - 1] = row['count']
+    
+    return aggregates
 
-def import_nih_metadata(csv_file):
+def rebuild_analysis_rollup(start_date=None, end_date=None):
     """
-    Import NIH Chest X-ray metadata from CSV file
+    Recompute analysis_daily_rollup from analysis_results for a range of days
+    
+    Write-time maintenance keeps the rollup current; this batch compactor is
+    for backfills and bulk loads that bypass save_analysis_to_db. Only the
+    given days are touched, so history whose raw partitions were archived
+    stays in the rollup.
     
     Args:
-        csv_file: CSV file object
+        start_date: First day to rebuild (None for the earliest analysis)
+        end_date: Last day to rebuild (None for the latest analysis)
         
     Returns:
-        count: Number of records imported
+        rows: Number of rollup rows written, or None on failure
     """
     conn = get_db_connection()
     if not conn:
-        return 0
+        return None
     
     try:
-        df = pd.read_csv(csv_file)
-        count = 0
-        
         with conn:
             with conn.cursor() as cur:
-                for _, row in df.iterrows():
-                    # Clean up data
-                    patient_age = row.get('Patient Age', 0)
-                    try:
-                        patient_age = int(patient_age)
-                    except:
-                        patient_age = 0
-                    
-                    # Insert into database
-                    cur.execute("""
-                        INSERT INTO nih_xray_metadata 
-                        (image_index, finding_labels, follow_up_num, patient_id, 
-                        patient_age, patient_gender, view_position, 
-                        original_image_width, original_image_height, 
-                        original_image_pixel_spacing_x, original_image_pixel_spacing_y)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (image_index) DO NOTHING
-                    """, (
-                        row.get('Image Index', ''),
-                        row.get('Finding Labels', ''),
-                        row.get('Follow-up #', 0),
-                        row.get('Patient ID', ''),
-                        patient_age,
-                        row.get('Patient Gender', ''),
-                        row.get('View Position', ''),
-                        row.get('OriginalImage Width', 0),
-                        row.get('OriginalImage Height', 0),
-                        row.get('OriginalImage PixelSpacing x', 0.0),
-                        row.get('OriginalImage PixelSpacing y', 0.0)
-                    ))
-                    count += 1
+                cur.execute(
+                    "SELECT COALESCE(%s, MIN(timestamp)::date), COALESCE(%s, MAX(timestamp)::date) FROM analysis_results",
+                    (start_date, end_date)
+                )
+                start_date, end_date = cur.fetchone()
+                if start_date is None:
+                    return 0
+                
+                cur.execute(
+                    "DELETE FROM analysis_daily_rollup WHERE day BETWEEN %s AND %s",
+                    (start_date, end_date)
+                )
+                cur.execute("""
+                    INSERT INTO analysis_daily_rollup
+                    (day, prediction, gender, age_bucket, analyses, confidence_sum)
+                    SELECT
+                        timestamp::date,
+                        COALESCE(prediction, ''),
+                        COALESCE(gender, ''),
+                        COALESCE(floor(age / 5.0)::int * 5, -1),
+                        COUNT(*),
+                        COALESCE(SUM(confidence), 0)
+                    FROM analysis_results
+                    WHERE timestamp >= %s AND timestamp < %s::date + 1
+                    GROUP BY 1, 2, 3, 4
+                """, (start_date, end_date))
+                rows = cur.rowcount
+                bump_table_version("analysis_daily_rollup", cur=cur)
         
-        return count
+        return rows
     except Exception as e:
-        st.error(f"Import error: {str(e)}")
-        return 0
+        st.error(f"Rollup rebuild error: {str(e)}")
+        return None
     finally:
         conn.close()
 
-def import_bbox_data(csv_file):
+ROLLUP_AGE_BUCKET_SIZE = 5
+
+# GROUPING(prediction, gender, age_bucket) value of each rollup grouping set
+_ROLLUP_GROUPING_SETS = {
+    7: 'total',
+    3: 'prediction',
+    5: 'gender',
+    1: 'gender_prediction',
+    6: 'age_group',
+    2: 'prediction_age'
+}
+
+def rollup_can_answer(filters, age_bounds=None):
     """
-    Import bounding box data from CSV file
+    Check whether analysis_daily_rollup gives exact answers for these filters
+    
+    The rollup has no patient or confidence dimension, and ages only in
+    5-year buckets, so an age range must either follow bucket edges or
+    cover every age present.
     
     Args:
-        csv_file: CSV file object
+        filters: Dictionary of filter parameters
+        age_bounds: (min_age, max_age) over all analyses, if known
         
     Returns:
-        count: Number of records imported
+        Boolean
     """
-    conn = get_db_connection()
-    if not conn:
-        return 0
+    if filters.get('patient_id') or filters.get('confidence_threshold'):
+        return False
     
-    try:
-        df = pd.read_csv(csv_file)
-        count = 0
-        
-        with conn:
-            with conn.cursor() as cur:
-                for _, row in df.iterrows():
-                    cur.execute("""
-                        INSERT INTO nih_xray_bbox 
-                        (image_index, finding_label, bbox_x, bbox_y, bbox_w, bbox_h)
-                        VALUES (%s, %s, %s, %s, %s, %s)
-                    """, (
-                        row.get('Image Index', ''),
-                        row.get('Finding Label', ''),
-                        row.get('Bbox [x', 0),
-                        row.get('y', 0),
-                        row.get('w', 0),
-                        row.get('h]', 0)
-                    ))
-                    count += 1
-        
-        return count
-    except Exception as e:
-        st.error(f"Import error: {str(e)}")
-        return 0
-    finally:
-        conn.close()
+    if 'age_range' in filters:
+        min_age, max_age = filters['age_range']
+        aligned = min_age % ROLLUP_AGE_BUCKET_SIZE == 0 and (max_age + 1) % ROLLUP_AGE_BUCKET_SIZE == 0
+        covers_all = age_bounds is not None and min_age <= age_bounds[0] and max_age >= age_bounds[1]
+        if not (aligned or covers_all):
+            return False
+    
+    return True
 
-def get_nih_dataset_stats():
+def _rollup_age_label(bucket):
     """
-    Get statistics about the NIH dataset
+    Label of a 5-year age bucket, e.g. 40 -> '40-44'
+    """
+    return f"{bucket}-{bucket + ROLLUP_AGE_BUCKET_SIZE - 1}"
+
+def get_rollup_aggregates(filters=None):
+    """
+    Get dashboard counts and means from analysis_daily_rollup
     
+    Only valid when rollup_can_answer(filters) holds; the answers are then
+    exact while reading one row per day x prediction x gender x age bucket.
+    
+    Args:
+        filters: Dictionary of filter parameters (see filter_analyses)
+        
     Returns:
-        stats: Dictionary of dataset statistics
+        aggregates: Dictionary with 'total', 'prediction_counts', 'gender_counts',
+            'gender_prediction_counts', 'age_group_counts' (5-year buckets),
+            'prediction_age_counts' and 'mean_confidence', or None on failure
     """
-    # Total records
-    total_query = "SELECT COUNT(*) as total FROM nih_xray_metadata"
-    total_result = execute_query(total_query)
-    total = total_result[0]['total'] if total_result else 0
+    filters = filters or {}
+    clause = "1=1"
+    params = []
     
-    # Gender distribution
-    gender_query = """
-        SELECT patient_gender, COUNT(*) as count 
-        FROM nih_xray_metadata 
-        GROUP BY patient_gender
-    """
-    gender_results = execute_query(gender_query)
-    gender_distribution = {row['patient_gender']: row['count'] for row in gender_results} if gender_results else {}
+    if 'prediction' in filters and filters['prediction'] != 'All':
+        clause += " AND prediction = %s"
+        params.append(filters['prediction'])
     
-    # Age distribution
-    age_query = """
-        SELECT 
-            CASE 
-                WHEN patient_age < 20 THEN '0-19'
-                WHEN patient_age BETWEEN 20 AND 39 THEN '20-39'
-                WHEN patient_age BETWEEN 40 AND 59 THEN '40-59'
-                WHEN patient_age BETWEEN 60 AND 79 THEN '60-79'
-                ELSE '80+'
-            END as age_group,
-            COUNT(*) as count
-        FROM nih_xray_metadata
-        GROUP BY age_group
-        ORDER BY age_group
-    """
-    age_results = execute_query(age_query)
-    age_distribution = {row['age_group']: row['count'] for row in age_results} if age_results else {}
+    if 'gender' in filters and filters['gender'] != 'All':
+        clause += " AND gender = %s"
+        params.append(filters['gender'])
     
-    # Finding distribution
-    finding_query = """
-        WITH findings AS (
-            SELECT unnest(string_to_array(finding_labels, '|')) as finding
-            FROM nih_xray_metadata
+    if 'age_range' in filters:
+        min_age, max_age = filters['age_range']
+        clause += " AND age_bucket >= 0 AND age_bucket BETWEEN %s AND %s"
+        params.extend([
+            min_age // ROLLUP_AGE_BUCKET_SIZE * ROLLUP_AGE_BUCKET_SIZE,
+            max_age // ROLLUP_AGE_BUCKET_SIZE * ROLLUP_AGE_BUCKET_SIZE
+        ])
+    
+    if 'date_range' in filters:
+        start_date, end_date = filters['date_range']
+        clause += " AND day BETWEEN %s AND %s"
+        params.extend([start_date, end_date])
+    
+    query = f"""
+        SELECT
+            prediction,
+            gender,
+            age_bucket,
+            GROUPING(prediction, gender, age_bucket) AS grouping_set,
+            SUM(analyses) AS count,
+            SUM(confidence_sum) AS confidence_sum
+        FROM analysis_daily_rollup
+        WHERE {clause}
+        GROUP BY GROUPING SETS (
+            (), (prediction), (gender), (gender, prediction), (age_bucket), (prediction, age_bucket)
         )
-        SELECT finding, COUNT(*) as count
-        FROM findings
-        GROUP BY finding
-        ORDER BY count DESC
     """
-    finding_results = execute_query(finding_query)
-    finding_distribution = {row['finding']: row['count'] for row in finding_results} if finding_results else {}
     
-    # View position distribution
-    view_query = """
-        SELECT view_position, COUNT(*) as count
-        FROM nih_xray_metadata
-        GROUP BY view_position
-        ORDER BY count DESC
-    """
-    view_results = execute_query(view_query)
-    view_distribution = {row['view_position']: row['count'] for row in view_results} if view_results else {}
+    results = execute_query(query, tuple(params))
+    if results is None:
+        return None
     
-    return {
-        "total_records": total,
-        "gender_distribution": gender_distribution,
-        "age_distribution": age_distribution,
-        "finding_distribution": finding_distribution,
-        "view_distribution": view_distribution
+    aggregates = {
+        "total": 0,
+        "prediction_counts": {},
+        "gender_counts": {},
+        "gender_prediction_counts": [],
+        "age_group_counts": {},
+        "prediction_age_counts": [],
+        "mean_confidence": {}
     }
+    
+    # '' and -1 stand for unknown values, which the raw queries leave out too
+    for row in sorted(results, key=lambda r: (r['age_bucket'] is None, r['age_bucket'] or 0)):
+        grouping_set = _ROLLUP_GROUPING_SETS.get(row['grouping_set'])
+        count = int(row['count'])
+        
+        if grouping_set == 'total':
+            aggregates['total'] = count
+        elif grouping_set == 'prediction' and row['prediction']:
+            aggregates['prediction_counts'][row['prediction']] = count
+            aggregates['mean_confidence'][row['prediction']] = row['confidence_sum'] / count if count else 0.0
+        elif grouping_set == 'gender' and row['gender']:
+            aggregates['gender_counts'][row['gender']] = count
+        elif grouping_set == 'gender_prediction' and row['gender'] and row['prediction']:
+            aggregates['gender_prediction_counts'].append((row['gender'], row['prediction'], count))
+        elif grouping_set == 'age_group' and row['age_bucket'] >= 0:
+            aggregates['age_group_counts'][_rollup_age_label(row['age_bucket'])] = count
+        elif grouping_set == 'prediction_age' and row['prediction'] and row['age_bucket'] >= 0:
+            aggregates['prediction_age_counts'].append(
+                (row['prediction'], _rollup_age_label(row['age_bucket']), count)
+            )
+    
+    return aggregates
 
-def get_nih_sample_records(limit=10):
+def get_dashboard_aggregates(filters=None, age_bounds=None):
     """
-    Get a sample of NIH dataset records
+    Get the dashboard aggregates from the cheapest source that can answer them
+    
+    The daily rollup answers count/mean questions exactly without touching
+    raw rows; other filters need the raw aggregation.
     
     Args:
-        limit: Maximum number of records to return
+        filters: Dictionary of filter parameters (see filter_analyses)
+        age_bounds: (min_age, max_age) of the data, see rollup_can_answer
         
     Returns:
-        records: List of record dictionaries
-    """
-    query = f"""
-        SELECT *
-        FROM nih_xray_metadata
-        ORDER BY RANDOM()
-        LIMIT {limit}
+        aggregates: Dictionary as returned by get_rollup_aggregates (with
+            source='rollup') or get_analysis_aggregates, or None on failure
     """
-    return execute_query(query)
+    filters = filters or {}
+    
+    if rollup_can_answer(filters, age_bounds):
+        aggregates = get_rollup_aggregates(filters)
+        if aggregates is not None:
+            aggregates['source'] = 'rollup'
+            return aggregates
+    
+    return get_analysis_aggregates(filters)
 
-def save_analysis_to_db(patient_id, image_path, prediction, confidence, age, gender, symptoms):
+def iter_query_batches(query, params=None, batch_size=10000):
     """
-    Save analysis result to database
+    Run a query through a named server-side cursor and yield rows in batches
+    
+    Only one batch is held in memory at a time, however large the result.
     
     Args:
-        patient_id: Patient ID
-        image_path: Path to the image
-        prediction: Prediction label
-        confidence: Confidence score
-        age: Patient age
-        gender: Patient gender
-        symptoms: Patient symptoms
+        query: SQL query string
+        params: Parameters for the query
+        batch_size: Number of rows fetched per round trip
         
-    Returns:
-        success: Boolean indicating success
-    """
-    query = """
-        INSERT INTO analysis_results
-        (patient_id, image_path, prediction, confidence, age, gender, symptoms)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-        RETURNING id
+    Yields:
+        (columns, rows): Column names and a list of row tuples
+        
+    Raises:
+        Connection and query errors, so exports and batch jobs fail
+        instead of producing an empty result
     """
-    params = (patient_id, image_path, prediction, confidence, age, gender, symptoms)
-    
+    conn = _connect()
     try:
-        result = execute_query(query, params)
-        return result[0]['id'] if result else None
-    except Exception as e:
-        st.error(f"Error saving analysis: {str(e)}")
-        return None
+        # Named cursors live inside a transaction
+        with conn:
+            with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cur:
+                cur.itersize = batch_size
+                cur.execute(query, params or ())
+                
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield [column[0] for column in cur.description], rows
+    finally:
+        conn.close()
 
-def get_analysis_results(limit=100):
+def describe_query(query, params=None):
     """
-    Get analysis results from database
+    Get the result columns of a query without fetching any rows
     
     Args:
-        limit: Maximum number of records to return
+        query: SQL query string
+        params: Parameters for the query
         
     Returns:
-        results: List of result dictionaries
-    """
-    query = f"""
-        SELECT *
-        FROM analysis_results
-        ORDER BY timestamp DESC
-        LIMIT {limit}
+        description: Cursor description (name and type_code per column)
+        
+    Raises:
+        Connection and query errors
     """
-    return execute_query(query)
+    conn = _connect()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(f"SELECT * FROM ({query}) described LIMIT 0", params or ())
+                return cur.description
+    finally:
+        conn.close()
 
-def get_analysis_by_id(analysis_id):
+def analysis_export_query(filters=None):
     """
-    Get analysis result by ID
+    Build the query for exporting filtered analysis results
     
     Args:
-        analysis_id: ID of the analysis
+        filters: Dictionary of filter parameters (see filter_analyses)
         
     Returns:
-        result: Analysis result dictionary
+        (query, params) tuple for iter_query_batches
     """
-    query = "SELECT * FROM analysis_results WHERE id = %s"
-    results = execute_query(query, (analysis_id,))
-    return results[0] if results else None
+    clause, params = _analysis_filter_clause(filters or {})
+    query = f"SELECT * FROM analysis_results WHERE {clause} ORDER BY timestamp, id"
+    return query, tuple(params)
 
-def filter_analyses(filters):
+def nih_metadata_export_query(condition=None):
     """
-    Filter analyses based on provided filters
+    Build the query for exporting NIH metadata, optionally for one finding
     
     Args:
-        filters: Dictionary of filter parameters
+        condition: Optional finding label
         
     Returns:
-        results: Filtered analysis results
+        (query, params) tuple for iter_query_batches
     """
-    query = "SELECT * FROM analysis_results WHERE 1=1"
-    params = []
-    
-    if 'patient_id' in filters and filters['patient_id']:
-        query += " AND patient_id = %s"
-        params.append(filters['patient_id'])
-    
-    if 'prediction' in filters and filters['prediction'] != 'All':
-        query += " AND prediction = %s"
-        params.append(filters['prediction'])
-    
-    if 'gender' in filters and filters['gender'] != 'All':
-        query += " AND gender = %s"
-        params.append(filters['gender'])
-    
-    if 'age_range' in filters:
-        min_age, max_age = filters['age_range']
-        query += " AND age BETWEEN %s AND %s"
-        params.extend([min_age, max_age])
-    
-    if 'confidence_threshold' in filters:
-        query += " AND confidence >= %s"
-        params.append(filters['confidence_threshold'])
-    
-    if 'date_range' in filters:
-        start_date, end_date = filters['date_range']
-        query += " AND DATE(timestamp) BETWEEN %s AND %s"
-        params.extend([start_date, end_date])
-    
-    query += " ORDER BY timestamp DESC"
-    
-    return execute_query(query, tuple(params))
+    if condition:
+        return (
+            "SELECT * FROM nih_xray_metadata WHERE %s = ANY(string_to_array(finding_labels, '|')) ORDER BY image_index",
+            (condition,)
+        )
+    return "SELECT * FROM nih_xray_metadata ORDER BY image_index", ()
 
 def export_to_csv(data):
     """
@@ -381,9 +1866,10 @@ def export_to_csv(data):
     
     return output.getvalue()
 
+@cached_query(("analysis_results",), ttl=300, max_entries=256)
 def get_similar_cases_from_db(prediction, age, gender, limit=5):
     """
-    Get similar cases from database
+    Get similar cases from database (cached until the next save)
     
     Args:
         prediction: Prediction label
@@ -421,10 +1907,93 @@ def get_similar_cases_from_db(prediction, age, gender, limit=5):
     
     return execute_query(query, tuple(params))
 
+# Condition insights are shared across sessions so flipping through the
+# condition selectbox only hits the database on first touch
+CONDITION_INSIGHTS_TTL = 600
+
+CONDITION_INSIGHTS_QUERY = """
+    WITH condition_rows AS MATERIALIZED (
+        SELECT
+            patient_age,
+            patient_gender,
+            view_position,
+            string_to_array(finding_labels, '|') AS findings
+        FROM nih_xray_metadata
+        WHERE finding_labels LIKE %(pattern)s
+    )
+    SELECT 'total' AS facet, '' AS bucket, COUNT(*) AS count
+    FROM condition_rows
+    UNION ALL
+    SELECT 
+        'age_group',
+        CASE 
+            WHEN patient_age < 20 THEN '0-19'
+            WHEN patient_age BETWEEN 20 AND 39 THEN '20-39'
+            WHEN patient_age BETWEEN 40 AND 59 THEN '40-59'
+            WHEN patient_age BETWEEN 60 AND 79 THEN '60-79'
+            ELSE '80+'
+        END,
+        COUNT(*)
+    FROM condition_rows
+    GROUP BY 2
+    UNION ALL
+    SELECT 'gender', patient_gender, COUNT(*)
+    FROM condition_rows
+    GROUP BY patient_gender
+    UNION ALL
+    SELECT 'view', view_position, COUNT(*)
+    FROM condition_rows
+    GROUP BY view_position
+    UNION ALL
+    SELECT 'finding', f.finding, COUNT(*)
+    FROM condition_rows
+    CROSS JOIN LATERAL unnest(findings) AS f(finding)
+    WHERE f.finding != %(condition)s
+    GROUP BY f.finding
+"""
+
 def get_condition_insights(condition):
     """
     Get insights about a specific condition from the NIH dataset
     
+    Served from the columnar snapshot or the materialized summary when
+    available, otherwise computed live from nih_xray_metadata. Results are
+    cached per condition for CONDITION_INSIGHTS_TTL seconds and dropped
+    whenever the NIH tables are written to.
+    
+    Args:
+        condition: Condition to get insights for
+        
+    Returns:
+        insights: Dictionary of insights
+    """
+    return _cached_condition_insights(condition.strip().lower())
+
+@cached_query(("nih_xray_metadata", "nih_xray_bbox", "nih_stats", "nih_snapshot"), ttl=CONDITION_INSIGHTS_TTL, max_entries=64)
+def _cached_condition_insights(condition):
+    """
+    Cached body of get_condition_insights, keyed by the normalized condition
+    """
+    summary = _read_nih_summary(condition)
+    if summary is None:
+        return _compute_condition_insights_live(condition)
+    
+    return {
+        "total_cases": summary.get('total', {}).get('', 0),
+        "age_distribution": dict(sorted(summary.get('age_group', {}).items())),
+        "gender_distribution": summary.get('gender', {}),
+        "cooccurring_conditions": _sorted_by_count(summary.get('finding', {}), limit=5),
+        "view_distribution": _sorted_by_count(summary.get('view', {})),
+        "bbox_count": summary.get('bbox', {}).get('', 0),
+        "refreshed_at": summary['refreshed_at']
+    }
+
+def _compute_condition_insights_live(condition):
+    """
+    Compute insights about a specific condition directly from nih_xray_metadata
+    
+    All facets come from one query that scans the matching rows once.
+    
     Args:
         condition: Condition to get insights for
         
@@ -434,82 +2003,21 @@ def get_condition_insights(condition):
     # Normalize condition name
     normalized_condition = condition.strip().capitalize()
     
-    # Age distribution for condition
-    age_query = """
-        WITH condition_patients AS (
-            SELECT patient_id, patient_age, patient_gender
-            FROM nih_xray_metadata
-            WHERE finding_labels LIKE %s
-        )
-        SELECT 
-            CASE 
-                WHEN patient_age < 20 THEN '0-19'
-                WHEN patient_age BETWEEN 20 AND 39 THEN '20-39'
-                WHEN patient_age BETWEEN 40 AND 59 THEN '40-59'
-                WHEN patient_age BETWEEN 60 AND 79 THEN '60-79'
-                ELSE '80+'
-            END as age_group,
-            COUNT(*) as count
-        FROM condition_patients
-        GROUP BY age_group
-        ORDER BY age_group
-    """
-    age_results = execute_query(age_query, (f'%{normalized_condition}%',))
-    age_distribution = {row['age_group']: row['count'] for row in age_results} if age_results else {}
-    
-    # Gender distribution for condition
-    gender_query = """
-        SELECT patient_gender, COUNT(*) as count 
-        FROM nih_xray_metadata 
-        WHERE finding_labels LIKE %s
-        GROUP BY patient_gender
-    """
-    gender_results = execute_query(gender_query, (f'%{normalized_condition}%',))
-    gender_distribution = {row['patient_gender']: row['count'] for row in gender_results} if gender_results else {}
-    
-    # Co-occurring conditions
-    cooccurring_query = """
-        WITH condition_findings AS (
-            SELECT 
-                image_index,
-                unnest(string_to_array(finding_labels, '|')) as finding
-            FROM nih_xray_metadata
-            WHERE finding_labels LIKE %s
-        ),
-        other_findings AS (
-            SELECT finding
-            FROM condition_findings
-            WHERE finding != %s
-        )
-        SELECT finding, COUNT(*) as count
-        FROM other_findings
-        GROUP BY finding
-        ORDER BY count DESC
-        LIMIT 5
-    """
-    cooccurring_results = execute_query(cooccurring_query, (f'%{normalized_condition}%', normalized_condition))
-    cooccurring_conditions = {row['finding']: row['count'] for row in cooccurring_results} if cooccurring_results else {}
-    
-    # Total cases with condition
-    total_query = "SELECT COUNT(*) as total FROM nih_xray_metadata WHERE finding_labels LIKE %s"
-    total_result = execute_query(total_query, (f'%{normalized_condition}%',))
-    total = total_result[0]['total'] if total_result else 0
-    
-    # View position distribution for condition
-    view_query = """
-        SELECT view_position, COUNT(*) as count
-        FROM nih_xray_metadata
-        WHERE finding_labels LIKE %s
-        GROUP BY view_position
-        ORDER BY count DESC
-    """
-    view_results = execute_query(view_query, (f'%{normalized_condition}%',))
-    view_distribution = {row['view_position']: row['count'] for row in view_results} if view_results else {}
+    results = execute_query(CONDITION_INSIGHTS_QUERY, {
+        'pattern': f'%{normalized_condition}%',
+        'condition': normalized_condition
+    }) or []
+    
+    facets = {}
+    for row in results:
+        facets.setdefault(row['facet'], {})[row['bucket']] = row['count']
     
     return {
-        "total_cases": total,
-        "age_distribution": age_distribution,
-        "gender_distribution": gender_distribution,
-        "cooccurring_conditions": cooccurring_conditions,
-        "view_distribution": view_distribution
+        "total_cases": facets.get('total', {}).get('', 0),
+        "age_distribution": dict(sorted(facets.get('age_group', {}).items())),
+        "gender_distribution": facets.get('gender', {}),
+        "cooccurring_conditions": _sorted_by_count(facets.get('finding', {}), limit=5),
+        "view_distribution": _sorted_by_count(facets.get('view', {})),
+        "bbox_count": 0,
+        "refreshed_at": None
     }
\ No newline at end of file
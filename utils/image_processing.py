@@ -9,6 +9,11 @@ import tempfile
 import torch
 import torchvision.transforms as transforms
 
+# Model input geometry and normalization (ImageNet statistics)
+MODEL_INPUT_SIZE = 224
+MODEL_MEAN = [0.485, 0.456, 0.406]
+MODEL_STD = [0.229, 0.224, 0.225]
+
 # Image preprocessing for model input
 def preprocess_image_for_model(image_array):
     """
@@ -22,9 +27,9 @@ def preprocess_image_for_model(image_array):
     """
     # Define preprocessing steps
     preprocess = transforms.Compose([
-        transforms.Resize((224, 224)),
+        transforms.Resize((MODEL_INPUT_SIZE, MODEL_INPUT_SIZE)),
         transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+        transforms.Normalize(mean=MODEL_MEAN, std=MODEL_STD)
     ])
     
     # Convert to PIL Image
@@ -0,0 +1,208 @@
+import hashlib
+import io
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from PIL import Image
+
+# Content-addressed image store: originals under objects/, thumbnails under
+# thumbs/<size>/, both named by the SHA-256 of the original file
+IMAGE_STORE_DIR = os.environ.get("IMAGE_STORE_DIR", os.path.join("data", "image_store"))
+
+# Thumbnail pyramid, largest first; each level is downscaled from the one
+# above it rather than from the full image
+THUMBNAIL_SIZES = (512, 256, 128, 64)
+THUMBNAIL_QUALITY = 85
+
+# Archive members handed to a worker process per task
+IMAGE_INGEST_TASK_SIZE = 32
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+def _fanout(digest):
+    return os.path.join(digest[:2], digest[2:4], digest)
+
+def object_path(digest, extension=".png"):
+    """
+    Path of an original image in the store
+    """
+    return os.path.join(IMAGE_STORE_DIR, "objects", _fanout(digest) + extension)
+
+def thumbnail_path(digest, size):
+    """
+    Path of one level of an image's thumbnail pyramid
+    """
+    return os.path.join(IMAGE_STORE_DIR, "thumbs", str(size), _fanout(digest) + ".jpg")
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+def _thumbnail_base(image):
+    # 16-bit greyscale is scaled down rather than clipped to 8 bits
+    if image.mode.startswith("I"):
+        return image.convert("I").point(lambda value: value * (1 / 256)).convert("L")
+    if image.mode in ("L", "LA", "1"):
+        return image.convert("L")
+    return image.convert("RGB")
+
+def store_image(data, extension=".png"):
+    """
+    Add an image to the store and build its thumbnail pyramid
+    
+    Storing the same content again only fills in whatever is missing, so
+    interrupted ingests can simply be rerun.
+    
+    Args:
+        data: Encoded image bytes
+        extension: File extension of the original
+        
+    Returns:
+        info: Dictionary with sha256, extension, width, height, mode and
+            size_bytes
+        
+    Raises:
+        OSError: If the image cannot be decoded
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    info = {
+        "sha256": digest,
+        "extension": extension,
+        "width": image.width,
+        "height": image.height,
+        "mode": image.mode,
+        "size_bytes": len(data)
+    }
+    
+    path = object_path(digest, extension)
+    if not os.path.exists(path):
+        _write_atomic(path, data)
+    
+    missing = [size for size in THUMBNAIL_SIZES if not os.path.exists(thumbnail_path(digest, size))]
+    if missing:
+        level = _thumbnail_base(image)
+        for size in THUMBNAIL_SIZES:
+            level = level.copy()
+            level.thumbnail((size, size), Image.LANCZOS)
+            if size in missing:
+                buffer = io.BytesIO()
+                level.save(buffer, format="JPEG", quality=THUMBNAIL_QUALITY)
+                _write_atomic(thumbnail_path(digest, size), buffer.getvalue())
+    
+    return info
+
+# Archive handles of a worker process, opened once per archive
+_archives = {}
+
+def _ingest_members(archive_path, members):
+    """
+    Worker task: read members straight from the zip and store them
+    
+    Returns:
+        results: List of (image_index, info or None, error or None)
+    """
+    archive = _archives.get(archive_path)
+    if archive is None:
+        archive = _archives[archive_path] = zipfile.ZipFile(archive_path)
+    
+    results = []
+    for member in members:
+        image_index = os.path.basename(member)
+        try:
+            info = store_image(archive.read(member), os.path.splitext(member)[1].lower())
+            results.append((image_index, info, None))
+        except Exception as e:
+            results.append((image_index, None, str(e)))
+    return results
+
+def _archive_tasks(archive_path, skip):
+    with zipfile.ZipFile(archive_path) as archive:
+        members = [
+            info.filename for info in archive.infolist()
+            if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+    
+    pending = [member for member in members if os.path.basename(member) not in skip]
+    for start in range(0, len(pending), IMAGE_INGEST_TASK_SIZE):
+        yield pending[start:start + IMAGE_INGEST_TASK_SIZE]
+
+def ingest_image_archives(archive_paths, workers=None, link=None, already_linked=None, progress=None):
+    """
+    Ingest zip archives of images into the store with a process pool
+    
+    Members are read directly out of the archives by the worker processes
+    (nothing is extracted to disk), decoded, stored by content hash and
+    thumbnailed in parallel. At most a few tasks per worker are in flight,
+    so memory stays flat however large the archives are.
+    
+    Args:
+        archive_paths: Zip files to ingest
+        workers: Worker processes (default: CPU count)
+        link: Optional function called with a list of (image_index, archive
+            name, info) for each finished task; returns how many were linked
+        already_linked: Optional function returning the set of image_index
+            values among those given that were ingested before (skipped)
+        progress: Optional function called with a stats dictionary after
+            every task
+            
+    Returns:
+        stats: Dictionary with images, stored, linked, skipped, errors,
+            seconds and images_per_second
+    """
+    workers = workers or os.cpu_count() or 1
+    stats = {"images": 0, "stored": 0, "linked": 0, "skipped": 0, "errors": 0,
+             "seconds": 0.0, "images_per_second": 0.0, "last_error": None}
+    started = time.perf_counter()
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for archive_path in archive_paths:
+            archive_name = os.path.basename(archive_path)
+            
+            skip = set()
+            if already_linked is not None:
+                with zipfile.ZipFile(archive_path) as archive:
+                    names = [os.path.basename(name) for name in archive.namelist()]
+                skip = already_linked(names)
+                stats["skipped"] += len(skip)
+            
+            in_flight = set()
+            tasks = _archive_tasks(archive_path, skip)
+            while True:
+                # Keep every worker busy with a little queued work
+                for members in tasks:
+                    in_flight.add(executor.submit(_ingest_members, archive_path, members))
+                    if len(in_flight) >= workers * 2:
+                        break
+                if not in_flight:
+                    break
+                
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stored = []
+                    for image_index, info, error in future.result():
+                        stats["images"] += 1
+                        if error:
+                            stats["errors"] += 1
+                            stats["last_error"] = f"{image_index}: {error}"
+                        else:
+                            stats["stored"] += 1
+                            stored.append((image_index, archive_name, info))
+                    
+                    if link is not None and stored:
+                        stats["linked"] += link(stored)
+                    
+                    stats["seconds"] = time.perf_counter() - started
+                    stats["images_per_second"] = stats["images"] / stats["seconds"] if stats["seconds"] else 0.0
+                    if progress:
+                        progress(dict(stats))
+    
+    stats["seconds"] = time.perf_counter() - started
+    stats["images_per_second"] = stats["images"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
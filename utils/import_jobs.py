@@ -0,0 +1,279 @@
+import json
+import os
+import threading
+import streamlit as st
+from psycopg2.extras import RealDictCursor
+from utils.database import pooled_connection, execute_query
+
+# Jobs run on daemon threads of the app server process, so a server restart
+# kills them without a chance to record it. A queued/running job whose
+# heartbeat (updated_at) is older than this was abandoned that way; it is
+# marked failed and no longer blocks new imports. import_data.py loads
+# downloaded CSVs without depending on the app server.
+IMPORT_JOB_STALE_SECONDS = int(os.environ.get("IMPORT_JOB_STALE_SECONDS", "120"))
+
+# Seconds between progress writes to import_jobs (also the heartbeat and
+# how quickly a cancel request is noticed)
+IMPORT_JOB_PROGRESS_INTERVAL = 1.0
+
+NIH_KAGGLE_IMPORT = "nih_kaggle"
+
+def _execute(query, params=None, fetch=False):
+    """
+    Run a statement for a job without touching the page (background threads)
+    """
+    with pooled_connection() as conn:
+        with conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(query, params or ())
+                if fetch:
+                    return cur.fetchall()
+
+class _JobProgress:
+    """
+    Per-file counters of a running job, written to import_jobs every
+    IMPORT_JOB_PROGRESS_INTERVAL by a heartbeat thread
+    
+    The heartbeat runs whether or not rows arrive, so a job that is
+    waiting (a stalled download, the boxes waiting for the metadata, the
+    final merge) is not mistaken for an abandoned one.
+    """
+    
+    def __init__(self, job_id, rows_total=None):
+        self.job_id = job_id
+        self.rows_total = rows_total
+        self._files = {}
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._heartbeat, name=f"import-job-{job_id}-heartbeat", daemon=True)
+    
+    def start(self):
+        self._thread.start()
+    
+    def stop(self):
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.write()
+    
+    def _heartbeat(self):
+        while not self._stopped.wait(IMPORT_JOB_PROGRESS_INTERVAL):
+            self.write()
+    
+    def update(self, kind, rows, errors, bytes_read, bytes_total):
+        with self._lock:
+            self._files[kind] = (rows, errors, bytes_read or 0, bytes_total)
+    
+    def write(self):
+        with self._lock:
+            files = list(self._files.values())
+        
+        bytes_totals = [file[3] for file in files]
+        try:
+            rows = _execute("""
+                UPDATE import_jobs
+                SET rows_processed = %s, rows_total = %s, error_count = %s,
+                    bytes_processed = %s, bytes_total = %s, updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s AND status IN ('queued', 'running')
+                RETURNING cancel_requested
+            """, (
+                sum(file[0] for file in files),
+                self.rows_total,
+                sum(file[1] for file in files),
+                sum(file[2] for file in files),
+                sum(bytes_totals) if bytes_totals and None not in bytes_totals else None,
+                self.job_id
+            ), fetch=True)
+        except Exception:
+            # Progress is best effort; the import itself carries on
+            return
+        
+        # No row: the job was expired as abandoned, and another import may
+        # already be running, so stop as if cancelled
+        if not rows or rows[0]['cancel_requested']:
+            self._cancelled = True
+    
+    def cancelled(self):
+        return self._cancelled
+
+def _finish_job(job_id, status, message, result=None):
+    try:
+        _execute("""
+            UPDATE import_jobs
+            SET status = %s, message = %s, result = %s,
+                updated_at = CURRENT_TIMESTAMP, finished_at = CURRENT_TIMESTAMP
+            WHERE id = %s AND status = 'running'
+        """, (status, message, json.dumps(result) if result is not None else None, job_id))
+    except Exception:
+        pass
+
+def _run_nih_import_job(job_id, auth, sample_size):
+    from utils.kaggle_integration import run_nih_import
+    from utils.ingest import ImportCancelled
+    
+    progress = _JobProgress(job_id, rows_total=sample_size)
+    try:
+        _execute(
+            "UPDATE import_jobs SET status = 'running', started_at = CURRENT_TIMESTAMP, "
+            "updated_at = CURRENT_TIMESTAMP WHERE id = %s AND status = 'queued'",
+            (job_id,)
+        )
+        progress.start()
+        results = run_nih_import(auth, sample_size, progress=progress.update, should_stop=progress.cancelled)
+    except ImportCancelled:
+        progress.stop()
+        _finish_job(job_id, 'cancelled', "Cancelled; nothing from the unfinished files was kept")
+        return
+    except Exception as e:
+        progress.stop()
+        _finish_job(job_id, 'failed', f"Import error: {str(e)}")
+        return
+    
+    progress.stop()
+    ok = all(result and result['success'] for result in results.values())
+    message = "; ".join(result['message'] for result in results.values() if result)
+    _finish_job(job_id, 'succeeded' if ok else 'failed', message, results)
+
+def _expire_stale_jobs(kind):
+    _execute("""
+        UPDATE import_jobs
+        SET status = 'failed', message = 'Abandoned (no progress reported)', finished_at = CURRENT_TIMESTAMP
+        WHERE kind = %s AND status IN ('queued', 'running')
+          AND updated_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+    """, (kind, IMPORT_JOB_STALE_SECONDS))
+
+def start_nih_import_job(auth, sample_size=None):
+    """
+    Start a background NIH import from Kaggle, or join the one already running
+    
+    Only one NIH import can be queued or running at a time (enforced by
+    the database), so every session asking for an import while one is in
+    progress gets that job instead of starting a duplicate.
+    
+    Args:
+        auth: Kaggle (username, key)
+        sample_size: Optional number of metadata records to import
+        
+    Returns:
+        (job, created): The job row as a dictionary (None if the database is
+            unavailable), and whether this call started it
+    """
+    try:
+        _expire_stale_jobs(NIH_KAGGLE_IMPORT)
+        
+        rows = _execute("""
+            INSERT INTO import_jobs (kind, params)
+            VALUES (%s, %s)
+            ON CONFLICT (kind) WHERE status IN ('queued', 'running') DO NOTHING
+            RETURNING *
+        """, (NIH_KAGGLE_IMPORT, json.dumps({"sample_size": sample_size})), fetch=True)
+    except Exception as e:
+        st.error(f"Could not start the import: {str(e)}")
+        return None, False
+    
+    if not rows:
+        return get_active_import_job(NIH_KAGGLE_IMPORT), False
+    
+    job = rows[0]
+    threading.Thread(
+        target=_run_nih_import_job, args=(job['id'], auth, sample_size),
+        name=f"import-job-{job['id']}", daemon=True
+    ).start()
+    return job, True
+
+def get_import_job(job_id):
+    """
+    Get an import job by id
+    
+    Returns:
+        job: Dictionary of the import_jobs row, or None
+    """
+    rows = execute_query("SELECT * FROM import_jobs WHERE id = %s", (job_id,))
+    return rows[0] if rows else None
+
+def get_active_import_job(kind=NIH_KAGGLE_IMPORT):
+    """
+    Get the queued or running job of a kind, if any
+    
+    Jobs abandoned by a server restart are marked failed first, so they
+    do not keep blocking new imports.
+    
+    Returns:
+        job: Dictionary of the import_jobs row, or None
+    """
+    try:
+        _expire_stale_jobs(kind)
+    except Exception:
+        # Reported by the query below
+        pass
+    
+    rows = execute_query(
+        "SELECT * FROM import_jobs WHERE kind = %s AND status IN ('queued', 'running')",
+        (kind,)
+    )
+    return rows[0] if rows else None
+
+def get_recent_import_jobs(limit=10):
+    """
+    Get the most recently created import jobs
+    
+    Returns:
+        jobs: List of import_jobs rows, newest first
+    """
+    return execute_query(
+        "SELECT * FROM import_jobs ORDER BY created_at DESC LIMIT %s",
+        (limit,)
+    ) or []
+
+def cancel_import_job(job_id):
+    """
+    Ask a queued or running import job to stop
+    
+    The job notices within about IMPORT_JOB_PROGRESS_INTERVAL seconds and
+    rolls back the files it was still loading.
+    
+    Returns:
+        requested: True if the job was still active
+    """
+    rows = execute_query("""
+        UPDATE import_jobs
+        SET cancel_requested = TRUE
+        WHERE id = %s AND status IN ('queued', 'running')
+        RETURNING id
+    """, (job_id,))
+    return bool(rows)
+
+def get_job_metrics(job):
+    """
+    Derive throughput and ETA from an import job row
+    
+    The ETA uses the row total when known (sample imports) and otherwise
+    the share of bytes downloaded.
+    
+    Returns:
+        metrics: Dictionary with elapsed_seconds, rows_per_second, fraction
+            (0-1 or None) and eta_seconds (or None)
+    """
+    started = job.get('started_at')
+    end = job.get('finished_at') or job.get('updated_at')
+    elapsed = (end - started).total_seconds() if started and end else 0.0
+    rows = job.get('rows_processed') or 0
+    rate = rows / elapsed if elapsed > 0 else 0.0
+    
+    fraction = None
+    if job.get('rows_total'):
+        fraction = min(rows / job['rows_total'], 1.0)
+    elif job.get('bytes_total'):
+        fraction = min((job.get('bytes_processed') or 0) / job['bytes_total'], 1.0)
+    
+    eta = None
+    if fraction and elapsed > 0 and job.get('status') in ('queued', 'running'):
+        eta = elapsed * (1 - fraction) / fraction
+    
+    return {
+        "elapsed_seconds": elapsed,
+        "rows_per_second": rate,
+        "fraction": fraction,
+        "eta_seconds": eta
+    }
@@ -0,0 +1,99 @@
+import base64
+import io
+import os
+import threading
+import numpy as np
+import requests
+from PIL import Image
+
+# Base URL of a running inference server (serve_inference.py); when unset,
+# the pages run the model in-process as before
+INFERENCE_SERVER_URL = os.environ.get("INFERENCE_SERVER_URL", "").rstrip("/")
+
+INFERENCE_TIMEOUT = float(os.environ.get("INFERENCE_TIMEOUT", "60"))
+
+# One keep-alive session per thread (requests sessions are not thread-safe)
+_local = threading.local()
+
+def inference_server_enabled():
+    return bool(INFERENCE_SERVER_URL)
+
+def _session():
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+def encode_image(image_array):
+    """
+    Encode an image array as PNG for upload
+    
+    Greyscale and RGB arrays are sent as they are; PNG is lossless, so the
+    server sees the same pixels the page has.
+    """
+    image_array = np.asarray(image_array)
+    if image_array.dtype != np.uint8:
+        image_array = np.clip(image_array, 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(image_array).save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+def encode_heatmap(heatmap):
+    """
+    Heatmap array as base64 .npy bytes (shape and dtype survive the trip)
+    """
+    buffer = io.BytesIO()
+    np.save(buffer, np.asarray(heatmap, dtype=np.float32), allow_pickle=False)
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+def decode_heatmap(data):
+    return np.load(io.BytesIO(base64.b64decode(data)), allow_pickle=False)
+
+def remote_predict(image_array, gradcam=False, url=None):
+    """
+    Classify an image on the inference server
+    
+    Args:
+        image_array: Image as a numpy array (as shown on the analysis page)
+        gradcam: Also compute the Grad-CAM heatmap
+        url: Server base URL (default: INFERENCE_SERVER_URL)
+        
+    Returns:
+        result: Dictionary with class_idx, class_label, confidence and,
+            with gradcam, heatmap as a (224, 224) float array
+            
+    Raises:
+        RuntimeError: If the server is unreachable or rejects the request
+    """
+    endpoint = f"{url or INFERENCE_SERVER_URL}/{'gradcam' if gradcam else 'predict'}"
+    try:
+        response = _session().post(
+            endpoint,
+            data=encode_image(image_array),
+            headers={"Content-Type": "image/png"},
+            timeout=INFERENCE_TIMEOUT
+        )
+    except requests.RequestException as e:
+        raise RuntimeError(f"Inference server unreachable: {e}")
+    
+    if response.status_code != 200:
+        try:
+            message = response.json().get("error", response.text)
+        except ValueError:
+            message = response.text
+        raise RuntimeError(f"Inference server error ({response.status_code}): {message}")
+    
+    result = response.json()
+    if "heatmap" in result:
+        result["heatmap"] = decode_heatmap(result["heatmap"])
+    return result
+
+def inference_server_health(url=None):
+    """
+    Health and batching stats of the inference server, or None if it is down
+    """
+    try:
+        response = _session().get(f"{url or INFERENCE_SERVER_URL}/health", timeout=5)
+        response.raise_for_status()
+        return response.json()
+    except (requests.RequestException, ValueError):
+        return None
@@ -0,0 +1,200 @@
+import io
+import json
+import os
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import torch
+from utils.inference_client import encode_heatmap
+from utils.model import predict_batch
+from utils.tensor_shards import preprocess_to_uint8, to_model_batch
+
+# Largest batch run through the model in one forward pass
+INFERENCE_MAX_BATCH = int(os.environ.get("INFERENCE_MAX_BATCH", "32"))
+
+# How long the first request of a batch waits for others to join it
+INFERENCE_BATCH_WAIT_MS = float(os.environ.get("INFERENCE_BATCH_WAIT_MS", "5"))
+
+# Upper bound on an uploaded image
+INFERENCE_MAX_UPLOAD_BYTES = 64 * 1024 * 1024
+
+class _InferenceRequest:
+    def __init__(self, array, gradcam):
+        self.array = array
+        self.gradcam = gradcam
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class InferenceBatcher:
+    """
+    Run concurrent prediction requests through the model in batches
+    
+    Request threads queue their decoded image and wait; a single model
+    thread takes whatever has queued up (waiting up to max_wait_ms after
+    the first request for more) and runs it as one forward pass. Grad-CAM
+    for the requests that want it runs as one more batched backward pass on
+    the same thread, so the model is never used by two threads at once; a
+    Grad-CAM failure fails only the request it belongs to.
+    """
+    
+    def __init__(self, model, device, max_batch=INFERENCE_MAX_BATCH, max_wait_ms=INFERENCE_BATCH_WAIT_MS):
+        self.model = model
+        self.device = device
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.stats = {"requests": 0, "batches": 0, "errors": 0, "largest_batch": 0}
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+        self._thread.start()
+    
+    def submit(self, array, gradcam=False):
+        """
+        Predict one (224, 224) uint8 image, blocking until its batch has run
+        
+        Returns:
+            result: Dictionary with class_idx, class_label, confidence and,
+                if requested, heatmap
+        """
+        request = _InferenceRequest(array, gradcam)
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+    
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                inputs = to_model_batch(torch.from_numpy(np.stack([request.array for request in batch])), self.device)
+                predictions = predict_batch(self.model, inputs, self.device)
+                for request, (class_idx, class_label, confidence) in zip(batch, predictions):
+                    request.result = {"class_idx": class_idx, "class_label": class_label, "confidence": confidence}
+                self._add_gradcams(batch, inputs)
+            except Exception as e:
+                for request in batch:
+                    request.result = None
+                    request.error = e
+            finally:
+                self.stats["requests"] += len(batch)
+                self.stats["batches"] += 1
+                self.stats["errors"] += sum(request.error is not None for request in batch)
+                self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+                for request in batch:
+                    request.done.set()
+    
+    def _add_gradcams(self, batch, inputs):
+        """
+        Add heatmaps to the requests that asked for Grad-CAM
+        
+        All of them share one backward pass. If that fails, each is retried
+        alone, so an image that breaks Grad-CAM fails only its own request.
+        """
+        from assets.grad_cam import generate_gradcams
+        
+        positions = [position for position, request in enumerate(batch) if request.gradcam]
+        if not positions:
+            return
+        
+        heatmaps = generate_gradcams(
+            self.model, inputs[positions], [batch[position].result["class_idx"] for position in positions],
+            self.device
+        )
+        for position, heatmap in zip(positions, heatmaps):
+            request = batch[position]
+            if isinstance(heatmap, Exception):
+                request.result = None
+                request.error = heatmap
+            else:
+                request.result["heatmap"] = heatmap
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP endpoints of the inference server
+    
+    POST /predict and POST /gradcam take an encoded image (PNG, JPEG, ...)
+    as the request body and answer with JSON; /gradcam adds the heatmap
+    (see utils.inference_client.decode_heatmap). GET /health reports the
+    device and batching stats.
+    """
+    
+    protocol_version = "HTTP/1.1"
+    
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_GET(self):
+        if self.path != "/health":
+            self._send_json(404, {"error": f"Unknown endpoint {self.path}"})
+            return
+        
+        batcher = self.server.batcher
+        self._send_json(200, {"status": "ok", "device": str(batcher.device), **batcher.stats})
+    
+    def do_POST(self):
+        if self.path not in ("/predict", "/gradcam"):
+            # The unread body would be taken for the next request on this connection
+            self.close_connection = True
+            self._send_json(404, {"error": f"Unknown endpoint {self.path}"})
+            return
+        
+        length = int(self.headers.get("Content-Length") or 0)
+        if not 0 < length <= INFERENCE_MAX_UPLOAD_BYTES:
+            self.close_connection = True
+            self._send_json(400, {"error": "Request body must be an encoded image"})
+            return
+        
+        try:
+            array = preprocess_to_uint8(io.BytesIO(self.rfile.read(length)))
+        except Exception as e:
+            self._send_json(400, {"error": f"Cannot decode image: {e}"})
+            return
+        
+        try:
+            result = self.server.batcher.submit(array, gradcam=self.path == "/gradcam")
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+        
+        if "heatmap" in result:
+            result["heatmap"] = encode_heatmap(result["heatmap"])
+        self._send_json(200, result)
+    
+    def log_request(self, code="-", size="-"):
+        # One line per request is too chatty for a busy server; errors are still logged
+        pass
+
+def make_inference_server(model, device, host="127.0.0.1", port=8765, max_batch=INFERENCE_MAX_BATCH,
+                          max_wait_ms=INFERENCE_BATCH_WAIT_MS):
+    """
+    Create a threaded HTTP inference server around a loaded model
+    
+    Every connection gets its own thread for reading and decoding the
+    image; predictions from all of them are batched on one model thread.
+    
+    Returns:
+        server: ThreadingHTTPServer; call serve_forever() to run it
+    """
+    server = ThreadingHTTPServer((host, port), InferenceRequestHandler)
+    server.daemon_threads = True
+    server.batcher = InferenceBatcher(model, device, max_batch, max_wait_ms)
+    return server
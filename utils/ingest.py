@@ -0,0 +1,649 @@
+import base64
+import csv
+import hashlib
+import io
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+import requests
+
+# Network chunks buffered between the download thread and the parser; when
+# the queue is full the download waits, so at most
+# INGEST_QUEUE_CHUNKS * INGEST_CHUNK_SIZE bytes are in flight
+INGEST_CHUNK_SIZE = 64 * 1024
+INGEST_QUEUE_CHUNKS = 16
+
+# Rows between progress reports from iter_nih_rows
+INGEST_PROGRESS_ROWS = 5000
+
+# Times a dropped download is resumed (HTTP Range from the bytes already
+# parsed) before the import fails
+INGEST_DOWNLOAD_RETRIES = 3
+
+# CSV header -> column, for the file layouts the NIH dataset has shipped with
+NIH_METADATA_COLUMNS = {
+    'Image Index': 'image_index',
+    'Finding Labels': 'finding_labels',
+    'Follow-up #': 'follow_up_num',
+    'Patient ID': 'patient_id',
+    'Patient Age': 'patient_age',
+    'Patient Gender': 'patient_gender',
+    'View Position': 'view_position',
+    'OriginalImage Width': 'original_image_width',
+    'OriginalImage[Width': 'original_image_width',
+    'OriginalImage Height': 'original_image_height',
+    'Height]': 'original_image_height',
+    'OriginalImage PixelSpacing x': 'original_image_pixel_spacing_x',
+    'OriginalImagePixelSpacing[x': 'original_image_pixel_spacing_x',
+    'OriginalImage PixelSpacing y': 'original_image_pixel_spacing_y',
+    'y]': 'original_image_pixel_spacing_y'
+}
+
+NIH_BBOX_COLUMNS = {
+    'Image Index': 'image_index',
+    'Finding Label': 'finding_label',
+    'Bbox [x': 'bbox_x',
+    'y': 'bbox_y',
+    'w': 'bbox_w',
+    'h]': 'bbox_h'
+}
+
+class ImportCancelled(Exception):
+    """
+    Raised from a progress callback to abort an import
+    """
+
+def _to_int(value):
+    try:
+        return int(round(float(value)))
+    except (TypeError, ValueError):
+        return 0
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+# Target columns in table order with the cleaning applied to each value
+# (missing or malformed numbers become 0)
+NIH_TABLES = {
+    'metadata': {
+        'table': 'nih_xray_metadata',
+        'header': NIH_METADATA_COLUMNS,
+        'columns': [
+            ('image_index', str), ('finding_labels', str), ('follow_up_num', _to_int),
+            ('patient_id', str), ('patient_age', _to_int), ('patient_gender', str),
+            ('view_position', str), ('original_image_width', _to_int),
+            ('original_image_height', _to_int), ('original_image_pixel_spacing_x', _to_float),
+            ('original_image_pixel_spacing_y', _to_float)
+        ]
+    },
+    'bbox': {
+        'table': 'nih_xray_bbox',
+        'header': NIH_BBOX_COLUMNS,
+        'columns': [
+            ('image_index', str), ('finding_label', str), ('bbox_x', _to_int),
+            ('bbox_y', _to_int), ('bbox_w', _to_int), ('bbox_h', _to_int)
+        ]
+    }
+}
+
+# Numbers as float() reads them; the SQL cleaning turns anything else into 0
+NIH_NUMBER_PATTERN = r"^\s*[-+]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][-+]?[0-9]+)?\s*$"
+
+# The cleaners above as SQL over raw staged text (see nih_staged_select);
+# empty fields arrive as NULL, like the empty strings COPY gets from _CopySource
+NIH_SQL_CLEANERS = {
+    str: "{value}",
+    _to_int: f"CASE WHEN {{value}} ~ '{NIH_NUMBER_PATTERN}' THEN round({{value}}::float8)::int ELSE 0 END",
+    _to_float: f"CASE WHEN {{value}} ~ '{NIH_NUMBER_PATTERN}' THEN {{value}}::float8 ELSE 0 END"
+}
+
+class _QueueReader(io.RawIOBase):
+    """
+    Readable stream over chunks produced by a background download thread
+    
+    A connection that drops mid-file is resumed with an HTTP Range request
+    from the last byte received (If-Range makes sure the file has not
+    changed in between), so the parser never sees a gap. The body is hashed
+    as it arrives and checked at the end against expected_sha256, if given,
+    and against an MD5 the server sends (Content-MD5 or x-goog-hash); a
+    mismatch is raised instead of the end of the stream, so a COPY reading
+    it rolls back.
+    """
+    
+    def __init__(self, url, auth=None, session=None, timeout=30, expected_sha256=None,
+                 retries=INGEST_DOWNLOAD_RETRIES):
+        self._queue = queue.Queue(maxsize=INGEST_QUEUE_CHUNKS)
+        self._stop = threading.Event()
+        self._buffer = b""
+        self._done = False
+        self.bytes_read = 0
+        self.bytes_total = None
+        self.resumes = 0
+        self._thread = threading.Thread(
+            target=self._download,
+            args=(url, auth, session or requests.Session(), timeout, expected_sha256, retries),
+            name="ingest-download", daemon=True
+        )
+        self._thread.start()
+    
+    def _put(self, item):
+        # Blocks while the parser is behind (back-pressure), but gives up
+        # once the reader has been closed
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _download(self, url, auth, session, timeout, expected_sha256, retries):
+        try:
+            sha256, md5 = hashlib.sha256(), hashlib.md5()
+            received = 0
+            validator = None
+            server_md5 = None
+            attempts = 0
+            while True:
+                # Byte offsets only line up across requests without transfer compression
+                headers = {"Accept-Encoding": "identity"}
+                if received:
+                    headers["Range"] = f"bytes={received}-"
+                    if validator:
+                        headers["If-Range"] = validator
+                
+                try:
+                    with session.get(url, auth=auth, headers=headers, stream=True, timeout=timeout) as response:
+                        if received and response.status_code != 206:
+                            raise IOError(
+                                f"Download could not be resumed at byte {received} "
+                                f"(status code {response.status_code}); the file may have changed"
+                            )
+                        if not received:
+                            if response.status_code != 200:
+                                raise IOError(f"Download failed with status code {response.status_code}: {response.text[:500]}")
+                            if response.headers.get("Content-Length"):
+                                self.bytes_total = int(response.headers["Content-Length"])
+                            validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+                            server_md5 = _response_md5(response.headers)
+                        
+                        for chunk in response.iter_content(chunk_size=INGEST_CHUNK_SIZE):
+                            if not chunk:
+                                continue
+                            sha256.update(chunk)
+                            md5.update(chunk)
+                            received += len(chunk)
+                            if not self._put(chunk):
+                                return
+                    
+                    if self.bytes_total is not None and received < self.bytes_total:
+                        raise requests.ConnectionError(f"Connection closed after {received} of {self.bytes_total} bytes")
+                    break
+                except requests.RequestException as e:
+                    attempts += 1
+                    if attempts > retries:
+                        raise IOError(f"Download failed after {retries} resumes: {e}")
+                    self.resumes += 1
+                    time.sleep(min(2 ** attempts, 30))
+            
+            if expected_sha256 and sha256.hexdigest() != expected_sha256.lower():
+                raise IOError(f"Checksum mismatch: expected SHA-256 {expected_sha256}, got {sha256.hexdigest()}")
+            if server_md5 and md5.digest() != server_md5:
+                raise IOError("Checksum mismatch: the download does not match the MD5 sent by the server")
+            self._put(None)
+        except Exception as e:
+            self._put(e)
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        while not self._buffer and not self._done:
+            item = self._queue.get()
+            if item is None:
+                self._done = True
+            elif isinstance(item, Exception):
+                self._done = True
+                raise item
+            else:
+                self._buffer = item
+                self.bytes_read += len(item)
+        
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+    
+    def close(self):
+        # Stops the download thread, e.g. once a sample is complete
+        self._stop.set()
+        super().close()
+
+def _response_md5(headers):
+    """
+    MD5 digest of the whole file from Content-MD5 or x-goog-hash, if sent
+    """
+    # Cloud Storage (where Kaggle redirects downloads) sends "crc32c=...,md5=...";
+    # both describe the stored bytes, not ones it decompressed on the way
+    if headers.get("x-goog-stored-content-encoding", "identity") != "identity":
+        return None
+    
+    values = [headers.get("Content-MD5")]
+    for part in (headers.get("x-goog-hash") or "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name == "md5":
+            values.append(value)
+    for value in values:
+        if value:
+            try:
+                return base64.b64decode(value)
+            except ValueError:
+                pass
+    return None
+
+class _InflatingReader(io.RawIOBase):
+    """
+    Readable stream that decompresses a zip member or gzip file on the fly
+    
+    Zip archives are read front to back from the first local file header,
+    so no central directory (and no seeking) is needed.
+    """
+    
+    def __init__(self, raw):
+        self._raw = raw
+        self._pending = b""
+        self._eof = False
+        
+        head = self._read_exact(4)
+        if head == b"PK\x03\x04":
+            header = self._read_exact(26)
+            _, flags, method, _, _, _, compressed_size, _, name_length, extra_length = struct.unpack("<HHHHHIIIHH", header)
+            self._read_exact(name_length + extra_length)
+            if method == 0 and not flags & 0x08:
+                self._inflater = None
+                self._remaining = compressed_size
+            elif method == 8:
+                self._inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+            else:
+                raise IOError(f"Unsupported zip compression method {method}")
+        elif head[:2] == b"\x1f\x8b":
+            self._inflater = zlib.decompressobj(zlib.MAX_WBITS | 16)
+            self._pending = head
+        else:
+            # Not compressed
+            self._inflater = False
+            self._pending = head
+    
+    def _read_exact(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self._raw.read(size - len(data))
+            if not chunk:
+                break
+            data += chunk
+        return data
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        data = self._next_chunk(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+    
+    def _finish(self):
+        # Read the rest of the download (e.g. the zip central directory), so
+        # the end-of-file checks of the raw stream run before the parser
+        # sees the end of the data
+        self._eof = True
+        while self._raw.read(INGEST_CHUNK_SIZE):
+            pass
+    
+    def _next_chunk(self, size):
+        while not self._eof:
+            if self._inflater is False:
+                data = self._pending or self._raw.read(size)
+                self._pending = b""
+                if not data:
+                    self._finish()
+                return data
+            
+            if self._inflater is None:
+                # Stored zip member of known size
+                if self._remaining <= 0:
+                    self._finish()
+                    return b""
+                data = self._raw.read(min(size, self._remaining))
+                if not data:
+                    raise IOError("Zip member truncated")
+                self._remaining -= len(data)
+                return data
+            
+            compressed = self._inflater.unconsumed_tail or self._pending or self._raw.read(INGEST_CHUNK_SIZE)
+            self._pending = b""
+            if not compressed:
+                raise IOError("Compressed stream truncated")
+            data = self._inflater.decompress(compressed, size)
+            if self._inflater.eof:
+                self._finish()
+            if data:
+                return data
+        return b""
+
+class _CopySource:
+    """
+    File-like object that COPY FROM STDIN pulls CSV bytes from
+    
+    Rows are produced only as fast as PostgreSQL consumes them.
+    """
+    
+    def __init__(self, rows):
+        self._rows = rows
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+        self.rows = 0
+    
+    def read(self, size=-1):
+        chunk = []
+        length = 0
+        for row in self._rows:
+            self._writer.writerow(row)
+            self.rows += 1
+            text = self._buffer.getvalue()
+            self._buffer.seek(0)
+            self._buffer.truncate()
+            chunk.append(text)
+            length += len(text)
+            if size > 0 and length >= size:
+                break
+        return "".join(chunk)
+    
+    def readline(self, size=-1):
+        return self.read(size)
+
+def iter_nih_rows(binary, kind, max_rows=None, progress=None):
+    """
+    Parse an NIH CSV stream into cleaned rows in table column order
+    
+    Args:
+        binary: Readable binary (decompressed) or text stream
+        kind: 'metadata' or 'bbox'
+        max_rows: Stop after this many rows
+        progress: Optional function called with (rows, errors) every
+            INGEST_PROGRESS_ROWS rows and at the end; errors counts rows
+            with missing fields (imported with default values). Raising
+            from it aborts the import.
+            
+    Yields:
+        Tuple of column values
+    """
+    spec = NIH_TABLES[kind]
+    if isinstance(binary, io.TextIOBase):
+        reader = csv.reader(binary)
+    else:
+        reader = csv.reader(io.TextIOWrapper(binary, encoding="utf-8-sig", newline=""))
+    
+    header = next(reader, None)
+    if header is None:
+        return
+    
+    positions = {}
+    for i, name in enumerate(header):
+        column = spec['header'].get(name.strip())
+        if column and column not in positions:
+            positions[column] = i
+    
+    extractors = [(positions.get(column), clean) for column, clean in spec['columns']]
+    width = max(positions.values(), default=-1) + 1
+    
+    count, errors = 0, 0
+    for row in reader:
+        if max_rows is not None and count >= max_rows:
+            break
+        if not row:
+            continue
+        if len(row) < width:
+            errors += 1
+        yield tuple(
+            clean(row[i]) if i is not None and i < len(row) else clean("")
+            for i, clean in extractors
+        )
+        count += 1
+        if progress and count % INGEST_PROGRESS_ROWS == 0:
+            progress(count, errors)
+    
+    if progress:
+        progress(count, errors)
+
+def copy_nih_rows(cur, rows, kind):
+    """
+    COPY rows into a temporary staging table on the given cursor
+    
+    Args:
+        cur: Open cursor inside the import transaction
+        rows: Iterable of tuples from iter_nih_rows
+        kind: 'metadata' or 'bbox'
+        
+    Returns:
+        (staging_table, count): Name of the ON COMMIT DROP staging table and rows copied
+    """
+    spec = NIH_TABLES[kind]
+    staging = f"{spec['table']}_staging"
+    columns = ", ".join(column for column, _ in spec['columns'])
+    
+    cur.execute(f"""
+        CREATE TEMP TABLE IF NOT EXISTS {staging}
+        (LIKE {spec['table']} INCLUDING DEFAULTS)
+        ON COMMIT DROP
+    """)
+    
+    source = _CopySource(rows)
+    cur.copy_expert(f"COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv)", source, size=INGEST_CHUNK_SIZE)
+    return staging, source.rows
+
+class _SharedFile:
+    """
+    Positional reads from one binary file by several threads
+    
+    Uses os.pread where the file has a descriptor, so readers never share
+    a file position; in-memory files (e.g. Streamlit uploads) seek and
+    read under a lock instead.
+    """
+    
+    def __init__(self, f):
+        self._f = f
+        self._lock = threading.Lock()
+        try:
+            self._fd = f.fileno() if hasattr(os, "pread") else None
+        except (AttributeError, OSError):
+            self._fd = None
+        
+        with self._lock:
+            f.seek(0, io.SEEK_END)
+            self.size = f.tell()
+    
+    def read_at(self, position, size):
+        if self._fd is not None:
+            return os.pread(self._fd, size, position)
+        with self._lock:
+            self._f.seek(position)
+            return self._f.read(size)
+
+class _RangeReader:
+    """
+    File-like object that COPY FROM STDIN pulls one byte range from, as-is
+    """
+    
+    def __init__(self, shared, start, end):
+        self._shared = shared
+        self._position = start
+        self._end = end
+        self._last = b"\n"
+        self.rows = 0
+    
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._end - self._position
+        data = self._shared.read_at(self._position, min(size, self._end - self._position))
+        if data:
+            self._position += len(data)
+            self.rows += data.count(b"\n")
+            self._last = data[-1:]
+        elif self._last != b"\n":
+            # Last line without a line break
+            self.rows += 1
+            self._last = b"\n"
+        return data
+    
+    def readline(self, size=-1):
+        return self.read(size)
+
+def read_csv_header(f):
+    """
+    Read the header line of a seekable binary CSV
+    
+    Returns:
+        (fields, data_start): Header field names and the byte offset of the
+            first data line (([], 0) for an empty file)
+    """
+    shared = _SharedFile(f)
+    data_start = _next_line_start(shared, 0, shared.size)
+    line = shared.read_at(0, data_start).decode("utf-8-sig")
+    return next(csv.reader([line]), []), data_start
+
+def _next_line_start(shared, position, end):
+    while position < end:
+        chunk = shared.read_at(position, min(INGEST_CHUNK_SIZE, end - position))
+        if not chunk:
+            break
+        newline = chunk.find(b"\n")
+        if newline >= 0:
+            return position + newline + 1
+        position += len(chunk)
+    return end
+
+def split_line_ranges(f, start, parts):
+    """
+    Split a binary file from start to its end into byte ranges of whole lines
+    
+    Trailing line breaks are left out, so no range ends in a blank line.
+    Quoted fields must not span lines.
+    
+    Returns:
+        ranges: Up to parts (start, end) offsets of roughly equal size
+    """
+    shared = _SharedFile(f)
+    end = shared.size
+    while end > start:
+        tail = shared.read_at(max(start, end - INGEST_CHUNK_SIZE), end - max(start, end - INGEST_CHUNK_SIZE))
+        stripped = tail.rstrip(b"\r\n")
+        end -= len(tail) - len(stripped)
+        if stripped:
+            break
+    
+    bounds = [start]
+    for part in range(1, parts):
+        target = start + (end - start) * part // parts
+        bound = _next_line_start(shared, max(target, bounds[-1]), end)
+        if bounds[-1] < bound < end:
+            bounds.append(bound)
+    bounds.append(end)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if a < b]
+
+def copy_ranges_parallel(f, ranges, connect, tables):
+    """
+    COPY byte ranges of a CSV into several tables at once, one connection per range
+    
+    Each worker thread streams its range unchanged with COPY FROM STDIN
+    (FORMAT csv) on its own connection and commits it, so the rows are
+    parsed by len(tables) PostgreSQL backends in parallel; the only Python
+    work is reading the file (os.pread releases the GIL).
+    
+    Args:
+        f: Seekable binary file object
+        ranges: (start, end) byte offsets per worker (see split_line_ranges)
+        connect: Function returning a new database connection
+        tables: Target table per range, with a column per CSV field
+        
+    Returns:
+        counts: Rows copied into each table
+        
+    Raises:
+        The first worker error; the failed worker's COPY rolls back
+    """
+    shared = _SharedFile(f)
+    counts = [0] * len(tables)
+    errors = []
+    
+    def worker(i):
+        try:
+            source = _RangeReader(shared, *ranges[i])
+            conn = connect()
+            try:
+                with conn:
+                    with conn.cursor() as cur:
+                        cur.copy_expert(f"COPY {tables[i]} FROM STDIN WITH (FORMAT csv)", source, size=INGEST_CHUNK_SIZE)
+                counts[i] = source.rows
+            finally:
+                conn.close()
+        except BaseException as e:
+            errors.append(e)
+    
+    threads = [
+        threading.Thread(target=worker, args=(i,), name=f"ingest-copy-{i}", daemon=True)
+        for i in range(len(tables))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    if errors:
+        raise errors[0]
+    return counts
+
+def nih_staged_select(kind, header, source):
+    """
+    SELECT that cleans raw staged NIH text into the target table's columns
+    
+    Staged columns are named c1, c2, ... after their position in the CSV
+    header; columns the header lacks get their cleaned default.
+    
+    Args:
+        kind: 'metadata' or 'bbox'
+        header: CSV header field names (see read_csv_header)
+        source: Table name or aliased subquery of the staged rows
+        
+    Returns:
+        query: SQL with one output column per target column
+    """
+    spec = NIH_TABLES[kind]
+    positions = {}
+    for i, name in enumerate(header):
+        column = spec['header'].get(name.strip())
+        if column and column not in positions:
+            positions[column] = f"c{i + 1}"
+    
+    expressions = [
+        NIH_SQL_CLEANERS[clean].format(value=positions.get(column, "NULL::text")) + f" AS {column}"
+        for column, clean in spec['columns']
+    ]
+    return f"SELECT {', '.join(expressions)} FROM {source}"
+
+def open_nih_stream(url, auth=None, session=None, timeout=30, expected_sha256=None):
+    """
+    Start downloading a (possibly zipped or gzipped) CSV and return its decompressed byte stream
+    
+    The download runs in a background thread and is throttled by how fast
+    the stream is read. Close the stream to abort the download. Dropped
+    connections are resumed and the file is checked against expected_sha256
+    and the server's MD5 once it has been read to the end (see _QueueReader).
+    """
+    raw = _QueueReader(url, auth=auth, session=session, timeout=timeout, expected_sha256=expected_sha256)
+    return io.BufferedReader(_InflatingReader(raw), buffer_size=INGEST_CHUNK_SIZE), raw
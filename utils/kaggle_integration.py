@@ -1,12 +1,11 @@
 import streamlit as st
 import os
-import requests
-import pandas as pd
-import json
-import tempfile
-import zipfile
-import io
-from utils.database import import_nih_metadata, import_bbox_data
+import threading
+from utils.database import copy_nih_stream, run_concurrently, schedule_nih_snapshot
+from utils.ingest import open_nih_stream, ImportCancelled
+
+# Kaggle API root; point it at a local stand-in server for testing
+KAGGLE_API_BASE = os.environ.get("KAGGLE_API_BASE", "https://www.kaggle.com/api/v1")
 
 def check_kaggle_credentials():
     """
@@ -39,162 +38,115 @@ def save_kaggle_credentials(username, key):
     st.session_state.kaggle_username = username
     st.session_state.kaggle_key = key
 
-def download_nih_metadata(sample_size=None):
+def _stream_dataset_file(file_name, kind, auth, sample_size=None, before_attach=None,
+                         refresh_snapshot=True, progress=None):
     """
-    Download metadata from the NIH Chest X-ray dataset from Kaggle
+    Stream one file of the NIH dataset from Kaggle straight into the database
+    
+    The download, decompression (Kaggle may serve the file zipped), CSV
+    parsing and COPY run as a pipeline: nothing is written to disk and the
+    download is throttled to the speed of the import. With sample_size the
+    download is abandoned once that many rows are in.
     
     Args:
-        sample_size: Optional sample size to limit downloaded records
+        file_name: Name of the file in the dataset
+        kind: 'metadata' or 'bbox'
+        auth: Kaggle (username, key)
+        sample_size: Optional number of rows to import
+        before_attach: Optional function to wait for before inserting the
+            staged rows (see utils.database.copy_nih_stream)
+        refresh_snapshot: Schedule a columnar snapshot rewrite afterwards
+        progress: Optional function called with (kind, rows, errors,
+            bytes_read, bytes_total) as rows are parsed
         
     Returns:
-        Path to downloaded CSV file and success status
-    """
-    if not check_kaggle_credentials():
-        return None, False, "Kaggle credentials not found. Please provide them."
-    
-    try:
-        # Set up the API endpoint
-        dataset_name = "nih-chest-xrays/data"
-        file_name = "Data_Entry_2017.csv"
-        
-        # API endpoint for dataset file download
-        kaggle_api_url = f"https://www.kaggle.com/api/v1/datasets/download/{dataset_name}/{file_name}"
-        
-        # Prepare authentication
-        auth = (st.session_state.kaggle_username, st.session_state.kaggle_key)
+        Dictionary with success, count and message
         
-        # Download the file
-        with st.spinner(f"Downloading {file_name} from Kaggle..."):
-            response = requests.get(kaggle_api_url, auth=auth)
-            
-            if response.status_code != 200:
-                return None, False, f"Download failed with status code {response.status_code}: {response.text}"
-            
-            # Save the file to a temporary location
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as temp_file:
-                temp_file.write(response.content)
-                temp_file_path = temp_file.name
-            
-            # If sample size is specified, load only a sample
-            if sample_size:
-                try:
-                    df = pd.read_csv(temp_file_path, nrows=sample_size)
-                    df.to_csv(temp_file_path, index=False)
-                except Exception as e:
-                    return None, False, f"Error sampling data: {str(e)}"
-            
-            return temp_file_path, True, "Download successful"
-            
-    except Exception as e:
-        return None, False, f"Error downloading file: {str(e)}"
-
-def download_nih_bbox_data():
-    """
-    Download bounding box data from the NIH Chest X-ray dataset from Kaggle
-    
-    Returns:
-        Path to downloaded CSV file and success status
+    Raises:
+        ImportCancelled: If progress or before_attach cancelled the import
     """
-    if not check_kaggle_credentials():
-        return None, False, "Kaggle credentials not found. Please provide them."
+    dataset_name = "nih-chest-xrays/data"
+    kaggle_api_url = f"{KAGGLE_API_BASE}/datasets/download/{dataset_name}/{file_name}"
     
+    stream, download = None, None
     try:
-        # Set up the API endpoint
-        dataset_name = "nih-chest-xrays/data"
-        file_name = "BBox_List_2017.csv"
-        
-        # API endpoint for dataset file download
-        kaggle_api_url = f"https://www.kaggle.com/api/v1/datasets/download/{dataset_name}/{file_name}"
+        stream, download = open_nih_stream(kaggle_api_url, auth=auth)
         
-        # Prepare authentication
-        auth = (st.session_state.kaggle_username, st.session_state.kaggle_key)
+        row_progress = None
+        if progress:
+            row_progress = lambda rows, errors: progress(kind, rows, errors, download.bytes_read, download.bytes_total)
         
-        # Download the file
-        with st.spinner(f"Downloading {file_name} from Kaggle..."):
-            response = requests.get(kaggle_api_url, auth=auth)
-            
-            if response.status_code != 200:
-                return None, False, f"Download failed with status code {response.status_code}: {response.text}"
-            
-            # Save the file to a temporary location
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as temp_file:
-                temp_file.write(response.content)
-                temp_file_path = temp_file.name
-            
-            return temp_file_path, True, "Download successful"
-            
+        count = copy_nih_stream(
+            stream, kind, max_rows=sample_size,
+            before_attach=before_attach, refresh_snapshot=refresh_snapshot,
+            progress=row_progress, raise_errors=True
+        )
+    except ImportCancelled:
+        raise
     except Exception as e:
-        return None, False, f"Error downloading file: {str(e)}"
+        return {"success": False, "count": 0, "message": f"Error importing {file_name}: {str(e)}"}
+    finally:
+        if download is not None:
+            download.close()
+    
+    label = "metadata" if kind == 'metadata' else "bounding box"
+    return {
+        "success": count > 0,
+        "count": count,
+        "message": f"Successfully imported {count} {label} records" if count else f"No {label} records imported"
+    }
 
-def import_nih_data_from_kaggle(sample_size=1000):
+def run_nih_import(auth, sample_size=None, progress=None, should_stop=None):
     """
-    Download and import NIH dataset from Kaggle
+    Import the NIH metadata and bounding boxes from Kaggle
+    
+    Both files download and load at the same time; the boxes wait in their
+    staging table until the metadata they reference has committed. Uses no
+    Streamlit calls, so it can run outside a page (see utils.import_jobs).
     
     Args:
-        sample_size: Number of records to download as sample
+        auth: Kaggle (username, key)
+        sample_size: Optional number of metadata records to import
+        progress: Optional function called with (kind, rows, errors,
+            bytes_read, bytes_total)
+        should_stop: Optional function returning True to cancel; checked
+            with every progress report and before the boxes are attached.
+            A cancelled load rolls back.
         
     Returns:
         Dictionary of import results
+        
+    Raises:
+        ImportCancelled: If should_stop cancelled the import
     """
-    results = {
-        "metadata": {
-            "success": False,
-            "count": 0,
-            "message": ""
-        },
-        "bbox": {
-            "success": False,
-            "count": 0,
-            "message": ""
-        }
-    }
+    metadata_done = threading.Event()
     
-    # Download metadata
-    metadata_path, success, message = download_nih_metadata(sample_size)
+    def check_stop():
+        if should_stop and should_stop():
+            raise ImportCancelled("Import cancelled")
     
-    if success:
-        # Import metadata to database
-        try:
-            with open(metadata_path, 'r') as file:
-                count = import_nih_metadata(file)
-                results["metadata"] = {
-                    "success": True,
-                    "count": count,
-                    "message": f"Successfully imported {count} metadata records"
-                }
-        except Exception as e:
-            results["metadata"]["message"] = f"Error importing metadata: {str(e)}"
-        
-        # Clean up
-        try:
-            os.remove(metadata_path)
-        except:
-            pass
-    else:
-        results["metadata"]["message"] = message
-    
-    # Download bbox data
-    bbox_path, success, message = download_nih_bbox_data()
+    def report(kind, rows, errors, bytes_read, bytes_total):
+        if progress:
+            progress(kind, rows, errors, bytes_read, bytes_total)
+        check_stop()
     
-    if success:
-        # Import bbox data to database
-        try:
-            with open(bbox_path, 'r') as file:
-                count = import_bbox_data(file)
-                results["bbox"] = {
-                    "success": True,
-                    "count": count,
-                    "message": f"Successfully imported {count} bounding box records"
-                }
-        except Exception as e:
-            results["bbox"]["message"] = f"Error importing bounding box data: {str(e)}"
-        
-        # Clean up
+    def import_metadata():
         try:
-            os.remove(bbox_path)
-        except:
-            pass
-    else:
-        results["bbox"]["message"] = message
+            return _stream_dataset_file(
+                "Data_Entry_2017.csv", 'metadata', auth, sample_size,
+                refresh_snapshot=False, progress=report
+            )
+        finally:
+            metadata_done.set()
+    
+    def attach_bbox():
+        metadata_done.wait()
+        check_stop()
     
-    return results
\ No newline at end of file
+    try:
+        return run_concurrently({
+            "metadata": (import_metadata,),
+            "bbox": (_stream_dataset_file, "BBox_List_2017.csv", 'bbox', auth, None, attach_bbox, False, report)
+        })
+    finally:
+        schedule_nih_snapshot()
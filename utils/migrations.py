@@ -0,0 +1,257 @@
+import importlib
+import json
+import pkgutil
+
+import migrations as migrations_package
+
+# Serializes concurrent migration runners (arbitrary application-wide key)
+MIGRATION_LOCK_KEY = 872310
+
+SCHEMA_VERSION_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        description TEXT,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        planner_checks JSONB
+    )
+"""
+
+def discover_migrations():
+    """
+    Find the migration modules in the migrations package
+    
+    Modules are named vNNN_description.py and define DESCRIPTION, UP, DOWN
+    and CHECKS.
+    
+    Returns:
+        migrations: List of migration dictionaries ordered by version
+    """
+    found = []
+    for module_info in pkgutil.iter_modules(migrations_package.__path__):
+        prefix, _, _ = module_info.name.partition('_')
+        if not (prefix.startswith('v') and prefix[1:].isdigit()):
+            continue
+        
+        module = importlib.import_module(f"migrations.{module_info.name}")
+        found.append({
+            "version": int(prefix[1:]),
+            "name": module_info.name,
+            "description": getattr(module, 'DESCRIPTION', ''),
+            "up": list(getattr(module, 'UP', [])),
+            "down": list(getattr(module, 'DOWN', [])),
+            "checks": list(getattr(module, 'CHECKS', []))
+        })
+    
+    found.sort(key=lambda migration: migration['version'])
+    
+    versions = [migration['version'] for migration in found]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions: {versions}")
+    
+    return found
+
+def _lock(cur):
+    """
+    Take the transaction-scoped migration lock and make sure schema_version exists
+    """
+    cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_KEY,))
+    cur.execute(SCHEMA_VERSION_DDL)
+
+def get_applied_versions(conn):
+    """
+    Get the migration versions recorded in schema_version
+    
+    Args:
+        conn: PostgreSQL connection
+        
+    Returns:
+        versions: Set of applied version numbers
+    """
+    with conn:
+        with conn.cursor() as cur:
+            _lock(cur)
+            cur.execute("SELECT version FROM schema_version")
+            return {row[0] for row in cur.fetchall()}
+
+def _plan_names(plan, key):
+    """
+    Collect every value of key (e.g. 'Index Name') anywhere in an EXPLAIN JSON plan node
+    """
+    names = set()
+    if key in plan:
+        names.add(plan[key])
+    for child in plan.get('Plans', []):
+        names |= _plan_names(child, key)
+    return names
+
+def _index_family(cur, index_name):
+    """
+    Get an index name plus the names of its per-partition child indexes
+    """
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+    """, (index_name,))
+    return {index_name} | {row[0] for row in cur.fetchall()}
+
+def run_planner_checks(cur, checks):
+    """
+    EXPLAIN each check query and verify the planner reaches the expected index
+    
+    Sequential scans are disabled while checking: on a small or freshly
+    created table the planner always prefers a seq scan, so this verifies
+    that the index can serve the access path at all. On partitioned tables
+    the per-partition copies of the index count as the index, and a check
+    may also set "max_partitions" to verify partition pruning.
+    
+    Args:
+        cur: Open cursor inside the migration transaction
+        checks: List of {"query", "params", "index"[, "max_partitions"]} dictionaries
+        
+    Returns:
+        report: List of check results
+    """
+    report = []
+    if not checks:
+        return report
+    
+    cur.execute("SET LOCAL enable_seqscan = off")
+    try:
+        for check in checks:
+            cur.execute("EXPLAIN (FORMAT JSON) " + check['query'], check.get('params') or ())
+            plan = cur.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            
+            used = _plan_names(plan[0]['Plan'], 'Index Name')
+            passed = bool(used & _index_family(cur, check['index']))
+            
+            result = {
+                "index": check['index'],
+                "used": passed,
+                "plan_indexes": sorted(used)
+            }
+            
+            if 'max_partitions' in check:
+                relations = _plan_names(plan[0]['Plan'], 'Relation Name')
+                result["plan_relations"] = sorted(relations)
+                result["used"] = passed and len(relations) <= check['max_partitions']
+            
+            report.append(result)
+    finally:
+        cur.execute("RESET enable_seqscan")
+    
+    return report
+
+def upgrade(conn, target=None, log=print):
+    """
+    Apply pending migrations up to and including the target version
+    
+    Each migration runs in its own transaction together with its
+    schema_version row and planner check report.
+    
+    Args:
+        conn: PostgreSQL connection
+        target: Highest version to apply (None for latest)
+        log: Function used to report progress
+        
+    Returns:
+        applied: List of applied version numbers
+    """
+    applied = []
+    
+    for migration in discover_migrations():
+        if target is not None and migration['version'] > target:
+            break
+        
+        with conn:
+            with conn.cursor() as cur:
+                _lock(cur)
+                cur.execute("SELECT 1 FROM schema_version WHERE version = %s", (migration['version'],))
+                if cur.fetchone():
+                    continue
+                
+                log(f"Applying {migration['name']}: {migration['description']}")
+                for statement in migration['up']:
+                    cur.execute(statement)
+                
+                report = run_planner_checks(cur, migration['checks'])
+                for check in report:
+                    status = "uses" if check['used'] else "DOES NOT use"
+                    log(f"  planner check: {status} {check['index']} (plan indexes: {', '.join(check['plan_indexes']) or 'none'})")
+                
+                cur.execute("""
+                    INSERT INTO schema_version (version, name, description, planner_checks)
+                    VALUES (%s, %s, %s, %s)
+                """, (migration['version'], migration['name'], migration['description'], json.dumps(report)))
+        
+        applied.append(migration['version'])
+    
+    return applied
+
+def downgrade(conn, target, log=print):
+    """
+    Revert applied migrations newer than the target version, newest first
+    
+    Args:
+        conn: PostgreSQL connection
+        target: Version to end up at (0 reverts everything)
+        log: Function used to report progress
+        
+    Returns:
+        reverted: List of reverted version numbers
+    """
+    reverted = []
+    
+    for migration in reversed(discover_migrations()):
+        if migration['version'] <= target:
+            break
+        
+        with conn:
+            with conn.cursor() as cur:
+                _lock(cur)
+                cur.execute("SELECT 1 FROM schema_version WHERE version = %s", (migration['version'],))
+                if not cur.fetchone():
+                    continue
+                
+                log(f"Reverting {migration['name']}")
+                for statement in migration['down']:
+                    cur.execute(statement)
+                
+                cur.execute("DELETE FROM schema_version WHERE version = %s", (migration['version'],))
+        
+        reverted.append(migration['version'])
+    
+    return reverted
+
+def get_migration_status(conn):
+    """
+    Get every known migration with its applied state and planner check report
+    
+    Args:
+        conn: PostgreSQL connection
+        
+    Returns:
+        status: List of dictionaries ordered by version
+    """
+    with conn:
+        with conn.cursor() as cur:
+            _lock(cur)
+            cur.execute("SELECT version, applied_at, planner_checks FROM schema_version")
+            recorded = {row[0]: row for row in cur.fetchall()}
+    
+    status = []
+    for migration in discover_migrations():
+        row = recorded.get(migration['version'])
+        status.append({
+            "version": migration['version'],
+            "name": migration['name'],
+            "description": migration['description'],
+            "applied": row is not None,
+            "applied_at": row[1] if row else None,
+            "planner_checks": row[2] if row else None
+        })
+    return status
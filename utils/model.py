@@ -7,6 +7,9 @@ import requests
 from tqdm.auto import tqdm
 import numpy as np
 
+# Output classes of ChestXRayClassifier, in output order
+CLASS_LABELS = ['Normal', 'Pneumonia', 'COVID-19']
+
 # Model class definitions
 class ChestXRayClassifier(nn.Module):
     def __init__(self, num_classes=3):
@@ -106,12 +109,33 @@ def predict(model, image_tensor, device):
     class_idx = predicted.item()
     confidence_score = confidence.item()
     
-    # Class labels
-    class_labels = ['Normal', 'Pneumonia', 'COVID-19']
-    class_label = class_labels[class_idx]
+    class_label = CLASS_LABELS[class_idx]
     
     return class_idx, class_label, confidence_score
 
+def predict_batch(model, batch, device):
+    """
+    Make predictions for a batch of images with one forward pass
+    
+    Args:
+        model: The neural network model
+        batch: (B, 3, 224, 224) preprocessed image tensor
+        device: Device to run inference on
+        
+    Returns:
+        List of (class index, class label, confidence score), one per image
+    """
+    model.eval()
+    with torch.no_grad():
+        outputs = model(batch.to(device))
+        probs = torch.nn.functional.softmax(outputs, dim=1)
+        confidences, predicted = torch.max(probs, 1)
+    
+    return [
+        (class_idx, CLASS_LABELS[class_idx], confidence)
+        for class_idx, confidence in zip(predicted.tolist(), confidences.tolist())
+    ]
+
 def get_gradcam(model, image_tensor, device, target_layer_name='layer4'):
     """
     Generate Grad-CAM heatmap for the given image
@@ -0,0 +1,131 @@
+import datetime
+import re
+
+# Monthly partitions of analysis_results are named analysis_results_yYYYYmMM
+PARTITION_NAME_PATTERN = re.compile(r"^analysis_results_y(\d{4})m(\d{2})$")
+
+# Number of future months that always have a partition ready
+PARTITION_MONTHS_AHEAD = 3
+
+_last_ensured = None
+
+def ensure_analysis_partitions(conn, months_ahead=PARTITION_MONTHS_AHEAD):
+    """
+    Create any missing monthly partitions up to months_ahead months from now
+    
+    Args:
+        conn: PostgreSQL connection
+        months_ahead: Number of future months to prepare
+        
+    Returns:
+        created: Number of partitions created
+    """
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT ensure_analysis_results_partitions(CURRENT_DATE, %s)",
+                (months_ahead,)
+            )
+            return cur.fetchone()[0]
+
+def ensure_analysis_partitions_daily(connect):
+    """
+    Run ensure_analysis_partitions at most once per day in this process
+    
+    Args:
+        connect: Function returning a new PostgreSQL connection; only called
+            when the daily check is due
+        
+    Returns:
+        created: Number of partitions created (0 if already done today)
+    """
+    global _last_ensured
+    
+    today = datetime.date.today()
+    if _last_ensured == today:
+        return 0
+    
+    conn = connect()
+    try:
+        created = ensure_analysis_partitions(conn)
+    finally:
+        conn.close()
+    
+    _last_ensured = today
+    return created
+
+def list_analysis_partitions(conn):
+    """
+    List the monthly partitions currently attached to analysis_results
+    
+    Args:
+        conn: PostgreSQL connection
+        
+    Returns:
+        partitions: List of {"name", "month", "rows"} dictionaries, oldest first
+    """
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT c.relname, c.reltuples::BIGINT
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'analysis_results'::regclass
+            """)
+            rows = cur.fetchall()
+    
+    partitions = []
+    for name, estimated_rows in rows:
+        match = PARTITION_NAME_PATTERN.match(name)
+        if not match:
+            # The default partition
+            continue
+        partitions.append({
+            "name": name,
+            "month": datetime.date(int(match.group(1)), int(match.group(2)), 1),
+            "rows": max(estimated_rows, 0)
+        })
+    
+    partitions.sort(key=lambda partition: partition['month'])
+    return partitions
+
+def apply_analysis_retention(conn, keep_months, drop=False, log=print):
+    """
+    Detach partitions older than the retention window
+    
+    Detached partitions are renamed to analysis_results_archive_yYYYYmMM so
+    they can be dumped and dropped at leisure, or dropped right away. Either
+    way retention costs a catalog change instead of a bulk DELETE.
+    
+    Args:
+        conn: PostgreSQL connection
+        keep_months: Number of months to keep, including the current one
+        drop: Drop detached partitions instead of archiving them
+        log: Function used to report progress
+        
+    Returns:
+        removed: List of partition names detached
+    """
+    this_month = datetime.date.today().replace(day=1)
+    year, month = divmod(this_month.year * 12 + this_month.month - 1 - (keep_months - 1), 12)
+    cutoff = datetime.date(year, month + 1, 1)
+    
+    removed = []
+    for partition in list_analysis_partitions(conn):
+        if partition['month'] >= cutoff:
+            continue
+        
+        archive_name = partition['name'].replace("analysis_results_", "analysis_results_archive_", 1)
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(f"ALTER TABLE analysis_results DETACH PARTITION {partition['name']}")
+                if drop:
+                    cur.execute(f"DROP TABLE {partition['name']}")
+                    log(f"Dropped {partition['name']}")
+                else:
+                    cur.execute(f"ALTER TABLE {partition['name']} RENAME TO {archive_name}")
+                    log(f"Archived {partition['name']} as {archive_name}")
+        
+        removed.append(partition['name'])
+    
+    return removed
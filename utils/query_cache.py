@@ -0,0 +1,241 @@
+import functools
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+# Write-driven invalidation: every cached result remembers the versions of
+# the tables it was computed from, and writers bump those versions. The
+# versions live in the table_versions table, so writes from other processes
+# (CLI imports, analysis workers, other app servers) invalidate this
+# process's entries too; they are read at most once per this many seconds.
+TABLE_VERSIONS_REFRESH_SECONDS = float(os.environ.get("TABLE_VERSIONS_REFRESH_SECONDS", "1"))
+
+# Bumps every writer runs, ordered so concurrent writers lock rows alike
+TABLE_VERSIONS_BUMP_QUERY = """
+    INSERT INTO table_versions (table_name, version)
+    SELECT table_name, 1 FROM (SELECT DISTINCT unnest(%s::varchar[]) AS table_name) t
+    ORDER BY table_name
+    ON CONFLICT (table_name) DO UPDATE SET
+        version = table_versions.version + 1,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+# Last versions read from table_versions
+_shared_versions = {}
+_shared_read_at = None
+_shared_lock = threading.Lock()
+
+# Bumps made by this process, counted right away (and while the database
+# cannot be reached) on top of the shared versions
+_local_versions = {}
+
+# name -> {"ttl", "max_entries", "max_bytes", "tables", "entries", "bytes", stats...}
+_caches = {}
+
+_lock = threading.Lock()
+
+def bump_table_version(*tables, cur=None):
+    """
+    Mark tables as changed so every cached result read from them goes stale
+    
+    Pass the cursor of the writing transaction so the bump commits (or
+    rolls back) with the write. Without one the bump runs in its own
+    transaction; if that fails, other processes serve their entries until
+    the TTL passes.
+    
+    Args:
+        tables: Names of the tables that were written to
+        cur: Optional cursor inside the writing transaction
+    """
+    with _lock:
+        for table in tables:
+            _local_versions[table] = _local_versions.get(table, 0) + 1
+    
+    if cur is not None:
+        cur.execute(TABLE_VERSIONS_BUMP_QUERY, (list(tables),))
+        return
+    
+    from utils.database import pooled_connection
+    
+    try:
+        with pooled_connection() as conn:
+            with conn:
+                with conn.cursor() as own_cur:
+                    own_cur.execute(TABLE_VERSIONS_BUMP_QUERY, (list(tables),))
+    except Exception:
+        pass
+
+def _refresh_shared_versions():
+    """
+    Re-read table_versions unless it was read within the refresh interval
+    
+    Failures keep the last versions read, so the cache still works (with
+    TTL-bounded staleness for other processes' writes) without a database.
+    """
+    global _shared_versions, _shared_read_at
+    
+    with _shared_lock:
+        now = time.monotonic()
+        if _shared_read_at is not None and now - _shared_read_at < TABLE_VERSIONS_REFRESH_SECONDS:
+            return
+        _shared_read_at = now
+        
+        from utils.database import pooled_connection
+        
+        try:
+            with pooled_connection() as conn:
+                with conn:
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT table_name, version FROM table_versions")
+                        versions = dict(cur.fetchall())
+        except Exception:
+            return
+        
+        with _lock:
+            _shared_versions = versions
+
+def _versions(tables):
+    return tuple(_shared_versions.get(table, 0) + _local_versions.get(table, 0) for table in tables)
+
+def cached_query(tables, ttl=300, max_entries=128, max_bytes=16 * 1024 * 1024):
+    """
+    Cache a read function's results across sessions
+    
+    Results are keyed by the function and its arguments and stored pickled,
+    so every caller gets its own copy and the memory use is known. An entry
+    is served until its TTL passes or one of the tables it depends on has
+    its version bumped; the least recently used entries are evicted once
+    max_entries or max_bytes is exceeded. None results (failed queries) are
+    not cached.
+    
+    Args:
+        tables: Names of the tables the function reads
+        ttl: Seconds an entry stays valid
+        max_entries: Maximum number of entries kept for this function
+        max_bytes: Maximum pickled size of all entries for this function
+        
+    Returns:
+        decorator: Function decorator
+    """
+    tables = tuple(tables)
+    
+    def decorator(func):
+        name = f"{func.__module__}.{func.__name__}"
+        cache = {
+            "ttl": ttl,
+            "max_entries": max_entries,
+            "max_bytes": max_bytes,
+            "tables": tables,
+            "entries": OrderedDict(),
+            "bytes": 0,
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "invalidations": 0
+        }
+        _caches[name] = cache
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            _refresh_shared_versions()
+            now = time.monotonic()
+            
+            with _lock:
+                versions = _versions(tables)
+                entry = cache['entries'].get(key)
+                if entry is not None:
+                    payload, created, entry_versions = entry
+                    if entry_versions == versions and now - created < cache['ttl']:
+                        cache['entries'].move_to_end(key)
+                        cache['hits'] += 1
+                        return pickle.loads(payload)
+                    
+                    # Stale: expired or a dependency was written to
+                    _discard(cache, key)
+                    cache['invalidations'] += 1
+                cache['misses'] += 1
+            
+            result = func(*args, **kwargs)
+            if result is None:
+                return result
+            
+            payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+            if len(payload) > cache['max_bytes']:
+                return result
+            
+            with _lock:
+                if key in cache['entries']:
+                    _discard(cache, key)
+                cache['entries'][key] = (payload, now, versions)
+                cache['bytes'] += len(payload)
+                
+                while (len(cache['entries']) > cache['max_entries']
+                       or cache['bytes'] > cache['max_bytes']):
+                    _discard(cache, next(iter(cache['entries'])))
+                    cache['evictions'] += 1
+            
+            return result
+        
+        wrapper.cache_name = name
+        return wrapper
+    
+    return decorator
+
+def _discard(cache, key):
+    payload = cache['entries'].pop(key)[0]
+    cache['bytes'] -= len(payload)
+
+def clear_cache(name=None):
+    """
+    Drop cached entries for one function, or for all of them
+    
+    Args:
+        name: Cache name as reported by get_cache_stats (None for all)
+    """
+    with _lock:
+        for cache_name, cache in _caches.items():
+            if name is None or cache_name == name:
+                cache['entries'].clear()
+                cache['bytes'] = 0
+
+def get_cache_stats():
+    """
+    Get hit rate and memory use of every cached function
+    
+    Returns:
+        stats: List of dictionaries, one per cached function
+    """
+    with _lock:
+        stats = []
+        for name, cache in sorted(_caches.items()):
+            lookups = cache['hits'] + cache['misses']
+            stats.append({
+                "name": name,
+                "tables": ", ".join(cache['tables']),
+                "ttl": cache['ttl'],
+                "entries": len(cache['entries']),
+                "max_entries": cache['max_entries'],
+                "bytes": cache['bytes'],
+                "max_bytes": cache['max_bytes'],
+                "hits": cache['hits'],
+                "misses": cache['misses'],
+                "hit_rate": cache['hits'] / lookups if lookups else 0.0,
+                "evictions": cache['evictions'],
+                "invalidations": cache['invalidations']
+            })
+        return stats
+
+def get_table_versions():
+    """
+    Get the current version counter of every table written to so far
+    
+    Returns:
+        versions: Dictionary of table name -> version
+    """
+    _refresh_shared_versions()
+    with _lock:
+        tables = set(_shared_versions) | set(_local_versions)
+        return dict(zip(sorted(tables), _versions(sorted(tables))))
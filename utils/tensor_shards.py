@@ -0,0 +1,331 @@
+import csv
+import json
+import os
+import time
+from multiprocessing import Pool
+import numpy as np
+import torch
+from PIL import Image
+from utils.image_processing import MODEL_INPUT_SIZE, MODEL_MEAN, MODEL_STD
+
+# Preprocessed NIH images: shard_NNNNN.npy files of shape
+# (TENSOR_SHARD_SIZE, 224, 224) uint8, an index.csv of
+# image_index -> (shard, offset) and a manifest.json
+TENSOR_SHARD_DIR = os.environ.get("TENSOR_SHARD_DIR", os.path.join("data", "shards"))
+
+# Images per shard; 4096 greyscale 224x224 images are about 200 MB
+TENSOR_SHARD_SIZE = int(os.environ.get("TENSOR_SHARD_SIZE", "4096"))
+
+# Bump when preprocess_to_uint8 changes; shards of another version are rejected
+SHARD_FORMAT_VERSION = 1
+
+def preprocess_to_uint8(path):
+    """
+    Decode an image and resize it to the model input size, as uint8 greyscale
+    
+    Matches the resizing of utils.image_processing.preprocess_image_for_model
+    (bilinear PIL resize); scaling to [0, 1] and normalization are left to
+    to_model_batch so the shards stay one byte per pixel. Chest X-rays are
+    greyscale, so one channel is stored and expanded to RGB at read time.
+    
+    Args:
+        path: Image file path
+        
+    Returns:
+        array: (MODEL_INPUT_SIZE, MODEL_INPUT_SIZE) uint8 array
+    """
+    with Image.open(path) as image:
+        if image.mode.startswith("I"):
+            # 16-bit greyscale: keep the high byte
+            image = image.convert("I").point(lambda value: value * (1 / 256)).convert("L")
+        elif image.mode != "L":
+            image = image.convert("L")
+        image = image.resize((MODEL_INPUT_SIZE, MODEL_INPUT_SIZE), Image.BILINEAR)
+        return np.asarray(image, dtype=np.uint8)
+
+def _preprocess_item(item):
+    image_index, path = item
+    try:
+        return image_index, preprocess_to_uint8(path), None
+    except Exception as e:
+        return image_index, None, str(e)
+
+class TensorShardWriter:
+    """
+    Append preprocessed images to shard files
+    
+    A shard and its index entries are committed to the manifest only once
+    the shard is full (or on close), so after an interruption the writer
+    resumes after the last committed images and redoes the rest. A last
+    shard that was committed partly full is filled up before a new one is
+    started, so repeated small builds do not leave a trail of tiny shards;
+    readers only see its committed count. Index lines beyond the committed
+    images are dropped on open, before their offsets are written again.
+    """
+    
+    def __init__(self, shard_dir=TENSOR_SHARD_DIR, shard_size=TENSOR_SHARD_SIZE):
+        self.shard_dir = shard_dir
+        os.makedirs(shard_dir, exist_ok=True)
+        
+        self.manifest = _read_manifest(shard_dir) or {
+            "version": SHARD_FORMAT_VERSION,
+            "shape": [MODEL_INPUT_SIZE, MODEL_INPUT_SIZE],
+            "dtype": "uint8",
+            "shard_size": shard_size,
+            "shards": []
+        }
+        if self.manifest["version"] != SHARD_FORMAT_VERSION:
+            raise ValueError(f"Shards in {shard_dir} use format version {self.manifest['version']}")
+        self.shard_size = self.manifest["shard_size"]
+        
+        self.indexed = set(_truncate_index(shard_dir, self.manifest["shards"]))
+        self._shard = None
+        self._entries = []
+    
+    def _open_shard(self):
+        shards = self.manifest["shards"]
+        if shards and shards[-1]["count"] < self.shard_size:
+            # Fill up the partly full last shard after its committed images
+            self._number = len(shards) - 1
+            self._base = shards[-1]["count"]
+            self._file = shards[-1]["file"]
+            self._shard = np.load(os.path.join(self.shard_dir, self._file), mmap_mode="r+")
+        else:
+            self._number = len(shards)
+            self._base = 0
+            self._file = f"shard_{self._number:05d}.npy"
+            self._shard = np.lib.format.open_memmap(
+                os.path.join(self.shard_dir, self._file), mode="w+", dtype=np.uint8,
+                shape=(self.shard_size, *self.manifest["shape"])
+            )
+    
+    def append(self, image_index, array):
+        if self._shard is None:
+            self._open_shard()
+        
+        self._shard[self._base + len(self._entries)] = array
+        self._entries.append(image_index)
+        self.indexed.add(image_index)
+        
+        if self._base + len(self._entries) == self.shard_size:
+            self._commit()
+    
+    def _commit(self):
+        if self._shard is None:
+            return
+        
+        self._shard.flush()
+        del self._shard
+        self._shard = None
+        
+        with open(os.path.join(self.shard_dir, "index.csv"), "a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            for offset, image_index in enumerate(self._entries, start=self._base):
+                writer.writerow([image_index, self._number, offset])
+        
+        entry = {"file": self._file, "count": self._base + len(self._entries)}
+        if self._number < len(self.manifest["shards"]):
+            self.manifest["shards"][self._number] = entry
+        else:
+            self.manifest["shards"].append(entry)
+        _write_manifest(self.shard_dir, self.manifest)
+        self._entries = []
+    
+    def close(self):
+        self._commit()
+
+def _read_manifest(shard_dir):
+    try:
+        with open(os.path.join(shard_dir, "manifest.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_manifest(shard_dir, manifest):
+    path = os.path.join(shard_dir, "manifest.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def _read_index(shard_dir, shards=None):
+    """
+    Committed index entries as image_index -> (shard, offset)
+    """
+    if shards is None:
+        manifest = _read_manifest(shard_dir)
+        shards = manifest["shards"] if manifest else []
+    
+    index = {}
+    try:
+        with open(os.path.join(shard_dir, "index.csv"), newline="", encoding="utf-8") as f:
+            for row in csv.reader(f):
+                # Lines beyond the images the manifest has committed, or cut
+                # short by a crash, are ignored
+                if len(row) != 3 or not (row[1].isdigit() and row[2].isdigit()):
+                    continue
+                shard, offset = int(row[1]), int(row[2])
+                if shard < len(shards) and offset < shards[shard]["count"]:
+                    index[row[0]] = (shard, offset)
+    except OSError:
+        pass
+    return index
+
+def _truncate_index(shard_dir, shards):
+    """
+    Rewrite index.csv with only the committed entries
+    
+    A crash between appending a shard's index lines and writing the manifest
+    leaves lines for offsets that the writer then fills again.
+    
+    Returns:
+        index: The committed entries, as _read_index
+    """
+    index = _read_index(shard_dir, shards)
+    path = os.path.join(shard_dir, "index.csv")
+    if not os.path.exists(path):
+        return index
+    
+    with open(path + ".tmp", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        for image_index, (shard, offset) in index.items():
+            writer.writerow([image_index, shard, offset])
+    os.replace(path + ".tmp", path)
+    return index
+
+def build_tensor_shards(items, shard_dir=TENSOR_SHARD_DIR, workers=None, shard_size=TENSOR_SHARD_SIZE,
+                        progress=None):
+    """
+    Preprocess images into shards with a process pool
+    
+    Images already in the shards are skipped, so the build can be rerun
+    to resume it or to add new images.
+    
+    Args:
+        items: Iterable of (image_index, image path)
+        shard_dir: Output directory
+        workers: Decode processes (default: CPU count)
+        shard_size: Images per shard for a new shard directory
+        progress: Optional function called with a stats dictionary every 1000 images
+        
+    Returns:
+        stats: Dictionary with images, skipped, errors, seconds, images_per_second
+            and last_error
+    """
+    writer = TensorShardWriter(shard_dir, shard_size)
+    stats = {"images": 0, "skipped": 0, "errors": 0, "seconds": 0.0, "images_per_second": 0.0,
+             "last_error": None}
+    started = time.perf_counter()
+    
+    # Filtered here rather than in a generator, which Pool.imap would run
+    # on its task-feeder thread alongside the updates below
+    pending = []
+    for image_index, path in items:
+        if image_index in writer.indexed:
+            stats["skipped"] += 1
+        else:
+            pending.append((image_index, path))
+    
+    try:
+        with Pool(processes=workers or os.cpu_count() or 1) as pool:
+            for image_index, array, error in pool.imap(_preprocess_item, pending, chunksize=16):
+                if error:
+                    stats["errors"] += 1
+                    stats["last_error"] = f"{image_index}: {error}"
+                    continue
+                
+                writer.append(image_index, array)
+                stats["images"] += 1
+                if progress and stats["images"] % 1000 == 0:
+                    stats["seconds"] = time.perf_counter() - started
+                    stats["images_per_second"] = stats["images"] / stats["seconds"]
+                    progress(dict(stats))
+    finally:
+        writer.close()
+    
+    stats["seconds"] = time.perf_counter() - started
+    stats["images_per_second"] = stats["images"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+class TensorShards:
+    """
+    Read-only access to preprocessed images in memory-mapped shards
+    
+    Shards are mapped copy-on-write, so slices become tensors without
+    copying and pages are only read from disk when touched.
+    """
+    
+    def __init__(self, shard_dir=TENSOR_SHARD_DIR):
+        self.shard_dir = shard_dir
+        self.manifest = _read_manifest(shard_dir)
+        if self.manifest is None:
+            raise FileNotFoundError(f"No tensor shards in {shard_dir}")
+        if self.manifest["version"] != SHARD_FORMAT_VERSION:
+            raise ValueError(f"Shards in {shard_dir} use format version {self.manifest['version']}")
+        
+        self.index = _read_index(shard_dir)
+        self._shards = [None] * len(self.manifest["shards"])
+    
+    def __len__(self):
+        return len(self.index)
+    
+    def __contains__(self, image_index):
+        return image_index in self.index
+    
+    def _shard(self, number):
+        if self._shards[number] is None:
+            path = os.path.join(self.shard_dir, self.manifest["shards"][number]["file"])
+            self._shards[number] = np.load(path, mmap_mode="c")
+        return self._shards[number]
+    
+    def get(self, image_index):
+        """
+        One image as a (224, 224) uint8 array view
+        """
+        shard, offset = self.index[image_index]
+        return self._shard(shard)[offset]
+    
+    def gather(self, image_indexes):
+        """
+        Arbitrary images stacked into a (N, 224, 224) uint8 tensor (copied)
+        """
+        return torch.from_numpy(np.stack([self.get(image_index) for image_index in image_indexes]))
+    
+    def iter_batches(self, batch_size=64):
+        """
+        Walk every image in storage order
+        
+        Batches never span shards, so each is a zero-copy slice.
+        
+        Yields:
+            (image_indexes, batch): List of image_index and a (B, 224, 224) uint8 tensor
+        """
+        names = {}
+        for image_index, (shard, offset) in self.index.items():
+            names.setdefault(shard, {})[offset] = image_index
+        
+        for number, entry in enumerate(self.manifest["shards"]):
+            data = self._shard(number)
+            for start in range(0, entry["count"], batch_size):
+                end = min(start + batch_size, entry["count"])
+                yield [names[number][offset] for offset in range(start, end)], torch.from_numpy(data[start:end])
+
+def to_model_batch(batch, device=None):
+    """
+    Turn a uint8 shard batch into normalized model input
+    
+    Equivalent to stacking preprocess_image_for_model outputs. The uint8
+    batch is moved to the device first (a quarter of the float size).
+    
+    Args:
+        batch: (B, 224, 224) uint8 tensor
+        device: Optional torch device
+        
+    Returns:
+        tensor: (B, 3, 224, 224) float tensor
+    """
+    if device is not None:
+        batch = batch.to(device, non_blocking=True)
+    mean = torch.tensor(MODEL_MEAN, device=batch.device).view(1, 3, 1, 1)
+    std = torch.tensor(MODEL_STD, device=batch.device).view(1, 3, 1, 1)
+    images = batch.unsqueeze(1).float().div_(255).expand(-1, 3, -1, -1)
+    return (images - mean) / std
@@ -95,6 +95,30 @@ def create_patient_demographics_chart(df):
     gender_counts = df['gender'].value_counts().reset_index()
     gender_counts.columns = ['Gender', 'Count']
     
+    return _gender_pie_figure(gender_counts)
+
+def create_patient_demographics_chart_from_counts(gender_counts):
+    """
+    Create a pie chart of patient demographics from precomputed counts
+    
+    Args:
+        gender_counts: Dictionary of gender -> count
+        
+    Returns:
+        Plotly figure object
+    """
+    if not gender_counts:
+        return None
+    
+    return _gender_pie_figure(pd.DataFrame({
+        'Gender': list(gender_counts.keys()),
+        'Count': list(gender_counts.values())
+    }))
+
+def _gender_pie_figure(gender_counts):
+    """
+    Plot a Gender/Count DataFrame as a pie chart
+    """
     fig = px.pie(
         gender_counts, 
         values='Count', 
@@ -130,6 +154,30 @@ def create_age_distribution_chart(df):
     age_dist = df['age_group'].value_counts().sort_index().reset_index()
     age_dist.columns = ['Age Group', 'Count']
     
+    return _age_distribution_figure(age_dist)
+
+def create_age_distribution_chart_from_counts(age_group_counts):
+    """
+    Create a bar chart of age distribution from precomputed age group counts
+    
+    Args:
+        age_group_counts: Dictionary of age group label -> count, in bin order
+        
+    Returns:
+        Plotly figure object
+    """
+    if not age_group_counts or sum(age_group_counts.values()) == 0:
+        return None
+    
+    return _age_distribution_figure(pd.DataFrame({
+        'Age Group': list(age_group_counts.keys()),
+        'Count': list(age_group_counts.values())
+    }))
+
+def _age_distribution_figure(age_dist):
+    """
+    Plot an Age Group/Count DataFrame as a bar chart
+    """
     fig = px.bar(
         age_dist,
         x='Age Group',
@@ -158,6 +206,32 @@ def create_diagnosis_distribution_chart(df):
     diagnosis_counts = df['prediction'].value_counts().reset_index()
     diagnosis_counts.columns = ['Diagnosis', 'Count']
     
+    return _diagnosis_distribution_figure(diagnosis_counts)
+
+def create_diagnosis_distribution_chart_from_counts(prediction_counts):
+    """
+    Create a bar chart of diagnosis distribution from precomputed counts
+    
+    Args:
+        prediction_counts: Dictionary of prediction label -> count
+        
+    Returns:
+        Plotly figure object
+    """
+    if not prediction_counts:
+        return None
+    
+    diagnosis_counts = pd.DataFrame({
+        'Diagnosis': list(prediction_counts.keys()),
+        'Count': list(prediction_counts.values())
+    }).sort_values('Count', ascending=False)
+    
+    return _diagnosis_distribution_figure(diagnosis_counts)
+
+def _diagnosis_distribution_figure(diagnosis_counts):
+    """
+    Plot a Diagnosis/Count DataFrame as a bar chart
+    """
     fig = px.bar(
         diagnosis_counts,
         x='Diagnosis',
@@ -198,6 +272,34 @@ def create_confidence_histogram(df):
     
     return fig
 
+def create_confidence_histogram_from_counts(bin_counts):
+    """
+    Create a histogram of prediction confidence scores from precomputed bins
+    
+    Args:
+        bin_counts: List of counts for equal-width bins covering [0, 1]
+        
+    Returns:
+        Plotly figure object
+    """
+    if not bin_counts or sum(bin_counts) == 0:
+        return None
+    
+    width = 1.0 / len(bin_counts)
+    
+    fig = px.bar(
+        x=[(i + 0.5) * width for i in range(len(bin_counts))],
+        y=bin_counts,
+        title='Prediction Confidence Distribution',
+        labels={'x': 'Confidence Score', 'y': 'count'},
+        color_discrete_sequence=['lightblue']
+    )
+    
+    fig.update_traces(width=width)
+    fig.update_layout(xaxis_range=[0, 1], bargap=0)
+    
+    return fig
+
 def create_age_vs_diagnosis_chart(df):
     """
     Create a box plot of age vs diagnosis
@@ -229,6 +331,109 @@ def create_age_vs_diagnosis_chart(df):
     
     return fig
 
+def create_age_vs_diagnosis_chart_from_quantiles(age_quantiles):
+    """
+    Create a box plot of age vs diagnosis from precomputed quantiles
+    
+    Args:
+        age_quantiles: Dictionary of prediction label -> [min, q1, median, q3, max]
+        
+    Returns:
+        Plotly figure object
+    """
+    if not age_quantiles:
+        return None
+    
+    colors = {
+        'Normal': 'green',
+        'Pneumonia': 'orange',
+        'COVID-19': 'red'
+    }
+    
+    fig = go.Figure()
+    
+    for prediction, (minimum, q1, median, q3, maximum) in age_quantiles.items():
+        fig.add_trace(go.Box(
+            x=[prediction],
+            lowerfence=[minimum],
+            q1=[q1],
+            median=[median],
+            q3=[q3],
+            upperfence=[maximum],
+            name=prediction,
+            marker_color=colors.get(prediction)
+        ))
+    
+    fig.update_layout(
+        title='Age Distribution by Diagnosis',
+        xaxis_title='Diagnosis',
+        yaxis_title='Age'
+    )
+    
+    return fig
+
+def create_age_vs_diagnosis_chart_from_counts(prediction_age_counts):
+    """
+    Create a grouped bar chart of age group counts per diagnosis
+    
+    Args:
+        prediction_age_counts: List of (prediction, age group label, count) tuples
+        
+    Returns:
+        Plotly figure object
+    """
+    if not prediction_age_counts:
+        return None
+    
+    age_diagnosis = pd.DataFrame(prediction_age_counts, columns=['prediction', 'age_group', 'count'])
+    
+    fig = px.bar(
+        age_diagnosis,
+        x='age_group',
+        y='count',
+        color='prediction',
+        title='Age Distribution by Diagnosis',
+        labels={'age_group': 'Age Group', 'count': 'Count', 'prediction': 'Diagnosis'},
+        barmode='group',
+        color_discrete_map={
+            'Normal': 'green',
+            'Pneumonia': 'orange',
+            'COVID-19': 'red'
+        }
+    )
+    
+    return fig
+
+def create_mean_confidence_chart(mean_confidence):
+    """
+    Create a bar chart of the mean prediction confidence per diagnosis
+    
+    Args:
+        mean_confidence: Dictionary of prediction label -> mean confidence
+        
+    Returns:
+        Plotly figure object
+    """
+    if not mean_confidence:
+        return None
+    
+    fig = px.bar(
+        x=list(mean_confidence.keys()),
+        y=list(mean_confidence.values()),
+        color=list(mean_confidence.keys()),
+        title='Mean Prediction Confidence by Diagnosis',
+        labels={'x': 'Diagnosis', 'y': 'Mean Confidence', 'color': 'Diagnosis'},
+        color_discrete_map={
+            'Normal': 'green',
+            'Pneumonia': 'orange',
+            'COVID-19': 'red'
+        }
+    )
+    
+    fig.update_layout(yaxis_range=[0, 1])
+    
+    return fig
+
 def create_gender_vs_diagnosis_chart(df):
     """
     Create a grouped bar chart of gender vs diagnosis
@@ -244,6 +449,30 @@ def create_gender_vs_diagnosis_chart(df):
     
     gender_diagnosis = df.groupby(['gender', 'prediction']).size().reset_index(name='count')
     
+    return _gender_vs_diagnosis_figure(gender_diagnosis)
+
+def create_gender_vs_diagnosis_chart_from_counts(gender_prediction_counts):
+    """
+    Create a grouped bar chart of gender vs diagnosis from precomputed counts
+    
+    Args:
+        gender_prediction_counts: List of (gender, prediction, count) tuples
+        
+    Returns:
+        Plotly figure object
+    """
+    if not gender_prediction_counts:
+        return None
+    
+    gender_diagnosis = pd.DataFrame(gender_prediction_counts, columns=['gender', 'prediction', 'count'])
+    gender_diagnosis = gender_diagnosis.sort_values(['gender', 'prediction'])
+    
+    return _gender_vs_diagnosis_figure(gender_diagnosis)
+
+def _gender_vs_diagnosis_figure(gender_diagnosis):
+    """
+    Plot a gender/prediction/count DataFrame as a grouped bar chart
+    """
     fig = px.bar(
         gender_diagnosis,
         x='gender',
@@ -0,0 +1,357 @@
+import atexit
+import glob
+import json
+import os
+import socket
+import threading
+import time
+import psycopg2
+from utils.circuit_breaker import CircuitOpenError
+
+try:
+    import fcntl
+except ImportError:
+    # No journal locking (Windows): run one app process per journal path
+    fcntl = None
+
+# Local journal of analyses not yet confirmed by the database. Every process
+# holds an exclusive lock on the journal it writes; further processes on the
+# same path take analysis_journal.1.jsonl, .2, ... (see AnalysisWriteBehind)
+ANALYSIS_JOURNAL_PATH = os.environ.get("ANALYSIS_JOURNAL_PATH", os.path.join("data", "analysis_journal.jsonl"))
+
+# Records that failed on their own (e.g. bad values) end up here for inspection
+ANALYSIS_DEAD_LETTER_PATH = ANALYSIS_JOURNAL_PATH.replace(".jsonl", ".failed.jsonl")
+
+# Flush as soon as this many analyses are queued...
+ANALYSIS_BATCH_SIZE = int(os.environ.get("ANALYSIS_BATCH_SIZE", "50"))
+
+# ...or when the oldest queued analysis has waited this many seconds
+ANALYSIS_FLUSH_INTERVAL = float(os.environ.get("ANALYSIS_FLUSH_INTERVAL", "2"))
+
+# Rows per INSERT when draining a backlog built up during an outage
+# (PostgreSQL allows at most 65535 parameters per statement)
+ANALYSIS_REPLAY_CHUNK = 1000
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+class AnalysisWriteBehind:
+    """
+    In-process write-behind queue for analysis results
+    
+    save() appends the analysis to a local journal and returns immediately;
+    a background thread writes queued analyses in multi-row batches and
+    calls each analysis's callback with its database id. The journal is
+    replayed on start-up, and replays are idempotent because every record
+    carries its client_id and timestamp.
+    
+    The journal doubles as the spool for database outages: while the
+    database circuit breaker is open nothing is attempted, analyses keep
+    piling up on disk, and the backlog is drained in bulk once a trial
+    connection succeeds.
+    
+    Several processes can share a journal path: each one locks the first
+    free journal slot for its lifetime, and takes over (and removes) the
+    journals of other slots whose process has died.
+    """
+    
+    def __init__(self, journal_path=ANALYSIS_JOURNAL_PATH, batch_size=ANALYSIS_BATCH_SIZE,
+                 flush_interval=ANALYSIS_FLUSH_INTERVAL):
+        self.journal_path = self._claim_journal(journal_path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        
+        self._pending = []
+        self._callbacks = {}
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._oldest = None
+        self._stats = {"saved": 0, "batches": 0, "failed": 0, "last_error": None, "last_flush": None}
+        
+        self._replay_journal()
+        self._adopt_orphaned_journals(journal_path)
+        
+        self._thread = threading.Thread(target=self._run, name="analysis-write-behind", daemon=True)
+        self._thread.start()
+    
+    def save(self, record, callback=None):
+        """
+        Queue an analysis for writing
+        
+        Args:
+            record: Dictionary with client_id, timestamp and the analysis_results columns
+            callback: Optional function called with the database id once written
+        """
+        record = dict(record)
+        record['client_id'] = str(record['client_id'])
+        record['age'] = _to_int(record.get('age'))
+        if record.get('confidence') is not None:
+            record['confidence'] = float(record['confidence'])
+        
+        with self._condition:
+            self._append_journal(record)
+            self._pending.append(record)
+            if callback is not None:
+                self._callbacks[record['client_id']] = callback
+            if self._oldest is None:
+                # Start the flush timer
+                self._oldest = time.monotonic()
+                self._condition.notify()
+            elif len(self._pending) >= self.batch_size:
+                self._condition.notify()
+    
+    def flush(self):
+        """
+        Write everything queued right now
+        
+        Returns:
+            written: Number of analyses written
+        """
+        with self._flush_lock:
+            with self._condition:
+                batch = self._pending[:]
+                self._oldest = None
+            
+            if not batch:
+                return 0
+            
+            db_ids = {}
+            for start in range(0, len(batch), ANALYSIS_REPLAY_CHUNK):
+                written = self._write(batch[start:start + ANALYSIS_REPLAY_CHUNK])
+                db_ids.update(written)
+                if not written:
+                    # Database went away; keep the rest for the next attempt
+                    break
+            
+            with self._condition:
+                done = set(db_ids)
+                self._pending = [record for record in self._pending if record['client_id'] not in done]
+                self._oldest = time.monotonic() if self._pending else None
+                # Unwritten records are in the journal already, so it is
+                # only compacted when something was written; a failed flush
+                # during an outage costs no journal I/O
+                if done:
+                    self._rewrite_journal()
+                callbacks = [(self._callbacks.pop(client_id, None), db_id) for client_id, db_id in db_ids.items()]
+            
+            for callback, db_id in callbacks:
+                if callback is not None and db_id is not None:
+                    try:
+                        callback(db_id)
+                    except Exception:
+                        pass
+            
+            return len(done)
+    
+    def get_stats(self):
+        """
+        Get queue depth and write counters
+        
+        Returns:
+            stats: Dictionary of counters
+        """
+        with self._condition:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._pending)
+        return stats
+    
+    def _write(self, batch):
+        """
+        Write a batch, isolating records that make the batch fail
+        
+        Returns:
+            db_ids: client_id -> database id (None for records moved to the
+                dead-letter file); records left out are retried later
+        """
+        from utils.database import save_analyses_batch
+        
+        try:
+            db_ids = save_analyses_batch(batch)
+            self._record_success(len(batch))
+            return db_ids
+        except Exception as e:
+            self._stats["last_error"] = str(e)
+            if self._is_connection_error(e):
+                return {}
+        
+        # Find the offending rows one by one; connection errors fail them all
+        # and leave them queued for the next attempt
+        db_ids = {}
+        for record in batch:
+            try:
+                db_ids.update(save_analyses_batch([record]))
+                self._record_success(1)
+            except Exception as e:
+                self._stats["last_error"] = str(e)
+                if not self._is_data_error(e):
+                    break
+                self._dead_letter(record, e)
+                db_ids[record['client_id']] = None
+        return db_ids
+    
+    def _record_success(self, count):
+        self._stats["saved"] += count
+        self._stats["batches"] += 1
+        self._stats["last_flush"] = time.time()
+    
+    @staticmethod
+    def _is_connection_error(error):
+        return isinstance(error, (CircuitOpenError, psycopg2.OperationalError))
+    
+    @staticmethod
+    def _is_data_error(error):
+        return isinstance(error, (psycopg2.DataError, psycopg2.IntegrityError))
+    
+    def _dead_letter(self, record, error):
+        self._stats["failed"] += 1
+        with open(ANALYSIS_DEAD_LETTER_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"record": record, "error": str(error)}) + "\n")
+    
+    def _append_journal(self, *records):
+        os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def _claim_journal(self, base_path):
+        """
+        Lock the first journal slot no other live process holds
+        
+        The lock lives as long as this process (the kernel drops it when
+        the process dies), so a slot's journal has one writer at a time.
+        """
+        self._lock_file = None
+        if fcntl is None:
+            return base_path
+        
+        os.makedirs(os.path.dirname(base_path) or ".", exist_ok=True)
+        slot = 0
+        while True:
+            path = _journal_slot_path(base_path, slot)
+            lock_file = open(path + ".lock", "a")
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                slot += 1
+                continue
+            self._lock_file = lock_file
+            return path
+    
+    def _adopt_orphaned_journals(self, base_path):
+        # Journals of other slots that can be locked belong to dead
+        # processes; their records move into this journal before removal
+        if fcntl is None:
+            return
+        
+        root, ext = os.path.splitext(base_path)
+        slots = [base_path] + [
+            path for path in glob.glob(f"{glob.escape(root)}.*{ext}")
+            if path[len(root) + 1:len(path) - len(ext)].isdigit()
+        ]
+        
+        for path in slots:
+            if path == self.journal_path or not os.path.exists(path):
+                continue
+            with open(path + ".lock", "a") as lock_file:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue
+                records = _read_journal(path)
+                if records:
+                    self._append_journal(*records)
+                    self._pending.extend(records)
+                    self._oldest = self._oldest or time.monotonic()
+                os.remove(path)
+    
+    def _rewrite_journal(self):
+        # Keep only what is still pending; os.replace makes the swap atomic
+        temp_path = f"{self.journal_path}.{socket.gethostname()}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for record in self._pending:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.journal_path)
+    
+    def _replay_journal(self):
+        self._pending.extend(_read_journal(self.journal_path))
+        if self._pending:
+            self._oldest = time.monotonic()
+        if os.path.exists(self.journal_path):
+            # Drops a torn last line, which the next append would run into
+            self._rewrite_journal()
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if len(self._pending) >= self.batch_size:
+                        break
+                    if self._oldest is not None:
+                        wait = self.flush_interval - (time.monotonic() - self._oldest)
+                        if wait <= 0:
+                            break
+                    else:
+                        wait = None
+                    self._condition.wait(wait)
+            
+            try:
+                written = self.flush()
+            except Exception as e:
+                self._stats["last_error"] = str(e)
+                written = 0
+            
+            # Back off while the database is unreachable, until the breaker
+            # lets a trial connection through
+            if not written:
+                from utils.database import db_breaker
+                
+                with self._condition:
+                    if self._pending:
+                        self._condition.wait(max(self.flush_interval, db_breaker.retry_in()))
+
+def _journal_slot_path(base_path, slot):
+    if slot == 0:
+        return base_path
+    root, ext = os.path.splitext(base_path)
+    return f"{root}.{slot}{ext}"
+
+def _read_journal(path):
+    records = []
+    if not os.path.exists(path):
+        return records
+    
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # Torn last line from a crash mid-write
+                continue
+    return records
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_analysis_writer():
+    """
+    Get the process-wide analysis write-behind queue, starting it on first use
+    """
+    global _writer
+    
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AnalysisWriteBehind()
+                atexit.register(_writer.flush)
+    return _writer